@@ -12,13 +12,117 @@ MOTION_SENSOR_PIN = 4
 
 # Durations and Delays (seconds)
 BUZZER_DURATION = 5
-MOTION_DETECT_DELAY = 1      # Time to wait after motion stops before checking again or idling
-FACE_DETECTION_DURATION = 30 # How long to run face detection after motion is initially detected
-COOLDOWN_PERIOD = 30         # Seconds before re-triggering alert for the same detected person
+# Buzzer beep patterns: lists of (on_seconds, off_seconds) steps, played by detection/actuators.py
+BUZZER_PATTERNS = {
+    "alert": [(BUZZER_DURATION, 0)],         # One continuous tone
+    "pulse": [(0.5, 0.25)] * 6,              # Six half-second beeps
+    "chirp": [(0.1, 0.1)] * 3,               # Short acknowledgement
+}
+BUZZER_ALERT_PATTERN = "alert"               # Pattern played on a criminal match
+MOTION_DETECT_DELAY = 1      # Max time the idle loop waits for a motion edge before re-checking (edges wake it at once)
+MOTION_DEBOUNCE_MS = 200     # Debounce time for motion sensor edges (GPIO bouncetime)
+FACE_DETECTION_DURATION = 30 # How long to keep running face detection after motion was last seen
+COOLDOWN_PERIOD = 30         # Seconds before re-triggering alert for the same detected person (per face track)
+
+# Face tracking (detection/tracker.py) - faces are only re-encoded when new or after the refresh interval
+TRACK_IOU_THRESHOLD = 0.3      # Min box overlap to continue a track
+TRACK_MAX_CENTROID_SHIFT = 0.5 # Fallback association: max centroid move as a fraction of box width
+TRACK_TIMEOUT = 1.0            # Seconds a track survives without being seen
+TRACK_REFRESH_INTERVAL = 2.0   # Seconds between re-recognitions of the same track
 
 # Frame processing
 DETECTOR_SCALE_FACTOR = 0.5 # Factor to resize frames for faster processing in detector.py
 
+# Face matching
+MATCH_TOLERANCE = 0.6        # Max face distance to count as a match (face_recognition default is 0.6)
+FACE_ENCODING_DIM = 128      # Length of a dlib face encoding vector
+
+# Gallery index (detection/face_index.py)
+GALLERY_INDEX_TYPE = "brute" # "brute" (exact linear scan) or "ivf" (approximate, for very large watchlists)
+IVF_NLIST = 256              # Number of k-means buckets in the IVF index (~sqrt(gallery size) is a good start)
+IVF_NPROBE = 8               # Buckets scanned per query; raise for recall, lower for latency
+IVF_TRAIN_SIZE = 20000       # Vectors used to train the IVF quantizer (index is exact until this many are added)
+GALLERY_POLL_INTERVAL = 2    # Seconds between checks for criminals added/edited/deleted via the dashboard
+# Sharing the gallery between detector processes on one box (detection/gallery_store.py):
+# "off" - each process loads the gallery from the database itself
+# "publish" - load from the database and publish every snapshot to shared memory (run one such process)
+# "attach" - no database loading; search the published snapshot in place (no per-process copy)
+GALLERY_SHARING = "off"
+GALLERY_SHM_NAME = "bodaboda_gallery" # Shared memory name used by "publish" and "attach"
+# Compiled gallery snapshot (detection/gallery_snapshot.py), rewritten by the dashboard whenever criminals
+# change and memory-mapped by the detector at startup instead of loading every row. None disables it.
+GALLERY_SNAPSHOT_PATH = "data/gallery.snapshot" # Relative to the project root
+GALLERY_SNAPSHOT_WAIT = 30   # Seconds a snapshot-backed detector waits for the recompiled snapshot before applying changes itself
+GALLERY_CHANGES_KEEP = 1000  # Gallery versions of change log kept for delta reloads (older rows are trimmed when the snapshot is compiled)
+
+# Camera capture (detection/capture.py)
+CAMERA_INDICES = (0, 1)      # Camera indices to try, in order (single-camera setup)
+# Several cameras in one detector process (e.g. a stage with two entrances). Each entry needs a
+# "source" (camera index or stream URL); "name" and "terminal_id" default to cam<N> and TERMINAL_ID.
+# Example: [{"name": "north", "source": 0, "terminal_id": "STAGE1-N"}, {"name": "south", "source": 1, "terminal_id": "STAGE1-S"}]
+CAMERA_SOURCES = []          # Empty = one camera from CAMERA_INDICES with TERMINAL_ID
+CAPTURE_FLUSH_FRAMES = 5     # Stale frames grabbed and discarded from the driver buffer when motion starts
+
+# Face detector backend (detection/face_detectors.py) - compare with `python -m detection.bench_detectors`
+FACE_DETECTOR_BACKEND = "hog"        # "hog" (dlib), "haar" (OpenCV cascade) or "dnn" (OpenCV DNN, needs model files)
+HOG_UPSAMPLE = 1                     # Times HOG upsamples the image (finds smaller faces, slower)
+HAAR_CASCADE_PATH = None             # None = frontal-face cascade bundled with cv2
+HAAR_SCALE_FACTOR = 1.1
+HAAR_MIN_NEIGHBORS = 5               # Higher = fewer false positives, more missed faces
+HAAR_MIN_SIZE = 30                   # Smallest face in pixels (downscaled frame)
+DNN_MODEL_PATH = "models/res10_300x300_ssd_iter_140000.caffemodel" # Relative to the project root
+DNN_CONFIG_PATH = "models/deploy.prototxt"
+DNN_CONFIDENCE = 0.5                 # Minimum detection confidence
+
+# Motion ROIs (detection/roi.py) - only scan moving regions of the (downscaled) frame with HOG
+MOTION_ROI_ENABLED = False           # Set True to enable; the whole frame is scanned otherwise
+MOTION_ROI_METHOD = "mog2"           # "mog2" (OpenCV background subtraction) or "diff" (frame differencing)
+MOTION_ROI_HISTORY = 100             # MOG2 background history, in frames
+MOTION_ROI_THRESHOLD = 25            # MOG2 varThreshold / pixel difference threshold for "diff"
+MOTION_ROI_MIN_AREA = 150            # Ignore moving blobs smaller than this (pixels, downscaled frame)
+MOTION_ROI_PADDING = 20              # Pixels added around each moving region
+MOTION_ROI_MIN_SIZE = 80             # Minimum ROI width/height so HOG has enough context around a face
+MOTION_ROI_MAX_COVERAGE = 0.6        # Scan the whole frame instead if ROIs cover more than this fraction
+MOTION_ROI_FULL_SCAN_INTERVAL = 15   # Scan the whole frame every N frames to catch faces that never moved
+
+# Detection pipeline (detection/pipeline.py) - stages are connected by bounded queues.
+# Policy when a queue is full: "drop_oldest" discards the oldest item, "drop_newest" discards
+# the new item, "block" waits for room (never drops).
+FRAME_QUEUE_SIZE = 2
+FRAME_QUEUE_POLICY = "drop_oldest"    # Camera frames: always work on the freshest
+ENCODE_QUEUE_SIZE = 4
+ENCODE_QUEUE_POLICY = "drop_oldest"
+DISPLAY_QUEUE_SIZE = 2
+DISPLAY_QUEUE_POLICY = "drop_oldest"
+ALERT_QUEUE_SIZE = 64
+ALERT_QUEUE_POLICY = "block"          # Alerts must never be dropped
+ENCODING_THREADS = 2                  # Encoding worker threads
+PIPELINE_STOP_TIMEOUT = 5             # Seconds to wait for each pipeline thread to finish on shutdown
+FACE_WORKER_PROCESSES = 3             # Processes for HOG detection/encoding (0 = run in the pipeline threads)
+FACE_WORKER_TIMEOUT = 10              # Seconds to wait for a worker result before giving up on a frame
+PIPELINE_STATS_INTERVAL = 30          # Seconds between queue-depth reports in the console
+
+# Alert persistence (detection/alert_sink.py) - images and database rows are written off the frame path
+ALERT_SINK_BATCH_SIZE = 32            # Max alerts inserted per transaction
+ALERT_SINK_MAX_BACKLOG = 1000         # Alerts waiting to be stored before submit() blocks
+ALERT_SINK_MAX_RETRIES = 3            # Attempts per batch (e.g. while the dashboard holds a write lock)
+
+# Image thumbnails (detection/thumbnails.py) - written on enrolment and when an alert is saved
+THUMBNAIL_SIZES = (80, 160, 320)      # Longest side in pixels; list pages show THUMBNAIL_LIST_SIZE
+THUMBNAIL_JPEG_QUALITY = 80
+
+# Background enrolment (detection/enrolment.py) - face encoding of photos uploaded via the dashboard
+ENROLMENT_WORKERS = 1                 # Worker processes the dashboard starts (0 = run `python -m detection.enrolment` yourself)
+ENROLMENT_POLL_INTERVAL = 1           # Seconds an idle worker waits before checking the job queue again
+ENROLMENT_MAX_IMAGE_SIDE = 1600       # Larger photos are shrunk to this (longest side, pixels) before face detection
+ENROLMENT_MAX_ATTEMPTS = 3            # Tries per job when encoding crashes (a photo without a face fails at once)
+ENROLMENT_JOB_TIMEOUT = 300           # Seconds before a job left running by a dead worker is retried
+
+# Bulk import (detection/bulk_import.py) - ZIP archive or folder of photos with a CSV manifest
+BULK_IMPORT_PROCESSES = None          # Encoding processes (None = one per CPU core)
+BULK_IMPORT_BATCH_SIZE = 200          # Criminals inserted per transaction (also how often progress is saved)
+BULK_IMPORT_MAX_PHOTO_MB = 20         # Larger photos are rejected
+
 # --- LCD Configuration (lcd_utils.py) ---
 LCD_ENABLED = True # Master switch for LCD features
 # I2C Settings for LCD
@@ -37,6 +141,11 @@ IP_DISPLAYED_FLAG_FILENAME = ".ip_displayed_flag" # Will be stored in 'data/' su
 # SECRET_KEY is best set via environment variable (see DEPLOYMENT_RASPBERRY_PI.md)
 # For development, a default is used in app.py if ENV var is not set.
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALERTS_PAGE_SIZE = 50        # Alerts per page on the alerts log
+ALERTS_COUNT_CAP = 10000     # The optional match count stops here ("10000+") so it stays fast on huge logs
+CRIMINALS_PAGE_SIZE = 50     # Criminals per page on the criminals list and search results
+THUMBNAIL_LIST_SIZE = 160    # Thumbnail size used in tables (photos display at up to 75px; 160 stays sharp on high-DPI screens)
+IMAGE_CACHE_MAX_AGE = 31536000 # Seconds browsers may reuse a versioned (?v=) image without asking (one year)
 
 # --- Database Setup (database_setup.py) ---
 DEFAULT_ADMIN_USERNAME = "admin"
@@ -1,16 +1,24 @@
 import os
+import multiprocessing
+import re
 import sqlite3
-import face_recognition
+import threading
+from datetime import datetime
 import numpy as np
-import pickle
-from flask import Flask, render_template, request, redirect, url_for, flash, g, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, g, jsonify, abort, send_file, Response
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, FileField, TextAreaField
 from wtforms.validators import DataRequired, Length, Optional
 import config # Import the new config file
+from detection.enrolment import (EnrolmentWorkers, enqueue_enrolment, get_enrolment_status, get_job_counts,
+                                 remove_photo, PLACEHOLDER_ENCODING, STATUS_PENDING)
+from detection.bulk_import import IMPORTS_DIR, IMPORT_DONE, start_import, run_import, get_import, get_rejects, rejects_csv
+from detection.gallery_snapshot import SnapshotCompiler
+from detection.queries import CRIMINAL_COLUMNS, alerts_count_query, alerts_page_query, criminals_page_query
+from detection.thumbnails import get_thumbnail
 
 # --- App Configuration ---
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Defines base for project
@@ -18,6 +26,7 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 DATABASE_PATH = os.path.join(DATA_DIR, config.DATABASE_NAME)
 STATIC_FOLDER_PATH = os.path.join(PROJECT_ROOT, 'static')
 UPLOAD_FOLDER_PATH = os.path.join(STATIC_FOLDER_PATH, config.UPLOAD_FOLDER_NAME)
+DETECTED_FACES_PATH = os.path.join(DATA_DIR, config.DETECTED_FACES_SUBDIR)
 ALLOWED_EXTENSIONS = config.ALLOWED_IMAGE_EXTENSIONS # Get from config
 os.makedirs(UPLOAD_FOLDER_PATH, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True) # Ensure data directory exists for DB
@@ -28,6 +37,8 @@ app = Flask(__name__, template_folder=os.path.join(PROJECT_ROOT, 'templates'), s
 app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'dev_secret_key_MUST_BE_CHANGED_123!')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER_PATH # Used by Flask-Uploads or direct saving
 app.config['DATABASE'] = DATABASE_PATH # Custom DB path for Flask context
+# Rewrites the gallery snapshot the detector memory-maps, in the background, after criminals change
+snapshot_compiler = SnapshotCompiler()
 
 # --- Flask-Login Setup ---
 login_manager = LoginManager()
@@ -59,6 +70,10 @@ class CriminalForm(FlaskForm):
     photo = FileField('Photo') # Validation for file type/presence handled in route
     submit = SubmitField('Submit Criminal')
 
+class ImportForm(FlaskForm):
+    archive = FileField('ZIP archive') # Checked in the route
+    submit = SubmitField('Start Import')
+
 
 # --- Database Helper Functions ---
 def get_db():
@@ -93,21 +108,36 @@ def execute_db(sql, args=()):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def generate_face_encoding(image_path):
+# Image kinds (criminal photos, detected faces), the directory each kind's images live in and the route serving them
+IMAGE_DIRS = {'criminal': UPLOAD_FOLDER_PATH, 'face': DETECTED_FACES_PATH}
+IMAGE_ENDPOINTS = {'criminal': 'serve_criminal_photo', 'face': 'serve_detected_face_image'}
+
+def file_etag(path):
+    """Strong validator for a file: inode, modification time (ns) and size. None if it doesn't exist."""
     try:
-        image = face_recognition.load_image_file(image_path)
-        face_encodings = face_recognition.face_encodings(image)
-        if face_encodings:
-            return face_encodings[0]
-        else:
-            return None
-    except Exception as e:
-        print(f"Error generating face encoding for {image_path}: {e}")
+        st = os.stat(path)
+    except OSError:
         return None
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def image_url(kind, image_path):
+    """
+    URL of a full-size image; image_path may be a stored path (only the file name is used).
+    The URL carries the file's ETag as ?v=, so it changes whenever the file does and can be cached as immutable.
+    """
+    filename = os.path.basename(image_path)
+    return url_for(IMAGE_ENDPOINTS[kind], filename=filename, v=file_etag(os.path.join(IMAGE_DIRS[kind], filename)))
+
+def thumbnail_url(kind, image_path, size=None):
+    """URL of a thumbnail, versioned by the original's ETag (thumbnails are regenerated when it changes)."""
+    filename = os.path.basename(image_path)
+    return url_for('serve_thumbnail', kind=kind, size=size or config.THUMBNAIL_LIST_SIZE, filename=filename,
+                   v=file_etag(os.path.join(IMAGE_DIRS[kind], filename)))
 
 @app.context_processor
 def utility_processor():
-    return dict(in_app_url_rules=[rule.endpoint for rule in app.url_map.iter_rules()])
+    return dict(in_app_url_rules=[rule.endpoint for rule in app.url_map.iter_rules()],
+                image_url=image_url, thumbnail_url=thumbnail_url)
 
 # --- Routes ---
 @app.route('/login', methods=['GET', 'POST'])
@@ -139,11 +169,118 @@ def logout():
 def index():
     return redirect(url_for('list_criminals'))
 
+# --- Criminals list and search ---
+# Browsing pages through the list by name with a (name, id) keyset on idx_criminals_name.
+# Searching uses the criminals_fts full-text index (database_setup.py migration 3): every word typed
+# must match the start of a word in the name or description. Matches come back newest first and
+# are paged by ID, which the FTS index yields in order, so no query has to rank every match.
+_has_criminals_fts = False
+
+def has_criminals_fts():
+    global _has_criminals_fts
+    if not _has_criminals_fts:
+        _has_criminals_fts = query_db("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'criminals_fts'",
+                                      one=True) is not None
+    return _has_criminals_fts
+
+def fts_prefix_query(text):
+    """Search box text -> FTS5 query: each word as a quoted prefix term, so FTS operators in the input are inert."""
+    words = re.findall(r"[^\W_]+", text)[:8]
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_criminals(text, before_id=None, limit=None):
+    """
+    Criminals matching the search text, newest first.
+    Args:
+        text (str): Words typed by the user.
+        before_id (int, optional): Keyset cursor; only return criminals with a lower ID.
+        limit (int, optional): Defaults to config.CRIMINALS_PAGE_SIZE.
+    Returns:
+        list: sqlite3.Row objects (id, name, description, photo_path, status).
+    """
+    limit = limit or config.CRIMINALS_PAGE_SIZE
+    cursor_clause = "AND c.id < ?" if before_id is not None else ""
+    cursor_params = [before_id] if before_id is not None else []
+    if has_criminals_fts():
+        match = fts_prefix_query(text)
+        if not match:
+            return []
+        return query_db(f"""
+            SELECT {CRIMINAL_COLUMNS}
+            FROM criminals_fts f
+            JOIN criminals c ON c.id = f.rowid
+            WHERE criminals_fts MATCH ? {cursor_clause}
+            ORDER BY f.rowid DESC
+            LIMIT ?
+        """, [match] + cursor_params + [limit])
+    # SQLite without FTS5: substring scan of the whole table
+    pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return query_db(f"""
+        SELECT {CRIMINAL_COLUMNS}
+        FROM criminals c
+        WHERE (c.name LIKE ? ESCAPE '\\' OR c.description LIKE ? ESCAPE '\\') {cursor_clause}
+        ORDER BY c.id DESC
+        LIMIT ?
+    """, [pattern, pattern] + cursor_params + [limit])
+
+def fetch_criminals_page(after=None, before=None, page_size=None):
+    """
+    One page of the criminals list ordered by name.
+    Args:
+        after (tuple, optional): (name, id) cursor; return the criminals just after it.
+        before (tuple, optional): (name, id) cursor; return the criminals just before it.
+    Returns:
+        tuple: (rows, has_previous, has_next)
+    """
+    page_size = page_size or config.CRIMINALS_PAGE_SIZE
+    rows = query_db(*criminals_page_query(after, before, page_size + 1))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+        return rows, has_more, True
+    return rows, after is not None, has_more
+
 @app.route('/criminals')
 @login_required
 def list_criminals():
-    criminals_data = query_db("SELECT id, name, description, photo_path FROM criminals ORDER BY name")
-    return render_template('criminals/list.html', title='Manage Criminals', criminals=criminals_data)
+    search = request.args.get('q', '').strip()
+    previous_url = next_url = None
+    if search:
+        before_id = request.args.get('before_id', type=int)
+        rows = search_criminals(search, before_id, config.CRIMINALS_PAGE_SIZE + 1)
+        criminals_data = rows[:config.CRIMINALS_PAGE_SIZE]
+        if len(rows) > config.CRIMINALS_PAGE_SIZE:
+            next_url = url_for('list_criminals', q=search, before_id=criminals_data[-1]['id'])
+        first_page = before_id is None
+    else:
+        after = parse_cursor(request.args.get('after'))
+        before = None if after else parse_cursor(request.args.get('before'))
+        criminals_data, has_previous, has_next = fetch_criminals_page(after, before)
+        if has_previous and criminals_data:
+            first = criminals_data[0]
+            previous_url = url_for('list_criminals', before=f"{first['name']},{first['id']}")
+        if has_next and criminals_data:
+            last = criminals_data[-1]
+            next_url = url_for('list_criminals', after=f"{last['name']},{last['id']}")
+        first_page = not (after or before)
+    return render_template('criminals/list.html', title='Manage Criminals', criminals=criminals_data,
+                           search=search, first_page=first_page, previous_url=previous_url, next_url=next_url)
+
+@app.route('/criminals/search.json')
+@login_required
+def search_criminals_json():
+    """Search-as-you-type suggestions: [{id, name, description, photo_url, edit_url}, ...]."""
+    search = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    rows = search_criminals(search, limit=limit) if search else []
+    return jsonify([{
+        'id': row['id'],
+        'name': row['name'],
+        'description': row['description'],
+        'photo_url': thumbnail_url('criminal', row['photo_path']) if row['photo_path'] else None,
+        'edit_url': url_for('edit_criminal', criminal_id=row['id']),
+    } for row in rows])
 
 @app.route('/criminals/add', methods=['GET', 'POST'])
 @login_required
@@ -172,20 +309,20 @@ def add_criminal():
 
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
             photo.save(filepath)
-
-            face_encoding_array = generate_face_encoding(filepath)
-            if face_encoding_array is None:
-                flash('No face detected in uploaded photo. Please try a different photo.', 'danger')
-                os.remove(filepath) # Clean up uploaded file
-                return render_template('criminals/add.html', title='Add Criminal', form=form)
-
-            serialized_encoding = pickle.dumps(face_encoding_array)
             db_photo_path = os.path.join(config.UPLOAD_FOLDER_NAME, unique_filename) # Relative path for DB
 
             try:
-                execute_db("INSERT INTO criminals (name, description, photo_path, face_encoding) VALUES (?, ?, ?, ?)",
-                           (name, description, db_photo_path, serialized_encoding))
-                flash(f'Criminal "{name}" added successfully!', 'success')
+                # Face encoding happens in an enrolment worker (detection/enrolment.py); until then the
+                # criminal is 'pending' with a placeholder encoding and is not part of the gallery
+                db = get_db()
+                with db:
+                    criminal_id = db.execute(
+                        "INSERT INTO criminals (name, description, photo_path, face_encoding, status) VALUES (?, ?, ?, ?, ?)",
+                        (name, description, db_photo_path, PLACEHOLDER_ENCODING, STATUS_PENDING)).lastrowid
+                    job_id = enqueue_enrolment(db, criminal_id, db_photo_path)
+                snapshot_compiler.request()
+                flash(f'Criminal "{name}" added. The photo is being processed (job #{job_id}); '
+                      'matching starts once a face has been found in it.', 'success')
                 return redirect(url_for('list_criminals'))
             except Exception as e:
                 flash(f'Database error adding criminal: {e}', 'danger')
@@ -212,17 +349,11 @@ def edit_criminal(criminal_id):
         description = form.description.data
         new_photo = request.files.get('photo')
 
-        current_photo_path_db = criminal['photo_path']
-        new_db_photo_path = current_photo_path_db
-        new_serialized_encoding = criminal['face_encoding']
+        new_db_photo_path = None
 
         if new_photo and new_photo.filename != '' and allowed_file(new_photo.filename):
-            # Delete old photo if it exists
-            if current_photo_path_db:
-                old_photo_absolute_path = os.path.join(STATIC_FOLDER_PATH, current_photo_path_db)
-                if os.path.exists(old_photo_absolute_path):
-                    os.remove(old_photo_absolute_path)
-
+            # The old photo and encoding stay in place until an enrolment worker has encoded the new
+            # photo; the worker then swaps them and deletes the old photo
             filename = secure_filename(new_photo.filename)
             base, ext = os.path.splitext(filename)
             counter, unique_filename = 1, filename
@@ -234,17 +365,17 @@ def edit_criminal(criminal_id):
             new_photo.save(new_photo_filepath_absolute)
             new_db_photo_path = os.path.join(config.UPLOAD_FOLDER_NAME, unique_filename)
 
-            face_encoding_array = generate_face_encoding(new_photo_filepath_absolute)
-            if face_encoding_array is None:
-                flash('No face detected in new photo. Original photo and encoding retained if no new photo is processed.', 'warning')
-                new_db_photo_path = current_photo_path_db
-            else:
-                new_serialized_encoding = pickle.dumps(face_encoding_array)
-
         try:
-            execute_db("UPDATE criminals SET name = ?, description = ?, photo_path = ?, face_encoding = ? WHERE id = ?",
-                       (name, description, new_db_photo_path, new_serialized_encoding, criminal_id))
-            flash(f'Criminal "{name}" updated successfully!', 'success')
+            db = get_db()
+            with db:
+                db.execute("UPDATE criminals SET name = ?, description = ? WHERE id = ?", (name, description, criminal_id))
+                job_id = enqueue_enrolment(db, criminal_id, new_db_photo_path) if new_db_photo_path else None
+            snapshot_compiler.request()
+            if job_id:
+                flash(f'Criminal "{name}" updated. The new photo is being processed (job #{job_id}); '
+                      'the current photo stays in use until a face has been found in it.', 'success')
+            else:
+                flash(f'Criminal "{name}" updated successfully!', 'success')
             return redirect(url_for('list_criminals'))
         except Exception as e:
             flash(f'Database error updating criminal: {e}', 'danger')
@@ -279,12 +410,17 @@ def delete_criminal(criminal_id):
     try:
         # Cascade delete for alerts should be handled by DB schema (ON DELETE CASCADE)
         # execute_db("DELETE FROM alerts WHERE criminal_id = ?", (criminal_id,))
-        execute_db("DELETE FROM criminals WHERE id = ?", (criminal_id,))
-
-        if criminal['photo_path']:
-            photo_to_delete_absolute = os.path.join(STATIC_FOLDER_PATH, criminal['photo_path'])
-            if os.path.exists(photo_to_delete_absolute):
-                os.remove(photo_to_delete_absolute)
+        db = get_db()
+        with db:
+            # Photos of queued enrolment jobs go too (a job already running notices the deletion itself)
+            queued_photos = [row['photo_path'] for row in db.execute(
+                "SELECT photo_path FROM enrolment_jobs WHERE criminal_id = ? AND status = 'queued'", (criminal_id,))]
+            db.execute("DELETE FROM enrolment_jobs WHERE criminal_id = ? AND status != 'running'", (criminal_id,))
+            db.execute("DELETE FROM criminals WHERE id = ?", (criminal_id,))
+        snapshot_compiler.request()
+
+        for photo_path in set(queued_photos + [criminal['photo_path']]) - {None, ''}:
+            remove_photo(photo_path)
 
         flash(f'Criminal "{criminal["name"]}" and associated alerts deleted successfully.', 'success')
     except Exception as e:
@@ -293,27 +429,283 @@ def delete_criminal(criminal_id):
     return redirect(url_for('list_criminals'))
 
 
+# --- Bulk import (detection/bulk_import.py) ---
+# An uploaded ZIP is saved under data/imports and imported by a separate process (which runs its own
+# encoding pool), so the request returns at once; the status page follows progress from the database.
+import_processes = {} # Import ID -> multiprocessing.Process started by this dashboard
+
+def start_import_process(import_id):
+    """Runs an import in the background unless this dashboard is already running it."""
+    process = import_processes.get(import_id)
+    if process is not None and process.is_alive():
+        return
+    # Not a daemon: the import runs its own process pool, which daemon processes may not have
+    process = multiprocessing.Process(target=run_import, args=(import_id,), kwargs={'snapshot_batches': True},
+                                      name=f"BulkImport-{import_id}")
+    process.start()
+    import_processes[import_id] = process
+
+@app.route('/criminals/import', methods=['GET', 'POST'])
+@login_required
+def import_criminals():
+    form = ImportForm()
+    if form.validate_on_submit():
+        archive = request.files.get('archive')
+        if not archive or not archive.filename.lower().endswith('.zip'):
+            flash('Please choose a ZIP archive with the photos and a manifest.csv.', 'danger')
+        else:
+            os.makedirs(IMPORTS_DIR, exist_ok=True)
+            path = os.path.join(IMPORTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{secure_filename(archive.filename)}")
+            archive.save(path)
+            try:
+                import_id = start_import(get_db(), path)
+            except ValueError as e:
+                os.remove(path)
+                flash(f'Cannot import this archive: {e}', 'danger')
+                return render_template('criminals/import.html', title='Import Criminals', form=form, imports=recent_imports())
+            if get_import(get_db(), import_id)['status'] == IMPORT_DONE:
+                os.remove(path)
+                flash('This manifest has already been imported.', 'info')
+            else:
+                start_import_process(import_id)
+                flash('Import started. Photos are being processed in the background.', 'success')
+            return redirect(url_for('view_import', import_id=import_id))
+    return render_template('criminals/import.html', title='Import Criminals', form=form, imports=recent_imports())
+
+def recent_imports(limit=20):
+    return query_db("SELECT id, source, status, total, imported, rejected, created_at, updated_at "
+                    "FROM bulk_imports ORDER BY id DESC LIMIT ?", (limit,))
+
+@app.route('/criminals/import/<int:import_id>')
+@login_required
+def view_import(import_id):
+    info = get_import(get_db(), import_id)
+    if info is None:
+        abort(404)
+    process = import_processes.get(import_id)
+    return render_template('criminals/import_status.html', title=f'Import #{import_id}', info=info,
+                           archive_name=os.path.basename(info['source']),
+                           running=process is not None and process.is_alive(),
+                           rejects=get_rejects(get_db(), import_id, limit=100), form=ImportForm())
+
+@app.route('/criminals/import/<int:import_id>/rejects.csv')
+@login_required
+def download_import_rejects(import_id):
+    if get_import(get_db(), import_id) is None:
+        abort(404)
+    return Response(rejects_csv(get_db(), import_id), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename=import_{import_id}_rejects.csv'})
+
+@app.route('/criminals/import/<int:import_id>/resume', methods=['POST'])
+@login_required
+def resume_import(import_id):
+    form = ImportForm()
+    info = get_import(get_db(), import_id)
+    if info is None:
+        abort(404)
+    if form.validate_on_submit() and info['status'] != IMPORT_DONE: # validate_on_submit checks the CSRF token
+        start_import_process(import_id)
+        flash(f'Import #{import_id} resumed.', 'success')
+    return redirect(url_for('view_import', import_id=import_id))
+
+
+@app.route('/criminals/<int:criminal_id>/enrolment.json')
+@login_required
+def criminal_enrolment_status(criminal_id):
+    """Enrolment status of one criminal: {criminal_id, status, job: {id, status, error, attempts, ...}}."""
+    status = get_enrolment_status(get_db(), criminal_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+
+@app.route('/enrolment/status.json')
+@login_required
+def enrolment_queue_status():
+    """Enrolment jobs per state, e.g. {"queued": 3, "running": 1, "done": 120}."""
+    return jsonify(get_job_counts(get_db()))
+
+
+# --- Image serving ---
+# Every image response carries a strong ETag (see file_etag), so a reload revalidates each image with a
+# body-less 304 instead of downloading it again. URLs built by image_url/thumbnail_url also carry the
+# ETag as ?v=; when it matches the file being served, the response is marked immutable and the browser
+# reuses it for IMAGE_CACHE_MAX_AGE without asking at all (no request, no login check, no DB hit).
+# Anything else (old links, stale v=) gets "no-cache", i.e. always revalidated.
+image_cache_stats = {'requests': 0, 'not_modified': 0, 'bytes_sent': 0, 'bytes_saved': 0}
+image_cache_stats_lock = threading.Lock()
+
+def send_image(path, version=None, mimetype=None):
+    """
+    Sends an image file with ETag/If-None-Match handling and cache headers.
+    Args:
+        path (str): The file to send (already checked to be inside an image directory).
+        version (str, optional): The ?v= value under which the response may be cached as immutable.
+            Defaults to the file's own ETag.
+        mimetype (str, optional): Guessed from the file name if omitted.
+    """
+    etag = file_etag(path) if path else None
+    if etag is None:
+        abort(404)
+    size = os.path.getsize(path)
+    not_modified = request.if_none_match.contains(etag)
+    if not_modified:
+        response = app.response_class(status=304)
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=False, etag=False)
+    response.set_etag(etag)
+    if request.args.get('v') == (etag if version is None else version):
+        response.headers['Cache-Control'] = f'private, max-age={config.IMAGE_CACHE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    with image_cache_stats_lock:
+        image_cache_stats['requests'] += 1
+        if not_modified:
+            image_cache_stats['not_modified'] += 1
+            image_cache_stats['bytes_saved'] += size
+        else:
+            image_cache_stats['bytes_sent'] += size
+    return response
+
+
 @app.route('/data/detected_faces/<filename>')
 @login_required # Protect access to detected faces as well
 def serve_detected_face_image(filename):
-    # Ensure this path is secure and doesn't allow directory traversal
-    # send_from_directory handles this reasonably well.
-    return send_from_directory(os.path.join(PROJECT_ROOT, "data", "detected_faces"), filename)
+    # safe_join rejects names that would escape the directory (None -> 404)
+    return send_image(safe_join(DETECTED_FACES_PATH, filename))
+
+
+# Takes precedence over the generic static route for criminal photos (more specific rule), so
+# url_for('static', filename=criminal.photo_path) URLs get the same validators and cache headers.
+@app.route(f'/static/{config.UPLOAD_FOLDER_NAME}/<filename>')
+def serve_criminal_photo(filename):
+    return send_image(safe_join(UPLOAD_FOLDER_PATH, filename))
+
 
+@app.route('/thumbnails/<kind>/<int:size>/<filename>')
+@login_required
+def serve_thumbnail(kind, size, filename):
+    """Serves a criminal photo or detected face thumbnail, generating it first if needed (older images)."""
+    directory = IMAGE_DIRS.get(kind)
+    image_path = safe_join(directory, filename) if directory else None
+    if image_path is None or size not in config.THUMBNAIL_SIZES:
+        abort(404)
+    thumbnail = get_thumbnail(image_path, size)
+    if thumbnail is None:
+        abort(404) # Original missing or unreadable; the templates fall back to the placeholder
+    # Versioned by the original: the thumbnail only changes when the original does
+    return send_image(thumbnail, version=file_etag(image_path), mimetype='image/jpeg')
+
+
+@app.route('/stats/image_cache.json')
+@login_required
+def image_cache_report():
+    """How much image traffic revalidation saved since the dashboard started (immutable hits never reach it)."""
+    with image_cache_stats_lock:
+        stats = dict(image_cache_stats)
+    total = stats['bytes_sent'] + stats['bytes_saved']
+    stats['saved_fraction'] = round(stats['bytes_saved'] / total, 3) if total else 0.0
+    return jsonify(stats)
+
+
+# --- Alerts log ---
+# Keyset pagination on (timestamp, id): a page starts right after the last row of the previous one,
+# so every page is one index range scan of ALERTS_PAGE_SIZE rows however deep into the log it is.
+# Each filter is served by an index (see database_setup.py): terminal -> idx_alerts_terminal,
+# criminal -> idx_alerts_criminal_id, date range -> idx_alerts_timestamp.
+# The SQL itself is built in detection/queries.py, which `database_setup.py --check-plans` also checks.
+
+def parse_alert_filters(args):
+    """Validated filters from the query string: terminal, criminal (ID), date_from/date_to (YYYY-MM-DD)."""
+    filters = {}
+    terminal = args.get('terminal', '').strip()
+    if terminal:
+        filters['terminal'] = terminal
+    criminal = args.get('criminal', type=int)
+    if criminal is not None:
+        filters['criminal'] = criminal
+    for key in ('date_from', 'date_to'):
+        value = args.get(key, '').strip()
+        if not value:
+            continue
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+            filters[key] = value
+        except ValueError:
+            flash(f'Ignoring invalid date "{value}" (use YYYY-MM-DD).', 'warning')
+    return filters
+
+def parse_cursor(value):
+    """A page cursor "<sort key>,<id>" (e.g. "timestamp,id") -> (sort key, id), or None if absent or malformed."""
+    if not value:
+        return None
+    timestamp, _, alert_id = value.rpartition(',')
+    if not timestamp or not alert_id.isdigit():
+        return None
+    return timestamp, int(alert_id)
+
+def fetch_alerts_page(filters, before=None, after=None, page_size=None):
+    """
+    One page of alerts, newest first.
+    Args:
+        filters (dict): From parse_alert_filters().
+        before (tuple, optional): (timestamp, id) cursor; return the alerts just older than it.
+        after (tuple, optional): (timestamp, id) cursor; return the alerts just newer than it.
+        page_size (int, optional): Defaults to config.ALERTS_PAGE_SIZE.
+    Returns:
+        tuple: (rows, has_newer, has_older)
+    """
+    page_size = page_size or config.ALERTS_PAGE_SIZE
+    # One extra row tells whether there is another page; `after` walks towards newer alerts oldest
+    # first, so that page is flipped back to newest first below
+    rows = query_db(*alerts_page_query(filters, before, after, page_size + 1))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if after:
+        rows.reverse()
+        return rows, has_more, True
+    return rows, before is not None, has_more
+
+def approximate_alert_count(filters):
+    """
+    Number of alerts matching the filters, counted up to config.ALERTS_COUNT_CAP only, so the cost
+    is bounded however large the log grows.
+    Returns:
+        tuple: (count, capped) - capped is True if there are more than `count` matching alerts.
+    """
+    cap = config.ALERTS_COUNT_CAP
+    row = query_db(*alerts_count_query(filters, cap + 1), one=True)
+    return min(row['n'], cap), row['n'] > cap
+
+def alert_cursor(alert):
+    return f"{alert['timestamp']},{alert['id']}"
 
 @app.route('/alerts')
 @login_required
 def view_alerts():
-    alerts_data = query_db("""
-        SELECT a.id, a.timestamp, a.detected_face_photo_path, a.terminal_id,
-               c.name as criminal_name, c.photo_path as criminal_photo_path
-        FROM alerts a
-        JOIN criminals c ON a.criminal_id = c.id
-        ORDER BY a.timestamp DESC
-    """)
-    return render_template('alerts/view.html', alerts=alerts_data)
+    filters = parse_alert_filters(request.args)
+    before = parse_cursor(request.args.get('before'))
+    after = None if before else parse_cursor(request.args.get('after'))
+    alerts_data, has_newer, has_older = fetch_alerts_page(filters, before, after)
+
+    # Links keep the filters and replace the cursor
+    link_args = {key: request.args[key] for key in ('terminal', 'criminal', 'date_from', 'date_to', 'count')
+                 if request.args.get(key)}
+    newer_url = url_for('view_alerts', after=alert_cursor(alerts_data[0]), **link_args) \
+        if has_newer and alerts_data else None
+    older_url = url_for('view_alerts', before=alert_cursor(alerts_data[-1]), **link_args) \
+        if has_older and alerts_data else None
+    total = approximate_alert_count(filters) if request.args.get('count') else None
+    return render_template('alerts/view.html', alerts=alerts_data, filters=filters, total=total,
+                           newer_url=newer_url, older_url=older_url,
+                           first_page=not (before or after), latest_url=url_for('view_alerts', **link_args))
 
 if __name__ == '__main__':
     if not os.path.exists(DATABASE_PATH):
         print(f"Database not found at {DATABASE_PATH}. Please run `python database_setup.py` from the project root.")
+    else:
+        snapshot_compiler.request() # Brings the snapshot up to date with changes made outside the dashboard
+        # The debug reloader runs this script twice; only start workers in the process that serves requests
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            EnrolmentWorkers().start() # Daemon processes: they exit with the dashboard
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -1,6 +1,12 @@
+import argparse
 import sqlite3
 import os
+import pickle
+import sys
 import config # Import the new config file
+from detection.encoding_format import MAGIC, encode_encoding
+from detection.queries import (CRIMINAL_BY_NAME, LATEST_ENROLMENT_JOB, NEXT_ENROLMENT_JOB, alerts_count_query,
+                               alerts_page_query, criminals_page_query)
 
 # Use database name from config, construct path
 DATABASE_PATH = os.path.join("data", config.DATABASE_NAME)
@@ -62,11 +68,309 @@ def create_tables(conn):
         """)
         print("DATABASE_SETUP: Table 'admin_users' created successfully or already exists.")
 
+        # Gallery version tracking: the detector polls this to hot-reload changed criminals
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS gallery_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        cursor.execute("INSERT OR IGNORE INTO gallery_version (id, version) VALUES (1, 0)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS gallery_changes (
+                version INTEGER NOT NULL,
+                criminal_id INTEGER NOT NULL
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_gallery_changes_version ON gallery_changes (version)")
+        # Each change to a criminal's name or encoding bumps the version and logs the affected ID.
+        # UPDATE OF fires whenever a column is in the SET list (the dashboard always sets the name),
+        # so the WHEN clause skips updates that leave both unchanged, e.g. description-only edits.
+        update_when = "WHEN OLD.name IS NOT NEW.name OR OLD.face_encoding IS NOT NEW.face_encoding"
+        for trigger_name, event, row, when in (("criminals_gallery_insert", "INSERT", "NEW", ""),
+                                               ("criminals_gallery_update", "UPDATE OF name, face_encoding", "NEW",
+                                                update_when),
+                                               ("criminals_gallery_delete", "DELETE", "OLD", "")):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {trigger_name} AFTER {event} ON criminals {when}
+                BEGIN
+                    UPDATE gallery_version SET version = version + 1 WHERE id = 1;
+                    INSERT INTO gallery_changes (version, criminal_id)
+                        SELECT version, {row}.id FROM gallery_version WHERE id = 1;
+                END;
+            """)
+        print("DATABASE_SETUP: Gallery version tracking created successfully or already exists.")
+
         conn.commit()
     except sqlite3.Error as e:
         print(f"DATABASE_SETUP: Error creating tables: {e}")
     # Connection is closed by the calling function if it owns it
 
+def migrate_face_encodings(conn, batch_size=1000):
+    """
+    Converts criminals.face_encoding BLOBs from pickled NumPy arrays to the binary format of
+    detection/encoding_format.py. Rows already converted are left alone, so this is safe to re-run.
+    Each batch is converted and written in one transaction.
+    Returns:
+        int: Number of rows converted.
+    """
+    if conn is None:
+        print("DATABASE_SETUP: Cannot migrate encodings: database connection is not established.")
+        return 0
+
+    legacy_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM criminals WHERE substr(face_encoding, 1, ?) != ? AND length(face_encoding) > 0",
+        (len(MAGIC), MAGIC))] # Empty = placeholder of a criminal still waiting for enrolment
+    if not legacy_ids:
+        return 0
+
+    converted = 0
+    for start in range(0, len(legacy_ids), batch_size):
+        chunk = legacy_ids[start:start + batch_size]
+        placeholders = ",".join("?" * len(chunk))
+        updates = []
+        for criminal_id, blob in conn.execute(
+                f"SELECT id, face_encoding FROM criminals WHERE id IN ({placeholders})", chunk):
+            try:
+                # Our own database: these pickles were written by the dashboard
+                updates.append((encode_encoding(pickle.loads(blob)), criminal_id))
+            except Exception as e:
+                print(f"DATABASE_SETUP: Could not convert encoding of criminal ID {criminal_id}: {e}. Left as is.")
+        try:
+            with conn:
+                conn.executemany("UPDATE criminals SET face_encoding = ? WHERE id = ?", updates)
+        except sqlite3.Error as e:
+            print(f"DATABASE_SETUP: Error migrating face encodings: {e}")
+            break
+        converted += len(updates)
+    print(f"DATABASE_SETUP: Converted {converted} of {len(legacy_ids)} pickled face encodings to the binary format.")
+    return converted
+
+
+# --- Schema migrations ---
+# create_tables() builds the base schema (schema version 0). Every later schema change is a numbered
+# migration: MIGRATIONS[0] is version 1, MIGRATIONS[1] version 2, and so on. The database's current
+# version is kept in PRAGMA user_version; migrate() applies the missing ones in order, each in its
+# own transaction together with the version bump. Only ever append to this list.
+
+def _add_lookup_indexes(conn):
+    """Indexes for the alerts log (sorted by timestamp, joined/filtered on criminal_id) and name lookups."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_criminal_id ON alerts (criminal_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_criminals_name ON criminals (name)")
+
+
+def _add_alert_terminal_index(conn):
+    """Index for the alerts log filtered by terminal (keyset pages walk it in timestamp order)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_terminal ON alerts (terminal_id, timestamp)")
+
+
+def _add_criminals_search(conn):
+    """Full-text search over criminal names and descriptions (FTS5), kept in sync by triggers."""
+    try:
+        # External-content table: the text stays in criminals, the FTS table only holds the index.
+        # prefix='2 3' adds prefix indexes so search-as-you-type queries ("jo"*) stay fast.
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS criminals_fts USING fts5(
+                name, description,
+                content='criminals', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: the dashboard falls back to a slower LIKE search
+        print(f"DATABASE_SETUP: Full-text search not available ({e}); criminal search will be slow.")
+        return
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS criminals_fts_insert AFTER INSERT ON criminals
+        BEGIN
+            INSERT INTO criminals_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS criminals_fts_delete AFTER DELETE ON criminals
+        BEGIN
+            INSERT INTO criminals_fts (criminals_fts, rowid, name, description)
+                VALUES ('delete', OLD.id, OLD.name, OLD.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS criminals_fts_update AFTER UPDATE OF name, description ON criminals
+        BEGIN
+            INSERT INTO criminals_fts (criminals_fts, rowid, name, description)
+                VALUES ('delete', OLD.id, OLD.name, OLD.description);
+            INSERT INTO criminals_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+        END
+    """)
+    conn.execute("INSERT INTO criminals_fts (criminals_fts) VALUES ('rebuild')") # Index existing criminals
+
+
+def _add_enrolment_jobs(conn):
+    """Background enrolment: criminals.status and the enrolment_jobs queue (see detection/enrolment.py)."""
+    # 'pending' until the first photo is encoded, 'active' once it is in the gallery, 'failed' if it had no usable face
+    conn.execute("ALTER TABLE criminals ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS enrolment_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            criminal_id INTEGER NOT NULL,
+            photo_path TEXT NOT NULL, /* Relative to static folder */
+            status TEXT NOT NULL DEFAULT 'queued', /* queued, running, done, failed, superseded */
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (criminal_id) REFERENCES criminals (id) ON DELETE CASCADE
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_enrolment_jobs_status ON enrolment_jobs (status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_enrolment_jobs_criminal ON enrolment_jobs (criminal_id, id)")
+    # A status change moves a criminal into or out of the gallery, so it must bump the gallery version too
+    _create_gallery_update_trigger(conn)
+
+
+def _create_gallery_update_trigger(conn):
+    """(Re)creates the criminals update trigger for name, encoding and status changes."""
+    conn.execute("DROP TRIGGER IF EXISTS criminals_gallery_update")
+    conn.execute("""
+        CREATE TRIGGER criminals_gallery_update AFTER UPDATE OF name, face_encoding, status ON criminals
+        WHEN OLD.name IS NOT NEW.name OR OLD.face_encoding IS NOT NEW.face_encoding OR OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE gallery_version SET version = version + 1 WHERE id = 1;
+            INSERT INTO gallery_changes (version, criminal_id)
+                SELECT version, NEW.id FROM gallery_version WHERE id = 1;
+        END
+    """)
+
+
+def _add_bulk_imports(conn):
+    """Bulk imports and the outcome of every manifest row, for resuming and reject reports (see detection/bulk_import.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_imports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL, /* ZIP archive or folder with the photos */
+            manifest TEXT, /* Separate CSV manifest; NULL = manifest.csv inside the source */
+            manifest_sha256 TEXT NOT NULL, /* Running an import with the same manifest again resumes it */
+            status TEXT NOT NULL DEFAULT 'running', /* running, done, failed */
+            error TEXT,
+            total INTEGER NOT NULL DEFAULT 0,
+            imported INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_imports_manifest ON bulk_imports (manifest_sha256)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_import_rows (
+            import_id INTEGER NOT NULL,
+            row_number INTEGER NOT NULL, /* Line in the manifest */
+            photo TEXT,
+            name TEXT,
+            status TEXT NOT NULL, /* imported, rejected */
+            criminal_id INTEGER,
+            reason TEXT, /* Why the row was rejected */
+            PRIMARY KEY (import_id, row_number),
+            FOREIGN KEY (import_id) REFERENCES bulk_imports (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+
+
+def _skip_unchanged_gallery_updates(conn):
+    """Only bump the gallery version when a criminal's name, encoding or status actually changes."""
+    # UPDATE OF fires whenever a column is in the SET list, so description-only edits from the
+    # dashboard (which always sets the name) bumped the version and made every detector reload
+    _create_gallery_update_trigger(conn)
+
+
+MIGRATIONS = [
+    _add_lookup_indexes,              # 1
+    _add_alert_terminal_index,        # 2
+    _add_criminals_search,            # 3
+    _add_enrolment_jobs,              # 4
+    _add_bulk_imports,                # 5
+    _skip_unchanged_gallery_updates,  # 6
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Applies the migrations the database has not seen yet, in order.
+    Returns:
+        int: The schema version afterwards.
+    """
+    if conn is None:
+        print("DATABASE_SETUP: Cannot migrate: database connection is not established.")
+        return None
+
+    version = get_schema_version(conn)
+    if version > SCHEMA_VERSION:
+        print(f"DATABASE_SETUP: Database schema version {version} is newer than this code ({SCHEMA_VERSION}).")
+        return version
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        migration = MIGRATIONS[number - 1]
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"DATABASE_SETUP: Migration {number} ({migration.__name__}) failed: {e}")
+            return number - 1
+        print(f"DATABASE_SETUP: Applied migration {number}: {migration.__doc__.splitlines()[0]}")
+    if version == SCHEMA_VERSION:
+        print(f"DATABASE_SETUP: Database schema is up to date (version {version}).")
+    return SCHEMA_VERSION
+
+
+# --- Query plan checks ---
+# Hot queries (built by detection/queries.py, as dashboard/app.py and detection/ run them) and the index each must use.
+# `python database_setup.py --check-plans` fails if EXPLAIN QUERY PLAN shows any of them without it,
+# or sorting into a temporary B-tree instead of reading in index order (e.g. after a schema change
+# or a rewritten query).
+CURSOR = ("2024-01-01 00:00:00", 1)
+PAGE = config.ALERTS_PAGE_SIZE + 1 # The dashboard asks for one extra row to tell whether there is another page
+CRIMINALS_PAGE = config.CRIMINALS_PAGE_SIZE + 1
+QUERY_PLAN_CHECKS = [
+    ("alerts log, first page", *alerts_page_query({}, limit=PAGE), "idx_alerts_timestamp"),
+    ("alerts log, older page", *alerts_page_query({}, before=CURSOR, limit=PAGE), "idx_alerts_timestamp"),
+    ("alerts log, newer page", *alerts_page_query({}, after=CURSOR, limit=PAGE), "idx_alerts_timestamp"),
+    ("alerts log, by terminal", *alerts_page_query({"terminal": "T1"}, before=CURSOR, limit=PAGE),
+     "idx_alerts_terminal"),
+    ("alerts log, by criminal", *alerts_page_query({"criminal": 1}, limit=PAGE), "idx_alerts_criminal_id"),
+    ("alerts log, by date range",
+     *alerts_page_query({"date_from": "2024-01-01", "date_to": "2024-01-31"}, limit=PAGE), "idx_alerts_timestamp"),
+    ("alerts count, by terminal", *alerts_count_query({"terminal": "T1"}, config.ALERTS_COUNT_CAP + 1), "idx_alerts_terminal"),
+    ("enrolment queue, next job", NEXT_ENROLMENT_JOB, ("queued",), "idx_enrolment_jobs_status"),
+    ("enrolment, latest job of a criminal", LATEST_ENROLMENT_JOB, (1,), "idx_enrolment_jobs_criminal"),
+    ("criminal by name", CRIMINAL_BY_NAME, ("x",), "idx_criminals_name"),
+    ("criminals list, first page", *criminals_page_query(limit=CRIMINALS_PAGE), "idx_criminals_name"),
+    ("criminals list, next page", *criminals_page_query(after=("x", 1), limit=CRIMINALS_PAGE), "idx_criminals_name"),
+    ("criminals list, previous page", *criminals_page_query(before=("x", 1), limit=CRIMINALS_PAGE), "idx_criminals_name"),
+]
+
+
+def check_query_plans(conn):
+    """
+    Runs EXPLAIN QUERY PLAN for every entry of QUERY_PLAN_CHECKS.
+    Returns:
+        list: (description, plan) for each query that does not use its index (or sorts); empty if all pass.
+    """
+    failures = []
+    for description, sql, params, index_name in QUERY_PLAN_CHECKS:
+        plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        uses_index = index_name in plan and "TEMP B-TREE" not in plan
+        if not uses_index:
+            failures.append((description, plan))
+        print(f"DATABASE_SETUP: {'OK  ' if uses_index else 'FAIL'} {description}: {plan}")
+    return failures
+
+
 def create_default_admin(conn):
     """Creates a default admin user using credentials from config.py if one doesn't exist."""
     if conn is None:
@@ -95,13 +399,26 @@ def create_default_admin(conn):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create or upgrade the database.")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="After setup, verify that the hot queries use their indexes (exit code 1 if not).")
+    args = parser.parse_args()
+
+    plan_failures = []
     db_conn = create_connection()
     if db_conn:
         try:
             create_tables(db_conn)
+            migrate(db_conn) # Numbered schema migrations
+            migrate_face_encodings(db_conn) # Pickled encodings from older versions
             create_default_admin(db_conn) # Create default admin user
+            if args.check_plans:
+                plan_failures = check_query_plans(db_conn)
         finally:
             db_conn.close()
             print("DATABASE_SETUP: SQLite connection closed.")
     else:
         print("DATABASE_SETUP: Failed to establish database connection. Tables not created.")
+    if plan_failures:
+        print(f"DATABASE_SETUP: {len(plan_failures)} query plan check(s) failed.")
+        sys.exit(1)
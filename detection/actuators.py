@@ -0,0 +1,86 @@
+# detection/actuators.py
+
+import threading
+
+import config # Import the new config file
+
+
+class BuzzerScheduler:
+    """
+    Timer-driven buzzer control. play() switches the pin on and returns immediately;
+    background timers step through the beep pattern and switch the pin off at the end,
+    so alerts never sleep on the detection threads.
+
+    A pattern is a list of (on_seconds, off_seconds) steps, e.g. [(0.2, 0.1)] * 3 for three chirps.
+    Starting a new pattern pre-empts the one currently playing.
+    Works with RPi.GPIO or detection/gpio_mock.py (anything with output(), HIGH and LOW).
+    """
+
+    def __init__(self, gpio, pin):
+        self.gpio = gpio
+        self.pin = pin
+        self._lock = threading.Lock()
+        self._timer = None
+        self._generation = 0 # Bumped on every play()/stop() so stale timers do nothing
+
+    @property
+    def is_playing(self):
+        with self._lock:
+            return self._timer is not None
+
+    def play(self, pattern=None):
+        """
+        Starts a beep pattern (defaults to one continuous BUZZER_DURATION tone). Returns immediately.
+        Args:
+            pattern (list or str): (on_seconds, off_seconds) steps, or a name from config.BUZZER_PATTERNS.
+        """
+        if pattern is None:
+            pattern = [(config.BUZZER_DURATION, 0)]
+        elif isinstance(pattern, str):
+            pattern = config.BUZZER_PATTERNS[pattern]
+        with self._lock:
+            self._cancel_locked()
+            self._generation += 1
+            self._step_locked(self._generation, list(pattern), 0)
+
+    def stop(self):
+        """Cancels any pattern and switches the buzzer off."""
+        with self._lock:
+            self._cancel_locked()
+            self._generation += 1
+            self.gpio.output(self.pin, self.gpio.LOW)
+
+    def _cancel_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule_locked(self, delay, callback, *args):
+        self._timer = threading.Timer(delay, callback, args)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _step_locked(self, generation, pattern, index):
+        if index >= len(pattern):
+            self._timer = None
+            return
+        on_seconds, _ = pattern[index]
+        self.gpio.output(self.pin, self.gpio.HIGH)
+        self._schedule_locked(on_seconds, self._switch_off, generation, pattern, index)
+
+    def _switch_off(self, generation, pattern, index):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.gpio.output(self.pin, self.gpio.LOW)
+            _, off_seconds = pattern[index]
+            if index + 1 >= len(pattern):
+                self._timer = None
+            else:
+                self._schedule_locked(off_seconds, self._switch_on, generation, pattern, index + 1)
+
+    def _switch_on(self, generation, pattern, index):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._step_locked(generation, pattern, index)
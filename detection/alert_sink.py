@@ -0,0 +1,155 @@
+# detection/alert_sink.py
+
+# Background persistence for alerts. The detector only enqueues an AlertRecord; the sink thread
+# writes the face crops and inserts the alert rows on its own long-lived SQLite connection,
+# batching everything that queued up meanwhile into one transaction (one SD-card commit).
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import cv2
+
+import config # Import the new config file
+from .db_utils import connect_db, save_alerts
+from .pipeline import BoundedQueue, BLOCK
+from .thumbnails import write_thumbnails
+
+# One alert to persist. criminal_id comes from the match, so storing an alert needs no database reads.
+AlertRecord = namedtuple("AlertRecord", ["name", "criminal_id", "face_image", "image_path", "timestamp", "terminal_id"])
+
+
+class AlertSink:
+    """
+    Writes alert images and database rows on a background thread.
+    submit() never touches the disk. flush() waits until everything submitted so far is stored;
+    stop() flushes and closes the connection. stats() reports the backlog and commit timings.
+    """
+
+    def __init__(self, batch_size=None, max_backlog=None, max_retries=None):
+        self.batch_size = config.ALERT_SINK_BATCH_SIZE if batch_size is None else batch_size
+        self.max_retries = config.ALERT_SINK_MAX_RETRIES if max_retries is None else max_retries
+        self.queue = BoundedQueue("alert_sink", config.ALERT_SINK_MAX_BACKLOG if max_backlog is None else max_backlog, BLOCK)
+        self._conn = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._idle = threading.Condition()
+        self._pending = 0 # Submitted but not yet stored (or given up on)
+        # Counters
+        self.saved = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_backlog = 0
+        self._commit_total = 0.0
+        self.max_commit = 0.0
+
+    def start(self):
+        self._conn = connect_db()
+        self._thread = threading.Thread(target=self._run, name="AlertSink", daemon=True)
+        self._thread.start()
+        print(f"ALERT_SINK: Started (batches of up to {self.batch_size} alerts per transaction).")
+
+    def submit(self, record):
+        """Queues an AlertRecord. Only blocks if ALERT_SINK_MAX_BACKLOG records are already waiting."""
+        with self._idle:
+            self._pending += 1
+            self.max_backlog = max(self.max_backlog, self._pending)
+        self.queue.put(record, self._stop_event)
+
+    @property
+    def backlog(self):
+        """Alerts submitted but not yet stored."""
+        with self._idle:
+            return self._pending
+
+    def flush(self, timeout=None):
+        """Waits until every submitted alert has been stored. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self, timeout=10):
+        """Flushes outstanding alerts, then stops the thread and closes the connection."""
+        if self._thread is None:
+            return
+        if not self.flush(timeout):
+            print(f"ALERT_SINK: Warning: {self.backlog} alert(s) still unsaved at shutdown.")
+        self._stop_event.set()
+        self._thread.join(timeout=2)
+        self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        print(f"ALERT_SINK: Stopped. {self.stats()}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            record = self.queue.get(timeout=0.2)
+            if record is None:
+                continue
+            batch = [record]
+            while len(batch) < self.batch_size:
+                record = self.queue.get(timeout=0)
+                if record is None:
+                    break
+                batch.append(record)
+            self._store_batch(batch)
+
+    def _store_batch(self, batch):
+        rows = []
+        for record in batch:
+            criminal_id = record.criminal_id
+            image_path = self._write_image(record) if criminal_id is not None else None
+            if criminal_id is None or image_path is None:
+                print(f"ALERT_SINK: Could not save alert for {record.name} "
+                      f"({'no criminal ID' if criminal_id is None else 'no face image'}).")
+                self.failed += 1
+                continue
+            # Stored in UTC like the column's CURRENT_TIMESTAMP default, but at detection time rather than commit time
+            timestamp = datetime.fromtimestamp(record.timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            rows.append((timestamp, criminal_id, image_path, record.terminal_id))
+
+        if rows:
+            self._insert_with_retries(rows)
+        with self._idle:
+            self._pending -= len(batch)
+            self._idle.notify_all()
+
+    def _write_image(self, record):
+        if record.face_image is None or record.face_image.size == 0:
+            return None
+        if not cv2.imwrite(record.image_path, record.face_image):
+            print(f"ALERT_SINK: Could not write face image to {record.image_path}")
+            return None
+        try:
+            write_thumbnails(record.image_path, record.face_image) # From memory, no read-back
+        except Exception as e: # The dashboard regenerates missing thumbnails; never lose the alert over one
+            print(f"ALERT_SINK: Could not write thumbnails for {record.image_path}: {e}")
+        return record.image_path
+
+    def _insert_with_retries(self, rows):
+        for attempt in range(1, self.max_retries + 1):
+            if self._conn is None:
+                self._conn = connect_db()
+                if self._conn is None:
+                    break
+            start = time.perf_counter()
+            try:
+                save_alerts(self._conn, rows)
+            except Exception as e:
+                print(f"ALERT_SINK: Error saving {len(rows)} alert(s) (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(0.2 * attempt)
+                continue
+            elapsed = time.perf_counter() - start
+            self._commit_total += elapsed
+            self.max_commit = max(self.max_commit, elapsed)
+            self.batches += 1
+            self.saved += len(rows)
+            print(f"ALERT_SINK: Saved {len(rows)} alert(s) in one transaction ({elapsed * 1000:.0f} ms).")
+            return
+        self.failed += len(rows)
+
+    def stats(self):
+        avg_commit = self._commit_total / self.batches if self.batches else 0.0
+        return (f"backlog {self.backlog} (max {self.max_backlog}), {self.saved} saved in {self.batches} transaction(s), "
+                f"{self.failed} failed, commit avg {avg_commit * 1000:.0f} ms / max {self.max_commit * 1000:.0f} ms")
@@ -0,0 +1,106 @@
+# detection/bench_detectors.py
+
+# Compares the face detector backends on a directory of images: per-frame latency, faces found
+# and agreement with HOG (a backend box agrees with a HOG box when their IoU is at least --iou).
+# Images are downscaled by DETECTOR_SCALE_FACTOR first, exactly as the detection pipeline does.
+# Backends that cannot be loaded (e.g. DNN without its model files) are skipped.
+#
+# Usage (from the project root):
+#   python -m detection.bench_detectors --images static/criminal_photos --repeat 3
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+import config # Import the new config file
+from .face_detectors import DETECTOR_BACKENDS, create_detector
+from .recognition import prepare_frame
+from .tracker import box_iou
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_images(image_dir):
+    """Loads every readable image in a directory as a prepared (downscaled RGB) frame."""
+    frames = []
+    for filename in sorted(os.listdir(image_dir)):
+        if filename.rsplit('.', 1)[-1].lower() not in config.ALLOWED_IMAGE_EXTENSIONS:
+            continue
+        image = cv2.imread(os.path.join(image_dir, filename))
+        if image is not None:
+            frames.append(prepare_frame(image))
+    if not frames:
+        raise SystemExit(f"No readable images found in {image_dir}")
+    return frames
+
+
+def run_backend(detector, frames, repeat):
+    """Returns (per-frame latencies in seconds, boxes found per frame)."""
+    detector.detect(frames[0]) # Warm-up (model loading, allocations)
+    latencies = []
+    boxes = []
+    for _ in range(repeat):
+        boxes = []
+        for rgb in frames:
+            start = time.perf_counter()
+            boxes.append(detector.detect(rgb))
+            latencies.append(time.perf_counter() - start)
+    return latencies, boxes
+
+
+def count_agreement(boxes, reference_boxes, iou_threshold):
+    """Number of reference boxes matched one-to-one by a box with IoU >= iou_threshold."""
+    matched = 0
+    for frame_boxes, frame_refs in zip(boxes, reference_boxes):
+        unused = list(frame_boxes)
+        for ref in frame_refs:
+            best = max(unused, key=lambda box: box_iou(box, ref), default=None)
+            if best is not None and box_iou(best, ref) >= iou_threshold:
+                unused.remove(best)
+                matched += 1
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends (latency, faces, agreement with HOG).")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "static", config.UPLOAD_FOLDER_NAME),
+                        help="Directory of test images.")
+    parser.add_argument("--backends", nargs="+", default=list(DETECTOR_BACKENDS), choices=list(DETECTOR_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the images per backend.")
+    parser.add_argument("--iou", type=float, default=0.4, help="IoU needed for a box to agree with a HOG box.")
+    args = parser.parse_args()
+
+    frames = load_images(args.images)
+    print(f"{len(frames)} images (after DETECTOR_SCALE_FACTOR), {args.repeat} pass(es) per backend")
+
+    results = {}
+    backends = ["hog"] + [b for b in args.backends if b != "hog"] # HOG is the reference
+    for kind in backends:
+        try:
+            detector = create_detector(kind, fallback=False)
+        except (FileNotFoundError, ImportError, cv2.error) as e:
+            print(f"Skipping '{kind}': {e}")
+            continue
+        results[kind] = run_backend(detector, frames, args.repeat)
+
+    hog_boxes = results["hog"][1]
+    hog_faces = sum(len(b) for b in hog_boxes)
+    print(f"{'backend':>8} {'mean ms':>8} {'p95 ms':>7} {'faces':>6} {'recall':>7} {'precision':>9}")
+    for kind, (latencies, boxes) in results.items():
+        if kind not in args.backends:
+            continue
+        latencies_ms = np.array(latencies) * 1000
+        faces = sum(len(b) for b in boxes)
+        agreed = count_agreement(boxes, hog_boxes, args.iou)
+        # recall: share of HOG faces this backend also found; precision: share of its faces HOG also found
+        recall = agreed / hog_faces if hog_faces else 0.0
+        precision = agreed / faces if faces else 0.0
+        print(f"{kind:>8} {latencies_ms.mean():>8.1f} {np.percentile(latencies_ms, 95):>7.1f} {faces:>6} "
+              f"{recall:>7.1%} {precision:>9.1%}")
+
+
+if __name__ == '__main__':
+    main()
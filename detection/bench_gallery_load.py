@@ -0,0 +1,100 @@
+# detection/bench_gallery_load.py
+
+# Benchmark for loading the gallery from SQLite: pickled float64 encodings (the old format,
+# unpickled row by row) versus the binary float32 format of encoding_format.py (bulk-decoded by
+# db_utils.get_gallery). Builds a throwaway database with synthetic criminals, also times the
+# database_setup.py migration between the two, and reports database sizes.
+#
+# Usage (from the project root):
+#   python -m detection.bench_gallery_load
+#   python -m detection.bench_gallery_load --rows 10000 100000 --repeat 5
+
+import argparse
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import config # Import the new config file
+from database_setup import migrate_face_encodings
+from .db_utils import get_gallery
+
+
+def build_database(path, encodings):
+    """Creates a criminals table holding `encodings` as pickled float64 arrays (the old format)."""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE criminals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            photo_path TEXT UNIQUE,
+            face_encoding BLOB NOT NULL,
+            status TEXT NOT NULL DEFAULT 'active'
+        )
+    """)
+    with conn:
+        conn.executemany("INSERT INTO criminals (name, face_encoding) VALUES (?, ?)",
+                         ((f"Criminal {i}", pickle.dumps(e.astype(np.float64))) for i, e in enumerate(encodings)))
+    return conn
+
+
+def load_pickled(conn):
+    """The old loader: one pickle.loads per row, then stack."""
+    ids, names, encodings = [], [], []
+    for criminal_id, name, blob in conn.execute("SELECT id, name, face_encoding FROM criminals"):
+        ids.append(criminal_id)
+        names.append(name)
+        encodings.append(pickle.loads(blob))
+    return np.asarray(ids), names, np.vstack(encodings).astype(np.float32)
+
+
+def best_of(func, repeat):
+    """Best wall-clock time of `repeat` runs, in seconds, and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(sizes, repeat, seed):
+    rng = np.random.default_rng(seed)
+    dim = config.FACE_ENCODING_DIM
+    print(f"{'rows':>8} {'format':<8} {'load_ms':>9} {'db_MiB':>8}")
+    for size in sizes:
+        encodings = rng.normal(0.0, 1.0 / np.sqrt(dim), size=(size, dim))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            conn = build_database(path, encodings)
+            pickled_s, (_, _, before) = best_of(lambda: load_pickled(conn), repeat)
+            print(f"{size:>8} {'pickle':<8} {pickled_s * 1000:>9.1f} {os.path.getsize(path) / 2**20:>8.1f}")
+
+            start = time.perf_counter()
+            migrate_face_encodings(conn)
+            migrate_s = time.perf_counter() - start
+            conn.execute("VACUUM")
+            binary_s, gallery = best_of(lambda: get_gallery(conn), repeat)
+            print(f"{size:>8} {'binary':<8} {binary_s * 1000:>9.1f} {os.path.getsize(path) / 2**20:>8.1f}"
+                  f"   (migration {migrate_s:.1f}s, {pickled_s / binary_s:.1f}x faster load)")
+            if not np.allclose(before, gallery.encodings, atol=1e-6):
+                print("  WARNING: decoded encodings differ from the pickled originals.")
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery load time: pickled vs binary encodings.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Gallery sizes to test.")
+    parser.add_argument("--repeat", type=int, default=3, help="Loads per format; the best time is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.repeat, args.seed)
+
+
+if __name__ == '__main__':
+    main()
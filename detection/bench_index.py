@@ -0,0 +1,95 @@
+# detection/bench_index.py
+
+# Benchmark for the gallery indexes in face_index.py.
+# Builds synthetic galleries that look like dlib encodings (128-d, norm ~1), queries them with
+# noisy copies of enrolled faces and reports build time, recall@1 against the exact brute-force
+# answer and per-query latency.
+#
+# Usage (from the project root):
+#   python -m detection.bench_index
+#   python -m detection.bench_index --sizes 1000 100000 1000000 --nprobe 4 8 16 --queries 200
+
+import argparse
+import time
+
+import numpy as np
+
+import config # Import the new config file
+from .face_index import BruteForceIndex, IVFIndex
+
+
+def make_gallery(size, dim, rng):
+    """Random encodings with per-component spread similar to dlib's (vector norm around 1)."""
+    return rng.normal(0.0, 1.0 / np.sqrt(dim), size=(size, dim)).astype(np.float32)
+
+
+def make_queries(gallery, count, noise, rng):
+    """Noisy re-captures of random gallery entries (noise is the expected distance to the original)."""
+    picks = rng.integers(0, len(gallery), size=count)
+    jitter = rng.normal(0.0, noise / np.sqrt(gallery.shape[1]), size=(count, gallery.shape[1]))
+    return (gallery[picks] + jitter).astype(np.float32)
+
+
+def time_queries(index, queries):
+    """Searches one query at a time (a frame rarely holds more than a few faces). Returns (labels, ms/query)."""
+    labels = np.empty(len(queries), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        labels[i] = index.search(query[None, :], k=1)[0][0, 0]
+    elapsed = time.perf_counter() - start
+    return labels, elapsed * 1000.0 / len(queries)
+
+
+def run_benchmark(sizes, nlists, nprobes, num_queries, noise, seed):
+    rng = np.random.default_rng(seed)
+    dim = config.FACE_ENCODING_DIM
+    print(f"{'size':>9} {'index':<22} {'build_s':>8} {'recall@1':>9} {'ms/query':>9}")
+    for size in sizes:
+        gallery = make_gallery(size, dim, rng)
+        labels = np.arange(size)
+        queries = make_queries(gallery, num_queries, noise, rng)
+
+        start = time.perf_counter()
+        brute = BruteForceIndex(dim)
+        brute.add(labels, gallery)
+        build_s = time.perf_counter() - start
+        truth, ms = time_queries(brute, queries)
+        print(f"{size:>9} {'brute':<22} {build_s:>8.2f} {1.0:>9.3f} {ms:>9.3f}")
+
+        nlist_values = nlists or [max(16, int(np.sqrt(size)))]
+        for nlist in nlist_values:
+            if nlist > size:
+                continue
+            start = time.perf_counter()
+            ivf = IVFIndex(dim, nlist=nlist, nprobe=1, train_size=min(size, max(config.IVF_TRAIN_SIZE, 40 * nlist)))
+            ivf.train(gallery)
+            ivf.add(labels, gallery)
+            build_s = time.perf_counter() - start
+            for nprobe in nprobes:
+                if nprobe > nlist:
+                    continue
+                ivf.nprobe = nprobe
+                found, ms = time_queries(ivf, queries)
+                recall = float(np.mean(found == truth))
+                name = f"ivf nlist={nlist} np={nprobe}"
+                print(f"{size:>9} {name:<22} {build_s:>8.2f} {recall:>9.3f} {ms:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery indexes: recall@1 and query latency.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="Gallery sizes to test (1M entries needs ~1 GB of RAM).")
+    parser.add_argument("--nlist", type=int, nargs="+", default=None,
+                        help="IVF bucket counts to test (default: sqrt(size)).")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32],
+                        help="IVF buckets scanned per query.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of probe faces per gallery size.")
+    parser.add_argument("--noise", type=float, default=0.35,
+                        help="Typical distance between a probe and its enrolled encoding.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.nlist, args.nprobe, args.queries, args.noise, args.seed)
+
+
+if __name__ == '__main__':
+    main()
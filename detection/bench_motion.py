@@ -0,0 +1,138 @@
+# detection/bench_motion.py
+
+# Motion-to-capture latency check. Drives the PIR pin through gpio_mock.inject_edge, with
+# MotionMonitor wired to a LatestFrameGrabber the way detector.py wires it to the pipeline, and
+# checks that:
+#   - edges inside the debounce time are ignored and motion state follows the pin level,
+#   - the motion listener fires on the rising edge, and the first frame is captured within --max-ms,
+#   - record_match() reports the latency for the first match after a rising edge only.
+# A simulated camera stands in for cv2.VideoCapture. Exits with status 1 if any check fails.
+#
+# Usage (from the project root):
+#   python -m detection.bench_motion --trials 20 --fps 30 --max-ms 300
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import config # Import the new config file
+from . import gpio_mock
+from .capture import LatestFrameGrabber
+from .motion import MotionMonitor
+
+PIN = config.MOTION_SENSOR_PIN
+
+
+class SimulatedCamera:
+    """Stands in for cv2.VideoCapture: each grab() takes one frame interval, like a real camera."""
+
+    def __init__(self, fps, shape=(480, 640, 3)):
+        self.interval = 1.0 / fps
+        self.frame = np.zeros(shape, dtype=np.uint8)
+
+    def grab(self):
+        time.sleep(self.interval)
+        return True
+
+    def retrieve(self):
+        return True, self.frame
+
+
+def check(condition, message, failures):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+def check_debounce(monitor, debounce_ms, failures):
+    print("Debounce:")
+    t = time.monotonic() + 10 # Explicit edge times, well clear of any earlier edge
+    step = debounce_ms / 1000
+    check(gpio_mock.inject_edge(PIN, gpio_mock.HIGH, t), "rising edge fires the callback", failures)
+    check(monitor.motion_active, "motion active after the rising edge", failures)
+    check(not gpio_mock.inject_edge(PIN, gpio_mock.LOW, t + step / 2), "falling edge inside the debounce time is ignored", failures)
+    check(monitor.motion_active, "motion still active after the ignored edge", failures)
+    gpio_mock.inject_edge(PIN, gpio_mock.HIGH, t + step * 0.9) # Bounces back before the debounce time ends
+    check(gpio_mock.inject_edge(PIN, gpio_mock.LOW, t + step * 2), "falling edge after the debounce time fires", failures)
+    check(not monitor.motion_active, "motion inactive after the falling edge", failures)
+    return t + step * 2
+
+
+def measure_latency(monitor, grabber, listener_times, trials, debounce_ms, last_edge):
+    """Returns (callback latencies, capture latencies) in seconds, one per trial."""
+    callback_latencies, capture_latencies = [], []
+    edge_time = last_edge
+    for _ in range(trials):
+        grabber.set_active(False)
+        time.sleep(0.05) # Let the grab loop go idle, as between detection windows
+        listener_times.clear()
+        edge_time += 2 * debounce_ms / 1000
+        if gpio_mock.input(PIN) == gpio_mock.HIGH:
+            gpio_mock.inject_edge(PIN, gpio_mock.LOW, edge_time)
+            edge_time += 2 * debounce_ms / 1000
+        before = time.time()
+        gpio_mock.inject_edge(PIN, gpio_mock.HIGH, edge_time)
+        item = grabber.read_latest(timeout=2)
+        if not listener_times or item is None:
+            continue
+        callback_latencies.append(listener_times[0] - before)
+        capture_latencies.append(item[1] - monitor.last_rise_time)
+    return callback_latencies, capture_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check motion debouncing and motion-to-capture latency with gpio_mock.")
+    parser.add_argument("--trials", type=int, default=20, help="Rising edges to measure.")
+    parser.add_argument("--fps", type=float, default=30, help="Frame rate of the simulated camera.")
+    parser.add_argument("--debounce-ms", type=int, default=config.MOTION_DEBOUNCE_MS)
+    parser.add_argument("--max-ms", type=float, default=300,
+                        help="Fail if the worst edge-to-first-frame latency is above this.")
+    args = parser.parse_args()
+
+    gpio_mock.pin_states[PIN] = gpio_mock.LOW
+    monitor = MotionMonitor(gpio_mock, PIN, debounce_ms=args.debounce_ms)
+    monitor.start()
+    grabber = LatestFrameGrabber(SimulatedCamera(args.fps), name="simulated")
+    grabber.start()
+    listener_times = []
+
+    def on_motion(timestamp):
+        # Same wiring as detector.py: start capturing straight from the edge callback
+        listener_times.append(time.time())
+        grabber.set_active(True)
+
+    monitor.add_listener(on_motion)
+
+    failures = []
+    try:
+        last_edge = check_debounce(monitor, args.debounce_ms, failures)
+        print(f"Latency ({args.trials} rising edges, {args.fps:g} fps camera, {config.CAPTURE_FLUSH_FRAMES} flush frames):")
+        callback_latencies, capture_latencies = measure_latency(monitor, grabber, listener_times, args.trials,
+                                                                args.debounce_ms, last_edge)
+        check(len(capture_latencies) == args.trials, f"{len(capture_latencies)}/{args.trials} edges captured a frame", failures)
+        if capture_latencies:
+            worst = max(capture_latencies) * 1000
+            print(f"  edge -> listener: median {statistics.median(callback_latencies) * 1000:.2f} ms, "
+                  f"max {max(callback_latencies) * 1000:.2f} ms")
+            print(f"  edge -> first frame: median {statistics.median(capture_latencies) * 1000:.0f} ms, max {worst:.0f} ms")
+            check(worst <= args.max_ms, f"worst edge-to-frame latency {worst:.0f} ms <= {args.max_ms:g} ms", failures)
+
+        print("First match:")
+        first = monitor.record_match(time.time())
+        check(first is not None and first >= 0, "first match after the rising edge reports its latency", failures)
+        check(monitor.record_match(time.time()) is None, "later matches in the same window report nothing", failures)
+    finally:
+        grabber.stop()
+        monitor.stop()
+
+    if failures:
+        print(f"{len(failures)} check(s) failed.")
+        sys.exit(1)
+    print("All checks passed.")
+
+
+if __name__ == '__main__':
+    main()
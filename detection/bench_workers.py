@@ -0,0 +1,87 @@
+# detection/bench_workers.py
+
+# Throughput benchmark for the face worker pool: runs HOG detection + encoding over a set of
+# images with 0 (in-process), 1, 2, ... N worker processes and reports frames per second.
+# Frames are submitted ahead and collected in order, as the detection pipeline does.
+#
+# Usage (from the project root):
+#   python -m detection.bench_workers --images static/criminal_photos --frames 60 --max-workers 4
+
+import argparse
+import os
+import time
+from collections import deque
+
+import cv2
+
+import config # Import the new config file
+from .recognition import prepare_frame, locate_faces, encode_faces
+from .worker_pool import FaceWorkerPool, DETECT
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_frames(image_dir, count):
+    """Loads images as BGR frames (resized to the first image's size) and repeats them up to `count`."""
+    images = []
+    for filename in sorted(os.listdir(image_dir)):
+        if filename.rsplit('.', 1)[-1].lower() not in config.ALLOWED_IMAGE_EXTENSIONS:
+            continue
+        image = cv2.imread(os.path.join(image_dir, filename))
+        if image is None:
+            continue
+        if images:
+            image = cv2.resize(image, (images[0].shape[1], images[0].shape[0]))
+        images.append(image)
+    if not images:
+        raise SystemExit(f"No readable images found in {image_dir}")
+    return [prepare_frame(images[i % len(images)]) for i in range(count)]
+
+
+def run_in_process(frames):
+    start = time.perf_counter()
+    faces = 0
+    for rgb in frames:
+        locations = locate_faces(rgb)
+        faces += len(encode_faces(rgb, locations))
+    return time.perf_counter() - start, faces
+
+
+def run_with_pool(frames, num_workers):
+    with FaceWorkerPool(num_workers) as pool:
+        pool.detect(frames[0]) # Warm-up: workers load the dlib models
+        start = time.perf_counter()
+        faces = 0
+        in_flight = deque()
+        for rgb in frames:
+            if len(in_flight) >= pool.num_slots:
+                prev_rgb, ticket = in_flight.popleft()
+                faces += len(pool.encode(prev_rgb, pool.result(ticket)))
+            in_flight.append((rgb, pool.submit(DETECT, rgb)))
+        while in_flight:
+            prev_rgb, ticket = in_flight.popleft()
+            faces += len(pool.encode(prev_rgb, pool.result(ticket)))
+        return time.perf_counter() - start, faces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detection/encoding throughput vs worker count.")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "static", config.UPLOAD_FOLDER_NAME),
+                        help="Directory of test images.")
+    parser.add_argument("--frames", type=int, default=60, help="Frames to process per run.")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.frames)
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]} (after DETECTOR_SCALE_FACTOR)")
+    print(f"{'workers':>8} {'seconds':>8} {'fps':>7} {'speedup':>8} {'faces':>6}")
+    elapsed, faces = run_in_process(frames)
+    baseline = elapsed
+    print(f"{'inline':>8} {elapsed:>8.2f} {len(frames) / elapsed:>7.2f} {1.0:>8.2f} {faces:>6}")
+    for num_workers in range(1, args.max_workers + 1):
+        elapsed, faces = run_with_pool(frames, num_workers)
+        print(f"{num_workers:>8} {elapsed:>8.2f} {len(frames) / elapsed:>7.2f} {baseline / elapsed:>8.2f} {faces:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,418 @@
+# detection/bulk_import.py
+
+# Bulk criminal import: a ZIP archive or a folder of photos plus a CSV manifest, e.g. a police
+# watchlist of thousands of people. Faces are found and encoded across a process pool (the same
+# encoder as background enrolment, but photos with several faces are rejected rather than guessed
+# at), and criminals are inserted in batched transactions of BULK_IMPORT_BATCH_SIZE rows.
+#
+# Manifest: manifest.csv at the top of the archive/folder (or given separately), with a header row
+# and the columns photo (path inside the archive/folder), name and optionally description.
+#
+# Every manifest row gets a bulk_import_rows entry (database_setup.py migration 5) in the same
+# transaction as its criminal, so an interrupted import resumes where it stopped: running it again
+# with the same manifest skips the rows already done. Rejected rows (unreadable photo, no face,
+# several faces, missing fields) are listed in a CSV report.
+#
+# Usage (from the project root):
+#   python -m detection.bulk_import watchlist.zip
+#   python -m detection.bulk_import photos/ --manifest watchlist.csv --processes 4
+
+import argparse
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import signal
+import time
+import zipfile
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+import config # Import the new config file
+from .db_utils import PARENT_DIR, connect_db
+from .encoding_format import encode_encoding
+from .enrolment import STATUS_ACTIVE, encode_image
+from .gallery_snapshot import SnapshotCompiler, compile_snapshot
+from .thumbnails import write_thumbnails
+
+MANIFEST_NAME = "manifest.csv"
+IMPORTS_DIR = os.path.join(PARENT_DIR, "data", "imports") # Reject reports and archives uploaded via the dashboard
+
+# bulk_imports.status
+IMPORT_RUNNING = "running"
+IMPORT_DONE = "done"
+IMPORT_FAILED = "failed"
+
+# bulk_import_rows.status
+ROW_IMPORTED = "imported"
+ROW_REJECTED = "rejected"
+
+# One manifest entry; row_number is its line in the CSV file (the header is line 1)
+ManifestRow = namedtuple("ManifestRow", ["row_number", "photo", "name", "description"])
+# Outcome of one row: the encoding and stored photo path, or the reason it was rejected
+RowResult = namedtuple("RowResult", ["row_number", "encoding", "photo_path", "reason"])
+
+
+class PhotoSource:
+    """Reads the manifest and photos of an import from a ZIP archive or a folder."""
+
+    def __init__(self, path):
+        self.path = path
+        self.prefix = ""
+        if os.path.isdir(path):
+            self._zip = None
+            self._root = os.path.realpath(path)
+        elif zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            # Archives made by zipping a folder have everything under one top-level directory
+            names = self._zip.namelist()
+            if MANIFEST_NAME not in names:
+                nested = [name for name in names if name.endswith("/" + MANIFEST_NAME)]
+                if len(nested) == 1:
+                    self.prefix = nested[0][:-len(MANIFEST_NAME)]
+        else:
+            raise ValueError(f"{path} is neither a ZIP archive nor a folder.")
+
+    def read(self, name):
+        """
+        Returns a file's bytes.
+        Raises:
+            ValueError: With the reason if the file is missing, too large or outside the source.
+        """
+        max_bytes = config.BULK_IMPORT_MAX_PHOTO_MB * 2**20
+        if self._zip is not None:
+            try:
+                info = self._zip.getinfo(self.prefix + name.replace("\\", "/").lstrip("/"))
+            except KeyError:
+                raise ValueError("Photo not found in the archive.") from None
+            if info.file_size > max_bytes:
+                raise ValueError(f"Photo is larger than {config.BULK_IMPORT_MAX_PHOTO_MB} MB.")
+            return self._zip.read(info)
+        path = os.path.realpath(os.path.join(self._root, name))
+        if not path.startswith(self._root + os.sep):
+            raise ValueError("Photo path points outside the import folder.")
+        if not os.path.isfile(path):
+            raise ValueError("Photo not found in the folder.")
+        if os.path.getsize(path) > max_bytes:
+            raise ValueError(f"Photo is larger than {config.BULK_IMPORT_MAX_PHOTO_MB} MB.")
+        with open(path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_manifest(source, manifest=None):
+    """The manifest's raw bytes: the separate manifest file if given, else manifest.csv in the source."""
+    if manifest:
+        with open(manifest, "rb") as f:
+            return f.read()
+    with PhotoSource(source) as photos:
+        try:
+            return photos.read(MANIFEST_NAME)
+        except ValueError:
+            raise ValueError(f"No {MANIFEST_NAME} found in {source}.") from None
+
+
+def parse_manifest(data):
+    """
+    Parses a CSV manifest (UTF-8, header row with photo, name and optional description columns).
+    Returns:
+        list: ManifestRow per data row, blank lines skipped.
+    Raises:
+        ValueError: If the manifest cannot be decoded or lacks the required columns.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"The manifest is not UTF-8 text: {e}") from None
+    reader = csv.DictReader(io.StringIO(text, newline=""))
+    columns = {field.strip().lower(): field for field in reader.fieldnames or [] if field}
+    if "photo" not in columns or "name" not in columns:
+        raise ValueError("The manifest needs a header row with 'photo' and 'name' columns (and optionally 'description').")
+    rows = []
+    for record in reader:
+        values = {key: (record.get(field) or "").strip() for key, field in columns.items()}
+        if any(values.values()):
+            rows.append(ManifestRow(reader.line_num, values["photo"], values["name"], values.get("description", "")))
+    return rows
+
+
+def start_import(conn, source, manifest=None, force=False):
+    """
+    Registers an import, or finds the unfinished one for the same manifest so it can be resumed.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        source (str): ZIP archive or folder with the photos.
+        manifest (str, optional): CSV manifest file; defaults to manifest.csv inside the source.
+        force (bool): Start a new import even if this manifest was already imported completely.
+    Returns:
+        int: The import ID (an existing one if resuming, or if already done and not forced).
+    Raises:
+        ValueError: If the source or manifest is unusable.
+    """
+    source = os.path.abspath(source)
+    manifest = os.path.abspath(manifest) if manifest else None
+    data = read_manifest(source, manifest)
+    rows = parse_manifest(data)
+    if not rows:
+        raise ValueError("The manifest has no rows.")
+    digest = hashlib.sha256(data).hexdigest()
+    with conn:
+        existing = conn.execute("SELECT id, status FROM bulk_imports WHERE manifest_sha256 = ? ORDER BY id DESC LIMIT 1",
+                                (digest,)).fetchone()
+        if existing is not None and (existing[1] != IMPORT_DONE or not force):
+            if existing[1] != IMPORT_DONE: # Resume, possibly from a re-uploaded copy of the archive
+                conn.execute("UPDATE bulk_imports SET source = ?, manifest = ? WHERE id = ?",
+                             (source, manifest, existing[0]))
+            return existing[0]
+        return conn.execute("""
+            INSERT INTO bulk_imports (source, manifest, manifest_sha256, status, total)
+            VALUES (?, ?, ?, ?, ?)
+        """, (source, manifest, digest, IMPORT_RUNNING, len(rows))).lastrowid
+
+
+def _stored_photo_name(import_id, row):
+    """File name in the criminal photos folder; unique per import and row, so a resumed import overwrites its own copy."""
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(row.photo.replace("\\", "/")))[-80:]
+    return f"import{import_id}_{row.row_number}_{name}"
+
+
+# --- Pool workers ---
+_worker_source = None
+
+def _init_worker(source):
+    global _worker_source
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C is handled by the parent, which stops the pool
+    _worker_source = PhotoSource(source)
+
+
+def _encode_row(task):
+    """Encodes one photo; on success copies it to the criminal photos folder (with thumbnails)."""
+    row_number, photo, stored_name = task
+    try:
+        data = _worker_source.read(photo)
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        encoding, reason = encode_image(image, reject_multiple=True)
+        if encoding is None:
+            return RowResult(row_number, None, None, reason)
+        photo_path = os.path.join(config.UPLOAD_FOLDER_NAME, stored_name)
+        destination = os.path.join(PARENT_DIR, "static", photo_path)
+        with open(destination, "wb") as f:
+            f.write(data)
+        write_thumbnails(destination, image)
+        return RowResult(row_number, encode_encoding(encoding), photo_path, None)
+    except ValueError as e:
+        return RowResult(row_number, None, None, str(e))
+    except Exception as e:
+        return RowResult(row_number, None, None, f"Error processing the photo: {e}")
+
+
+def _store_batch(conn, import_id, rows, results):
+    """Inserts the criminals and row outcomes of one batch in a single transaction."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Skip rows another run of the same import already stored (e.g. a resume started twice)
+        numbers = [result.row_number for result in results]
+        placeholders = ",".join("?" * len(numbers))
+        stored = {row[0] for row in conn.execute(
+            f"SELECT row_number FROM bulk_import_rows WHERE import_id = ? AND row_number IN ({placeholders})",
+            [import_id] + numbers)}
+        imported = rejected = 0
+        for result in results:
+            if result.row_number in stored:
+                continue
+            row = rows[result.row_number]
+            criminal_id = None
+            if result.encoding is not None:
+                criminal_id = conn.execute(
+                    "INSERT INTO criminals (name, description, photo_path, face_encoding, status) VALUES (?, ?, ?, ?, ?)",
+                    (row.name, row.description or None, result.photo_path, result.encoding, STATUS_ACTIVE)).lastrowid
+                imported += 1
+            else:
+                rejected += 1
+            conn.execute("""
+                INSERT INTO bulk_import_rows (import_id, row_number, photo, name, status, criminal_id, reason)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (import_id, result.row_number, row.photo, row.name,
+                  ROW_IMPORTED if criminal_id is not None else ROW_REJECTED, criminal_id, result.reason))
+        conn.execute("UPDATE bulk_imports SET imported = imported + ?, rejected = rejected + ?, "
+                     "updated_at = CURRENT_TIMESTAMP WHERE id = ?", (imported, rejected, import_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run_import(import_id, processes=None, batch_size=None, snapshot_batches=False):
+    """
+    Imports (or resumes) a registered import: encodes the remaining rows across a process pool and
+    stores them in batches. Safe to interrupt at any point; run it again to continue.
+    Args:
+        import_id (int): From start_import().
+        processes (int, optional): Pool size; defaults to config.BULK_IMPORT_PROCESSES (None = all CPUs).
+        batch_size (int, optional): Rows per transaction; defaults to config.BULK_IMPORT_BATCH_SIZE.
+        snapshot_batches (bool): Also recompile the gallery snapshot in the background after each
+            batch, so detectors see long imports as they go. The snapshot is always compiled at the end.
+    Returns:
+        dict: The import's final counts (see get_import).
+    """
+    processes = processes or config.BULK_IMPORT_PROCESSES or os.cpu_count()
+    batch_size = batch_size or config.BULK_IMPORT_BATCH_SIZE
+    conn = connect_db()
+    if conn is None:
+        return None
+    compiler = SnapshotCompiler() if snapshot_batches else None
+    try:
+        info = get_import(conn, import_id)
+        if info is None or info["status"] == IMPORT_DONE:
+            return info
+        try:
+            manifest_rows = parse_manifest(read_manifest(info["source"], info["manifest"]))
+        except (OSError, ValueError) as e:
+            _set_status(conn, import_id, IMPORT_FAILED, str(e))
+            print(f"BULK_IMPORT: Import {import_id} failed: {e}")
+            return get_import(conn, import_id)
+        _set_status(conn, import_id, IMPORT_RUNNING)
+        rows = {row.row_number: row for row in manifest_rows}
+        done = {row[0] for row in conn.execute("SELECT row_number FROM bulk_import_rows WHERE import_id = ?",
+                                               (import_id,))}
+        remaining = [row for row in manifest_rows if row.row_number not in done]
+        print(f"BULK_IMPORT: Import {import_id}: {len(remaining)} of {len(manifest_rows)} rows to process "
+              f"with {processes} processes{' (resuming)' if done else ''}.")
+
+        # Rows that can be rejected without looking at the photo
+        invalid = [RowResult(row.row_number, None, None, "Missing photo." if not row.photo else "Missing name.")
+                   for row in remaining if not row.photo or not row.name]
+        tasks = [(row.row_number, row.photo, _stored_photo_name(import_id, row))
+                 for row in remaining if row.photo and row.name]
+        if invalid:
+            _store_batch(conn, import_id, rows, invalid)
+
+        os.makedirs(os.path.join(PARENT_DIR, "static", config.UPLOAD_FOLDER_NAME), exist_ok=True)
+        start = time.perf_counter()
+        processed = 0
+        batch = []
+        try:
+            with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(info["source"],)) as pool:
+                for result in pool.imap_unordered(_encode_row, tasks, chunksize=4):
+                    batch.append(result)
+                    if len(batch) >= batch_size:
+                        _store_batch(conn, import_id, rows, batch)
+                        if compiler is not None:
+                            compiler.request() # Detectors pick up each batch without waiting for the whole import
+                        processed += len(batch)
+                        batch = []
+                        rate = processed / (time.perf_counter() - start)
+                        print(f"BULK_IMPORT: Import {import_id}: {processed}/{len(tasks)} photos "
+                              f"({rate:.1f}/s, about {(len(tasks) - processed) / rate / 60:.0f} min left).")
+                if batch:
+                    _store_batch(conn, import_id, rows, batch)
+        except KeyboardInterrupt:
+            raise # Left 'running'; the stored batches are kept and the next run resumes after them
+        except Exception as e:
+            _set_status(conn, import_id, IMPORT_FAILED, str(e))
+            print(f"BULK_IMPORT: Import {import_id} failed (run it again to resume): {e}")
+            raise
+        _set_status(conn, import_id, IMPORT_DONE)
+        info = get_import(conn, import_id)
+        print(f"BULK_IMPORT: Import {import_id} done: {info['imported']} imported, {info['rejected']} rejected "
+              f"in {time.perf_counter() - start:.0f}s.")
+        if info["rejected"]:
+            print(f"BULK_IMPORT: Rejected rows listed in {write_rejects_report(conn, import_id)}")
+        compile_snapshot(conn) # In the foreground: a CLI run exits right after this
+        return info
+    finally:
+        conn.close()
+
+
+def _set_status(conn, import_id, status, error=None):
+    with conn:
+        conn.execute("UPDATE bulk_imports SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                     (status, error, import_id))
+
+
+def get_import(conn, import_id):
+    """
+    Returns:
+        dict: id, source, manifest, status, error, total, imported, rejected, created_at, updated_at;
+            None if there is no such import.
+    """
+    keys = ("id", "source", "manifest", "status", "error", "total", "imported", "rejected", "created_at", "updated_at")
+    row = conn.execute(f"SELECT {', '.join(keys)} FROM bulk_imports WHERE id = ?", (import_id,)).fetchone()
+    return dict(zip(keys, tuple(row))) if row is not None else None
+
+
+def get_rejects(conn, import_id, limit=None):
+    """Rejected rows of an import in manifest order: (row_number, photo, name, reason) tuples."""
+    sql = ("SELECT row_number, photo, name, reason FROM bulk_import_rows WHERE import_id = ? AND status = ? "
+           "ORDER BY row_number")
+    params = [import_id, ROW_REJECTED]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [tuple(row) for row in conn.execute(sql, params)]
+
+
+def rejects_csv(conn, import_id):
+    """The reject report as CSV text: row, photo, name, reason."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["row", "photo", "name", "reason"])
+    writer.writerows(get_rejects(conn, import_id))
+    return out.getvalue()
+
+
+def write_rejects_report(conn, import_id, path=None):
+    """Writes the reject report to `path` (default data/imports/import_<id>_rejects.csv) and returns the path."""
+    path = path or os.path.join(IMPORTS_DIR, f"import_{import_id}_rejects.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(rejects_csv(conn, import_id))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import criminals in bulk from a ZIP archive or folder with a CSV manifest.")
+    parser.add_argument("source", help="ZIP archive or folder containing the photos.")
+    parser.add_argument("--manifest", default=None,
+                        help=f"CSV manifest (columns photo, name, description). Default: {MANIFEST_NAME} in the source.")
+    parser.add_argument("--processes", type=int, default=None, help="Encoding processes (default: all CPUs).")
+    parser.add_argument("--batch-size", type=int, default=None, help="Criminals inserted per transaction.")
+    parser.add_argument("--force", action="store_true", help="Import again even if this manifest was already imported.")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    if conn is None:
+        return
+    try:
+        import_id = start_import(conn, args.source, args.manifest, args.force)
+        info = get_import(conn, import_id)
+    except (OSError, ValueError) as e:
+        print(f"BULK_IMPORT: {e}")
+        return
+    finally:
+        conn.close()
+    if info["status"] == IMPORT_DONE:
+        print(f"BULK_IMPORT: This manifest was already imported (import {import_id}: {info['imported']} imported, "
+              f"{info['rejected']} rejected). Use --force to import it again.")
+        return
+    try:
+        run_import(import_id, args.processes, args.batch_size)
+    except KeyboardInterrupt:
+        print(f"BULK_IMPORT: Interrupted. Run the same command again to resume import {import_id}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# detection/capture.py
+
+import threading
+import time
+
+import cv2
+
+import config # Import the new config file
+
+
+def open_camera(indices=(0, 1)):
+    """
+    Opens the first camera index (or stream URL) that works.
+    Returns:
+        cv2.VideoCapture: The opened capture, or None if no camera could be opened.
+    """
+    for index in indices:
+        video_capture = cv2.VideoCapture(index)
+        if video_capture.isOpened():
+            # Keep the driver queue short so frames are not stale by the time we read them (not all backends support it)
+            video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            print(f"Successfully opened camera {index}.")
+            return video_capture
+        video_capture.release()
+    print(f"Error: Could not open video stream from any camera ({', '.join(str(i) for i in indices)}).")
+    return None
+
+
+class LatestFrameGrabber:
+    """
+    Runs its own grab loop and keeps only the newest frame.
+
+    While active, the thread calls grab() as fast as the camera delivers, which keeps the driver
+    buffer empty. retrieve() (the decode) only runs when a consumer is waiting in read_latest(),
+    so the frame handed out is always the one grabbed last; frames grabbed while nobody was waiting
+    are counted as dropped. A slow consumer therefore skips frames instead of falling behind.
+    When activated (motion begins) the frames buffered by the driver while idle are grabbed and
+    discarded first. Dropped-frame counts and capture-to-process lag are reported by stats().
+    """
+
+    def __init__(self, video_capture, flush_frames=None, name="camera"):
+        self.video_capture = video_capture
+        self.name = name
+        self.flush_frames = config.CAPTURE_FLUSH_FRAMES if flush_frames is None else flush_frames
+        self._cond = threading.Condition()
+        self._active = False
+        self._needs_flush = False
+        self._stop = False
+        self._thread = None
+        self._latest = None     # (seq, captured_at, frame)
+        self._last_read_seq = 0
+        self._seq = 0
+        self._waiting = 0       # Consumers blocked in read_latest()
+        # Counters
+        self.grabbed = 0
+        self.flushed = 0
+        self.dropped = 0        # Grabbed while no consumer was waiting (never decoded)
+        self.delivered = 0
+        self.failures = 0
+        self._lag_total = 0.0
+        self._lag_count = 0
+        self.max_lag = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"grabber-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def set_active(self, active):
+        """Starts/pauses grabbing. Activating flushes the frames the driver buffered while idle."""
+        with self._cond:
+            if active and not self._active:
+                self._needs_flush = True
+            self._active = active
+            self._cond.notify_all()
+
+    def read_latest(self, timeout=None):
+        """
+        Waits for a frame newer than the last one returned.
+        Returns:
+            tuple: (seq, captured_at, frame), or None on timeout.
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                self._cond.wait_for(lambda: self._stop or (self._latest and self._latest[0] > self._last_read_seq),
+                                    timeout)
+            finally:
+                self._waiting -= 1
+            if self._latest is None or self._latest[0] <= self._last_read_seq:
+                return None
+            self._last_read_seq = self._latest[0]
+            self.delivered += 1
+            return self._latest
+
+    def mark_processed(self, captured_at):
+        """Records capture-to-process lag for a frame whose processing is starting now."""
+        lag = time.time() - captured_at
+        with self._cond:
+            self._lag_total += lag
+            self._lag_count += 1
+            self.max_lag = max(self.max_lag, lag)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stop or self._active)
+                if self._stop:
+                    return
+                flush = self._needs_flush
+                self._needs_flush = False
+
+            if flush:
+                for _ in range(self.flush_frames):
+                    if not self.video_capture.grab():
+                        break
+                    self.flushed += 1
+
+            if not self.video_capture.grab():
+                self.failures += 1
+                print(f"CAPTURE: Error: Failed to grab frame from {self.name}.")
+                time.sleep(0.1)
+                continue
+            captured_at = time.time()
+            with self._cond:
+                self.grabbed += 1
+                if not self._waiting:
+                    self.dropped += 1
+                    continue
+            # Decode outside the lock; only this thread touches the VideoCapture
+            ret, frame = self.video_capture.retrieve()
+            if not ret:
+                self.failures += 1
+                continue
+            with self._cond:
+                self._seq += 1
+                self._latest = (self._seq, captured_at, frame)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            avg_lag = self._lag_total / self._lag_count if self._lag_count else 0.0
+            return (f"{self.grabbed} grabbed, {self.delivered} delivered, {self.dropped} dropped, "
+                    f"{self.flushed} flushed, {self.failures} failures, "
+                    f"lag avg {avg_lag * 1000:.0f} ms / max {self.max_lag * 1000:.0f} ms")
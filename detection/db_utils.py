@@ -3,7 +3,11 @@
 import sqlite3
 import numpy as np
 import os
-import pickle # Using pickle for numpy array serialization
+from collections import namedtuple
+
+import config # Import the new config file
+from .encoding_format import decode_encoding, decode_encodings
+from .queries import CRIMINAL_BY_NAME
 
 # Assuming database_setup.py is in the parent directory
 # and defines DATABASE_PATH or similar
@@ -12,42 +16,28 @@ DATABASE_NAME = "facial_recognition.db"
 DATABASE_DIR = os.path.join(PARENT_DIR, "data")
 DATABASE_PATH = os.path.join(DATABASE_DIR, DATABASE_NAME)
 
+# The known-criminals gallery as loaded from the database: criminal IDs (int64 array), names (list)
+# and the float32 encoding matrix, all in the same row order. Matches carry the criminal ID, so the
+# alert path never has to look a criminal up by name.
+Gallery = namedtuple("Gallery", ["ids", "names", "encodings"])
+
 
 def get_known_face_encodings():
     """
-    Retrieves all known criminal names and their face encodings from the database.
+    Retrieves all known criminals and their face encodings from the database.
     Returns:
-        tuple: (list of known face encodings, list of known criminal names)
+        Gallery: (ids, names, encodings); empty if the database is missing or unreadable.
     """
-    known_face_encodings = []
-    known_criminal_names = []
-
     if not os.path.exists(DATABASE_PATH):
         print(f"Database file not found at {DATABASE_PATH}. Please run database_setup.py.")
-        return known_face_encodings, known_criminal_names
+        return empty_gallery()
 
     conn = None
+    gallery = empty_gallery()
     try:
         conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name, face_encoding FROM criminals")
-        rows = cursor.fetchall()
-
-        for row in rows:
-            name = row[0]
-            try:
-                # Deserialize the face encoding (assuming it's stored as a pickled numpy array)
-                encoding_blob = row[1]
-                encoding = pickle.loads(encoding_blob)
-                known_face_encodings.append(encoding)
-                known_criminal_names.append(name)
-            except pickle.UnpicklingError as e:
-                print(f"Error unpickling encoding for {name}: {e}. Skipping this entry.")
-            except Exception as e:
-                print(f"An unexpected error occurred while processing encoding for {name}: {e}. Skipping.")
-
-        print(f"Loaded {len(known_face_encodings)} known face encodings from the database.")
-
+        gallery = get_gallery(conn)
+        print(f"Loaded {len(gallery.ids)} known face encodings from the database.")
     except sqlite3.Error as e:
         print(f"Database error while fetching known faces: {e}")
     except Exception as e:
@@ -56,7 +46,109 @@ def get_known_face_encodings():
         if conn:
             conn.close()
 
-    return known_face_encodings, known_criminal_names
+    return gallery
+
+
+def connect_db():
+    """
+    Opens a long-lived connection to the database, e.g. for the gallery watcher which polls it.
+    Returns:
+        sqlite3.Connection: The connection, or None if the database file does not exist.
+    """
+    if not os.path.exists(DATABASE_PATH):
+        print(f"Database file not found at {DATABASE_PATH}. Please run database_setup.py.")
+        return None
+    return sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+
+
+def empty_gallery():
+    """Gallery with no entries (but correctly shaped arrays)."""
+    return Gallery(np.empty(0, dtype=np.int64), [], np.empty((0, config.FACE_ENCODING_DIM), dtype=np.float32))
+
+
+def get_gallery(conn, criminal_ids=None):
+    """
+    Loads criminal IDs, names and encodings for all active criminals, or only for the given IDs.
+    Criminals still waiting for (or failed) enrolment have no usable encoding and are left out.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        criminal_ids (iterable of int, optional): Restrict the query to these IDs.
+    Returns:
+        Gallery: Row i of `encodings` belongs to ids[i] / names[i]. IDs that no longer exist (or are
+            not active) are simply absent.
+    """
+    if criminal_ids is None:
+        rows = conn.execute("SELECT id, name, face_encoding FROM criminals WHERE status = 'active'").fetchall()
+    else:
+        criminal_ids = list(criminal_ids)
+        rows = []
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(criminal_ids), 500):
+            chunk = criminal_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(
+                f"SELECT id, name, face_encoding FROM criminals WHERE id IN ({placeholders}) AND status = 'active'",
+                chunk).fetchall())
+
+    if not rows:
+        return empty_gallery()
+    ids, names, blobs = zip(*rows)
+    try:
+        encodings = decode_encodings(blobs)
+    except ValueError:
+        # At least one bad or legacy (pickled) row: decode one by one and skip those
+        kept = []
+        for i, (criminal_id, name, blob) in enumerate(rows):
+            try:
+                decode_encoding(blob)
+                kept.append(i)
+            except ValueError as e:
+                print(f"Error decoding encoding for {name} (ID {criminal_id}): {e}. Skipping this entry.")
+        if not kept:
+            return empty_gallery()
+        ids, names = [ids[i] for i in kept], [names[i] for i in kept]
+        encodings = np.vstack([decode_encoding(blobs[i]) for i in kept]).astype(np.float32, copy=False)
+    return Gallery(np.asarray(ids, dtype=np.int64), list(names), encodings)
+
+
+def get_gallery_version(conn):
+    """
+    Returns the current gallery version (bumped by triggers on every criminals change),
+    or None if the database predates gallery version tracking.
+    """
+    try:
+        row = conn.execute("SELECT version FROM gallery_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def get_gallery_changes(conn, since_version):
+    """
+    Returns the set of criminal IDs that were inserted, updated or deleted after `since_version`,
+    or None if the change log no longer goes back that far (see prune_gallery_changes) and the
+    whole gallery has to be reloaded.
+    """
+    # Every version bump logs exactly one row, so a complete log has a row for since_version + 1
+    oldest = conn.execute("SELECT min(version) FROM gallery_changes").fetchone()[0]
+    if oldest is None or oldest > since_version + 1:
+        version = get_gallery_version(conn)
+        return None if version is not None and version > since_version else set()
+    rows = conn.execute("SELECT DISTINCT criminal_id FROM gallery_changes WHERE version > ?",
+                        (since_version,)).fetchall()
+    return {row[0] for row in rows}
+
+
+def prune_gallery_changes(conn, version):
+    """
+    Trims the gallery change log, keeping the last config.GALLERY_CHANGES_KEEP versions before
+    `version` so that detectors a little behind can still apply deltas. Commits.
+    Returns:
+        int: Number of rows deleted.
+    """
+    cursor = conn.execute("DELETE FROM gallery_changes WHERE version <= ?", (version - config.GALLERY_CHANGES_KEEP,))
+    conn.commit()
+    return cursor.rowcount
 
 
 def save_alert(criminal_id, detected_face_photo_path, terminal_id="bodaboda_terminal_01"):
@@ -94,14 +186,35 @@ def save_alert(criminal_id, detected_face_photo_path, terminal_id="bodaboda_term
             conn.close()
     return alert_id
 
-def get_criminal_id_by_name(name):
+def save_alerts(conn, rows):
+    """
+    Inserts several alerts in a single transaction (one commit).
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        rows (list): (timestamp, criminal_id, detected_face_photo_path, terminal_id) tuples.
+    """
+    with conn:
+        conn.executemany("""
+            INSERT INTO alerts (timestamp, criminal_id, detected_face_photo_path, terminal_id)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+
+
+def get_criminal_id_by_name(name, conn=None):
     """
     Retrieves the ID of a criminal by their name.
+    Not used by the detector (matches already carry the criminal ID); names are not unique,
+    so this returns an arbitrary one of the criminals sharing the name.
     Args:
         name (str): The name of the criminal.
+        conn (sqlite3.Connection, optional): Existing connection to use instead of opening one.
     Returns:
         int: The ID of the criminal, or None if not found.
     """
+    if conn is not None:
+        row = conn.execute(CRIMINAL_BY_NAME, (name,)).fetchone()
+        return row[0] if row else None
+
     if not os.path.exists(DATABASE_PATH):
         print(f"Database file not found at {DATABASE_PATH}.")
         return None
@@ -111,7 +224,7 @@ def get_criminal_id_by_name(name):
     try:
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
-        cursor.execute("SELECT id FROM criminals WHERE name = ?", (name,))
+        cursor.execute(CRIMINAL_BY_NAME, (name,))
         row = cursor.fetchone()
         if row:
             criminal_id = row[0]
@@ -128,15 +241,15 @@ if __name__ == '__main__':
     # Make sure you have run database_setup.py first
     # And potentially added some criminals via a yet-to-be-created admin interface or manually
 
-    # To test, you might need to manually insert a criminal with a pickled encoding.
+    # To test, you might need to manually insert a criminal with an encoding from detection.encoding_format.encode_encoding.
     # For now, this will likely return empty lists or print an error if DB is empty/not found.
     print("Attempting to load known face encodings...")
-    encodings, names = get_known_face_encodings()
-    if names:
-        print(f"Loaded names: {names}")
-        # Example: try to get ID of the first loaded criminal
-        first_criminal_name = names[0]
-        criminal_id = get_criminal_id_by_name(first_criminal_name)
+    gallery = get_known_face_encodings()
+    if gallery.names:
+        print(f"Loaded names: {gallery.names}")
+        # Example: the ID of the first loaded criminal comes with the gallery
+        first_criminal_name = gallery.names[0]
+        criminal_id = int(gallery.ids[0])
         if criminal_id:
             print(f"ID for {first_criminal_name}: {criminal_id}")
             # Example: try to save a dummy alert
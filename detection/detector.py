@@ -1,17 +1,31 @@
 # detection/detector.py
 
 import cv2
-import face_recognition
-import numpy as np
 import os
 import time
 import platform
 from datetime import datetime
 
-# Database utilities
-from .db_utils import get_known_face_encodings, save_alert, get_criminal_id_by_name
+# Background alert persistence
+from .alert_sink import AlertSink, AlertRecord
+# Gallery loading and hot reload
+from .gallery_watcher import GalleryWatcher
+# Gallery shared between detector processes
+from .gallery_store import GalleryPublisher, SharedGalleryReader
+# Face tracking across frames
+from .tracker import FaceTracker
+# Camera opening and latest-frame grabbing
+from .capture import open_camera, LatestFrameGrabber
+# Threaded capture/detect/encode/alert stages
+from .pipeline import DetectionPipeline, CameraStream
+# Multiprocess HOG detection/encoding
+from .worker_pool import FaceWorkerPool
 # LCD utilities
 from . import lcd_utils
+# Timer-driven buzzer
+from .actuators import BuzzerScheduler
+# Edge-triggered motion sensor
+from .motion import MotionMonitor
 import config # Import the new config file
 
 # GPIO settings from config
@@ -56,6 +70,13 @@ DETECTED_FACES_DIR = os.path.join(DATA_DIR, config.DETECTED_FACES_SUBDIR)
 IP_DISPLAYED_FLAG_FILE = os.path.join(DATA_DIR, config.IP_DISPLAYED_FLAG_FILENAME)
 os.makedirs(DETECTED_FACES_DIR, exist_ok=True)
 
+# Non-blocking buzzer driven by background timers
+buzzer = BuzzerScheduler(GPIO, BUZZER_PIN)
+# Edge-triggered PIR sensor (edge detection is enabled in setup_hardware)
+motion = MotionMonitor(GPIO, MOTION_SENSOR_PIN)
+# Writes alert images and rows on its own thread and connection (started in run_detection)
+alert_sink = AlertSink()
+
 # --- Hardware Setup and Control ---
 def setup_hardware():
     """Sets up Buzzer, Motion Sensor and LCD."""
@@ -68,6 +89,7 @@ def setup_hardware():
 
     # Motion Sensor
     GPIO.setup(MOTION_SENSOR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+    motion.start()
     print(f"DETECTOR: Motion sensor setup on GPIO pin {MOTION_SENSOR_PIN} ({'Actual RPi' if IS_RASPBERRY_PI else 'Mocked'})")
 
     # LCD
@@ -110,191 +132,175 @@ def old_setup_buzzer():
 #     else:
 #         print(f"Motion sensor setup on GPIO pin {MOTION_SENSOR_PIN} (Mocked)")
 
-def is_motion_detected():
-    return GPIO.input(MOTION_SENSOR_PIN) == GPIO.HIGH
-
 def trigger_buzzer_and_lcd_alert(criminal_name: str):
+    """Starts the buzzer pattern and shows the alert on the LCD. Returns immediately."""
     print(f"MATCH FOUND: {criminal_name}! Triggering buzzer and LCD alert.")
-    lcd_utils.display_message("CRIMINAL DETECTED!", criminal_name[:lcd_utils.DEFAULT_LCD_COLS], duration=BUZZER_DURATION) # Display for buzzer duration
-
-    GPIO.output(BUZZER_PIN, GPIO.HIGH)
-    time.sleep(BUZZER_DURATION) # Buzzer sounds while LCD shows message
-    GPIO.output(BUZZER_PIN, GPIO.LOW)
-
-    print("Buzzer finished.")
-    # After alert, LCD can revert to a general status or be cleared by next state
-    # For now, let the main loop handle subsequent LCD messages.
+    # Alerts pre-empt status messages on the LCD render thread for the length of the buzzer
+    lcd_utils.show_message("CRIMINAL DETECTED!", criminal_name[:config.LCD_COLS],
+                           priority=lcd_utils.PRIORITY_ALERT, ttl=BUZZER_DURATION)
+    buzzer.play(config.BUZZER_ALERT_PATTERN) # Switched off by a background timer
 
 
 def cleanup_resources():
+    motion.stop()
+    buzzer.stop()
     GPIO.cleanup()
     print(f"DETECTOR: GPIO cleanup done ({'Actual RPi' if IS_RASPBERRY_PI else 'Mocked'}).")
     lcd_utils.close_lcd()
     print("DETECTOR: LCD resources closed.")
 
-# --- Face Recognition Processing Function ---
-def process_frame_for_faces(frame, known_face_encodings, known_criminal_names, last_match_time):
+# --- Alert Handling (runs on the pipeline's alert sink thread) ---
+def handle_alert(alert):
+    """
+    Acts on a confirmed match: queues the alert record for the AlertSink (which writes the face
+    crop and the database row in the background) and triggers the buzzer/LCD.
+    """
+    name_match = alert.name
+    timestamp_str = datetime.fromtimestamp(alert.timestamp).strftime("%Y%m%d_%H%M%S")
+    filename = f"{name_match.replace(' ', '_')}_{alert.camera.name}_{timestamp_str}.jpg"
+    filepath = os.path.join(DETECTED_FACES_DIR, filename)
+    alert_sink.submit(AlertRecord(name_match, alert.criminal_id, alert.face_image, filepath, alert.timestamp,
+                                  alert.camera.terminal_id))
+
+    trigger_buzzer_and_lcd_alert(name_match) # Trigger buzzer and update LCD
+
+    latency = motion.record_match(alert.timestamp)
+    if latency is not None:
+        print(f"DETECTOR: Motion-to-first-match latency: {latency:.2f}s")
+
+
+# --- Cameras ---
+def open_cameras():
     """
-    Processes a single frame for face detection and recognition.
-    Returns the frame with detections drawn and a dictionary of match details.
-    Updates last_match_time in place.
+    Opens the cameras listed in config.CAMERA_SOURCES (or the single CAMERA_INDICES camera)
+    and starts a latest-frame grabber for each.
+    Returns:
+        list: (CameraStream, cv2.VideoCapture) for every camera that could be opened.
     """
-    # scale_factor = 0.5 # Now from config
-    small_frame = cv2.resize(frame, (0, 0), fx=config.DETECTOR_SCALE_FACTOR, fy=config.DETECTOR_SCALE_FACTOR)
-    rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-    face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-    face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-    detected_match_details = [] # To store info about matches in this frame
-
-    for (top_s, right_s, bottom_s, left_s), face_encoding in zip(face_locations, face_encodings):
-        name_match = "Unknown"
-        top = int(top_s / scale_factor)
-        right = int(right_s / scale_factor)
-        bottom = int(bottom_s / scale_factor)
-        left = int(left_s / scale_factor)
-
-        if known_face_encodings:
-            matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-            face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-
-            if True in matches:
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name_match = known_criminal_names[best_match_index]
-                    current_time = time.time()
-
-                    is_new_match = False
-                    if name_match not in last_match_time or \
-                       (current_time - last_match_time[name_match]) >= COOLDOWN_PERIOD:
-                        print(f"MATCH FOUND: {name_match}")
-                        last_match_time[name_match] = current_time
-                        is_new_match = True
-                    else:
-                        print(f"Matched {name_match} again within cooldown period. Displaying, but not re-triggering actions.")
-
-                    # Save image and alert only for new matches
-                    if is_new_match:
-                        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"{name_match.replace(' ', '_')}_{timestamp_str}.jpg"
-                        filepath = os.path.join(DETECTED_FACES_DIR, filename)
-
-                        h, w, _ = frame.shape
-                        face_image = frame[max(0,top):min(h,bottom), max(0,left):min(w,right)]
-
-                        if face_image.size > 0:
-                            cv2.imwrite(filepath, face_image)
-                            print(f"Saved detected face image to {filepath}")
-                        else:
-                            print(f"Could not save face image for {name_match} - cropped image is empty.")
-                            filepath = None
-
-                        criminal_id = get_criminal_id_by_name(name_match)
-                        if criminal_id and filepath:
-                            save_alert(criminal_id, filepath, terminal_id=TERMINAL_ID)
-                        elif not criminal_id:
-                            print(f"DETECTOR: Could not find criminal ID for {name_match}. Alert not saved to DB.")
-
-                        trigger_buzzer_and_lcd_alert(name_match) # Trigger buzzer and update LCD
-
-        # Draw visuals on the frame
-        cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
-        cv2.rectangle(frame, (left, bottom - 25), (right, bottom), (0, 0, 255), cv2.FILLED)
-        font = cv2.FONT_HERSHEY_DUPLEX
-        cv2.putText(frame, name_match, (left + 6, bottom - 6), font, 0.8, (255, 255, 255), 1)
-
-    return frame
+    sources = config.CAMERA_SOURCES or [{"name": "cam0", "indices": config.CAMERA_INDICES}]
+    opened = []
+    for i, source in enumerate(sources):
+        name = source.get("name", f"cam{i}")
+        video_capture = open_camera(source.get("indices", (source.get("source"),)))
+        if video_capture is None:
+            print(f"DETECTOR: Camera '{name}' could not be opened. Skipping it.")
+            continue
+        # Grabs continuously while active so we always process the newest frame, not the driver's backlog
+        grabber = LatestFrameGrabber(video_capture, name=name)
+        grabber.start()
+        camera = CameraStream(name, source.get("terminal_id", TERMINAL_ID), grabber, FaceTracker())
+        opened.append((camera, video_capture))
+    return opened
 
 
 # --- Main Detection Loop ---
-def run_detection():
-    known_face_encodings, known_criminal_names = get_known_face_encodings()
-    if not known_face_encodings:
-        print("No known faces loaded. Detection will be ineffective.")
-
-    video_capture = cv2.VideoCapture(0)
-    if not video_capture.isOpened():
-        video_capture = cv2.VideoCapture(1)
-        if not video_capture.isOpened():
-            print("Error: Could not open video stream from any camera. Exiting.")
-            return
-        print("Successfully opened camera 1.")
-    else:
-        print("Successfully opened camera 0.")
+def create_gallery_watcher():
+    """GalleryWatcher (optionally publishing to shared memory) or SharedGalleryReader, per config.GALLERY_SHARING."""
+    if config.GALLERY_SHARING == "attach":
+        return SharedGalleryReader()
+    if config.GALLERY_SHARING == "publish":
+        return GalleryWatcher(publisher=GalleryPublisher())
+    return GalleryWatcher()
 
+
+def run_detection():
+    gallery_watcher = create_gallery_watcher()
+    if not gallery_watcher.load():
+        print("No known faces loaded. Detection will be ineffective until criminals are added.")
+
+    opened_cameras = open_cameras()
+    if not opened_cameras:
+        print("Exiting.")
+        gallery_watcher.stop()
+        return
+    cameras = [camera for camera, _ in opened_cameras]
+
+    gallery_watcher.start() # Picks up dashboard changes without a restart (one gallery for all cameras)
+    alert_sink.start()
+    worker_pool = None
+    if config.FACE_WORKER_PROCESSES > 0:
+        worker_pool = FaceWorkerPool(config.FACE_WORKER_PROCESSES)
+        worker_pool.start()
+    pipeline = DetectionPipeline(cameras, lambda: gallery_watcher.matcher, handle_alert, worker_pool=worker_pool)
+    pipeline.start()
+    # Start capturing straight from the GPIO edge callback, without waiting for the main loop
+    motion.add_listener(lambda timestamp: pipeline.set_active(True))
     print("\nSystem ready. Waiting for motion. Press 'q' to quit.")
-    last_match_time = {}
-    active_detection_end_time = 0
+    last_stats_time = time.time()
     detection_active_this_motion = False
-    last_lcd_update_time = 0
-    lcd_update_interval = 5 # Update LCD status every 5 seconds if nothing else is happening
+    # From here on the LCD is driven by its render thread: messages never block this loop,
+    # alerts pre-empt status messages and the idle screen returns when they expire.
+    lcd_utils.start_renderer()
 
     try:
         # Initial LCD message if not handled by IP display
         if os.path.exists(IP_DISPLAYED_FLAG_FILE): # If IP was not shown, this is the first "ready" message
-             lcd_utils.display_message("System Ready", "Monitoring...", duration=2)
+             lcd_utils.show_message("System Ready", "Monitoring...", ttl=2)
 
         while True:
             current_time = time.time()
-            motion_now = is_motion_detected()
+            # The window runs until FACE_DETECTION_DURATION after motion was last seen,
+            # so it keeps extending while motion continues
+            active_detection_end_time = motion.window_end(current_time)
 
-            if motion_now:
+            if current_time < active_detection_end_time:
                 if not detection_active_this_motion:
-                    print(f"{datetime.now()}: Motion detected! Starting face detection for {FACE_DETECTION_DURATION}s.")
-                    lcd_utils.display_message("Motion Detected!", "Scanning...", duration=1) # Short message
-                    active_detection_end_time = current_time + FACE_DETECTION_DURATION
+                    print(f"{datetime.now()}: Motion detected! Starting face detection (until {FACE_DETECTION_DURATION}s after motion stops).")
+                    lcd_utils.show_message("Motion Detected!", "Scanning...", ttl=1) # Short message
                     detection_active_this_motion = True
-                # Optional: If motion continues, extend active_detection_end_time
-                # active_detection_end_time = current_time + FACE_DETECTION_DURATION
-
-            if current_time < active_detection_end_time:
-                ret, frame = video_capture.read()
-                if not ret:
-                    print("DETECTOR: Error: Failed to capture frame.")
-                    time.sleep(0.1)
-                    continue
-
-                processed_frame = process_frame_for_faces(frame, known_face_encodings, known_criminal_names, last_match_time)
-                cv2.imshow('Video Feed - Criminal Detection', processed_frame)
+                # Capture, detection, encoding and alerts run on the pipeline threads;
+                # this thread only shows the newest annotated frame.
+                pipeline.set_active(True)
+                job = pipeline.get_display_frame(timeout=0.05)
+                if job is not None:
+                    title = 'Video Feed - Criminal Detection'
+                    if len(cameras) > 1:
+                        title += f' ({job.camera.name})'
+                    cv2.imshow(title, job.frame)
                 # LCD is updated by trigger_buzzer_and_lcd_alert on match
-                # Could add a "Scanning..." message here if desired, but might be too frequent
 
             else: # Current time is past the active detection end time or no motion started it
+                pipeline.set_active(False)
                 if detection_active_this_motion: # If detection period just ended
                     print(f"{datetime.now()}: Face detection period ended. Waiting for new motion.")
-                    lcd_utils.display_message("Scan Complete", "Monitoring...", duration=3)
+                    print(f"DETECTOR: Pipeline queues: {pipeline.format_stats()}")
+                    print(f"DETECTOR: Cameras:\n{pipeline.format_camera_stats()}")
+                    print(f"DETECTOR: Alert sink: {alert_sink.stats()}")
+                    lcd_utils.show_message("Scan Complete", "Monitoring...", ttl=3)
                     detection_active_this_motion = False
+                # Once status/alert messages expire the render thread falls back to "Status: Idle"
 
-                # Display "Monitoring..." periodically if LCD is free and not showing a recent alert
-                if current_time - last_lcd_update_time > lcd_update_interval and not detection_active_this_motion:
-                    # Avoid overwriting a recent alert message from trigger_buzzer_and_lcd_alert
-                    # The duration on that function handles its display time.
-                    # This logic is a bit tricky to ensure alerts are not immediately overwritten.
-                    # For simplicity, let's assume any call to display_message should be seen.
-                    # The 'duration' parameter in display_message handles temporary messages.
-                    # If a message has no duration, it persists.
-                    # So, if no motion and no active detection, periodically show "Monitoring"
-                    lcd_utils.display_message("Status: Idle", "Monitoring...", duration=0) # Persistent until next event
-                    last_lcd_update_time = current_time
-
-                # print(f"{datetime.now()}: No motion / detection period over. Sleeping for {MOTION_DETECT_DELAY}s")
                 # Hide the OpenCV window when not actively detecting to save resources / be less intrusive
                 # cv2.destroyWindow('Video Feed - Criminal Detection') # This might be too aggressive
-                time.sleep(MOTION_DETECT_DELAY)
+                # Sleep until the motion sensor's edge callback fires (MOTION_DETECT_DELAY caps the wait
+                # so the window and keyboard stay responsive)
+                motion.wait_for_motion(timeout=MOTION_DETECT_DELAY)
+
+            if current_time - last_stats_time >= config.PIPELINE_STATS_INTERVAL:
+                print(f"DETECTOR: Pipeline queues: {pipeline.format_stats()}")
+                print(f"DETECTOR: Cameras:\n{pipeline.format_camera_stats()}")
+                print(f"DETECTOR: Alert sink: {alert_sink.stats()}")
+                last_stats_time = current_time
 
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 print("DETECTOR: Quitting detection loop...")
-                lcd_utils.display_message("System Quitting", "", duration=2)
+                lcd_utils.show_message("System Quitting", "", priority=lcd_utils.PRIORITY_ALERT)
                 break
 
     except KeyboardInterrupt:
         print("DETECTOR: Detection interrupted by user (Ctrl+C).")
-        lcd_utils.display_message("System Halted", "User Interrupt", duration=2)
+        lcd_utils.show_message("System Halted", "User Interrupt", priority=lcd_utils.PRIORITY_ALERT)
     finally:
-        if video_capture.isOpened():
-            video_capture.release()
+        pipeline.stop()
+        alert_sink.stop() # Flushes alerts the pipeline handed over while stopping
+        if worker_pool is not None:
+            worker_pool.stop()
+        gallery_watcher.stop()
+        for camera, video_capture in opened_cameras:
+            camera.frame_source.stop()
+            if video_capture.isOpened():
+                video_capture.release()
         cv2.destroyAllWindows()
         cleanup_resources() # Cleans GPIO and LCD
         print("DETECTOR: Detection system shut down.")
@@ -307,7 +313,7 @@ if __name__ == '__main__':
     except Exception as e:
         print(f"DETECTOR: An error occurred: {e}")
         # Try to display on LCD if available
-        lcd_utils.display_message("FATAL ERROR", str(e)[:lcd_utils.DEFAULT_LCD_COLS], duration=5)
+        lcd_utils.display_message("FATAL ERROR", str(e)[:config.LCD_COLS], duration=5)
     finally:
         # cleanup_resources is called within run_detection's finally block.
         # Calling it again here would be redundant but safe.
@@ -0,0 +1,84 @@
+# detection/encoding_format.py
+
+# Binary storage format for face encodings (the criminals.face_encoding BLOB).
+# Replaces pickled NumPy arrays: decoding is a checked np.frombuffer view instead of unpickling
+# (which can run arbitrary code), and storing float32 halves the size of dlib's float64 output.
+#
+# Layout (little-endian):
+#   magic    4 bytes  b"BBFE"
+#   version  uint8    FORMAT_VERSION
+#   dtype    uint8    1 = float32, 2 = float64
+#   dim      uint16   number of components
+#   data     dim * itemsize bytes of raw values
+
+import struct
+
+import numpy as np
+
+MAGIC = b"BBFE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBH")
+STORAGE_DTYPE = np.dtype("<f4")
+DTYPE_CODES = {1: np.dtype("<f4"), 2: np.dtype("<f8")}
+_CODE_OF = {dtype: code for code, dtype in DTYPE_CODES.items()}
+
+
+def encode_encoding(encoding, dtype=STORAGE_DTYPE):
+    """
+    Serializes one face encoding.
+    Args:
+        encoding (array-like): 1-D encoding, e.g. from face_recognition.face_encodings.
+        dtype (numpy dtype): Storage type, float32 (default) or float64.
+    Returns:
+        bytes: Header followed by the raw values.
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    values = np.ascontiguousarray(encoding, dtype=dtype).reshape(-1)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, _CODE_OF[dtype], len(values)) + values.tobytes()
+
+
+def is_encoded(blob):
+    """True if the blob is in this format (as opposed to e.g. a legacy pickle)."""
+    return blob is not None and bytes(blob[:4]) == MAGIC
+
+
+def decode_encoding(blob):
+    """
+    Decodes one encoding without copying: the result is a read-only view of `blob`.
+    Raises:
+        ValueError: If the blob is not in this format, has an unknown version/dtype or is truncated.
+    """
+    if not is_encoded(blob) or len(blob) < HEADER.size:
+        raise ValueError("not a binary face encoding (legacy pickle? run database_setup.py to migrate)")
+    _, version, code, dim = HEADER.unpack_from(blob, 0)
+    if version != FORMAT_VERSION or code not in DTYPE_CODES:
+        raise ValueError(f"unsupported face encoding format (version {version}, dtype code {code})")
+    dtype = DTYPE_CODES[code]
+    if len(blob) != HEADER.size + dim * dtype.itemsize:
+        raise ValueError(f"face encoding is {len(blob)} bytes, expected {HEADER.size + dim * dtype.itemsize}")
+    return np.frombuffer(blob, dtype=dtype, count=dim, offset=HEADER.size)
+
+
+def decode_encodings(blobs):
+    """
+    Decodes many encodings into one (N, dim) float32 matrix.
+    When every blob has the same header (the normal case) this is a single join plus one vectorized
+    header check and view, instead of N separate decodes.
+    Raises:
+        ValueError: If any blob cannot be decoded.
+    """
+    blobs = list(blobs)
+    if not blobs:
+        return np.empty((0, 0), dtype=np.float32)
+    first = blobs[0]
+    head = bytes(first[:HEADER.size])
+    decode_encoding(first) # Validates the header and length
+    size = len(first)
+    if all(len(blob) == size for blob in blobs):
+        raw = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), size)
+        if (raw[:, :HEADER.size] == np.frombuffer(head, dtype=np.uint8)).all():
+            _, _, code, dim = HEADER.unpack(head)
+            values = np.ascontiguousarray(raw[:, HEADER.size:]).view(DTYPE_CODES[code])
+            return values.astype(np.float32, copy=False).reshape(len(blobs), dim)
+    # Mixed dtypes/dimensions: decode one by one (raises on the first bad blob)
+    return np.vstack([decode_encoding(blob) for blob in blobs]).astype(np.float32, copy=False)
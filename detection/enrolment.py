@@ -0,0 +1,335 @@
+# detection/enrolment.py
+
+# Background enrolment: computing a face encoding (HOG detection plus dlib encoding) takes seconds
+# per photo on a Pi, so the dashboard no longer does it inside the HTTP request. It saves the photo,
+# queues a job in the enrolment_jobs table (database_setup.py migration 4) and returns at once;
+# worker processes started here pick the jobs up.
+#
+# A new criminal is stored with status 'pending' and an empty placeholder encoding. The gallery only
+# loads 'active' criminals (db_utils.get_gallery), so a pending one is invisible to the detector
+# until its job succeeds: the worker then writes the encoding and sets status 'active' in one
+# transaction, and the gallery triggers bump the gallery version so running detectors (and the
+# gallery snapshot) pick the criminal up. If no usable face is found, a new criminal is marked
+# 'failed'; a criminal whose photo was being replaced keeps the previous photo and encoding.
+#
+# Job states: queued -> running -> done | failed, or superseded when a newer photo was uploaded for
+# the same criminal before this one was applied.
+#
+# Usage (from the project root):
+#   python -m detection.enrolment                # run config.ENROLMENT_WORKERS worker processes
+#   python -m detection.enrolment --workers 2
+
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import face_recognition
+
+import config # Import the new config file
+from .db_utils import PARENT_DIR, connect_db
+from .encoding_format import encode_encoding
+from .gallery_snapshot import SnapshotCompiler
+from .queries import LATEST_ENROLMENT_JOB, NEXT_ENROLMENT_JOB
+from .thumbnails import remove_thumbnails, write_thumbnails
+
+# criminals.status
+STATUS_PENDING = "pending"
+STATUS_ACTIVE = "active"
+STATUS_FAILED = "failed"
+PLACEHOLDER_ENCODING = b"" # face_encoding of a criminal whose first photo has not been encoded yet
+
+# enrolment_jobs.status
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_SUPERSEDED = "superseded"
+
+EnrolmentJob = namedtuple("EnrolmentJob", ["id", "criminal_id", "photo_path", "attempts"])
+
+
+def photo_file(photo_path):
+    """Absolute file of a stored photo path (relative to static/, like criminals.photo_path)."""
+    return os.path.join(PARENT_DIR, "static", photo_path)
+
+
+def remove_photo(photo_path):
+    """Deletes a stored photo and its thumbnails, if they exist."""
+    path = photo_file(photo_path)
+    if os.path.exists(path):
+        os.remove(path)
+    remove_thumbnails(path)
+
+
+def encode_photo(image_path, reject_multiple=False, max_side=None):
+    """
+    Computes the face encoding for an enrolment photo file; see encode_image.
+    Returns:
+        tuple: (encoding, None) on success, or (None, reason) if no usable face was found.
+    """
+    return encode_image(cv2.imread(image_path), reject_multiple, max_side) # imread applies EXIF orientation
+
+
+def encode_image(image, reject_multiple=False, max_side=None):
+    """
+    Computes the face encoding for an enrolment photo.
+    Args:
+        image (numpy.ndarray): BGR image as decoded by cv2 (None if decoding failed).
+        reject_multiple (bool): Fail if the photo shows more than one face; otherwise the largest face is used.
+        max_side (int, optional): Photos larger than this (pixels, longest side) are shrunk before
+            detection, which keeps HOG time bounded. Defaults to config.ENROLMENT_MAX_IMAGE_SIDE.
+    Returns:
+        tuple: (encoding, None) on success, or (None, reason) if no usable face was found.
+    """
+    if image is None or image.size == 0:
+        return None, "Could not read the photo."
+    max_side = config.ENROLMENT_MAX_IMAGE_SIDE if max_side is None else max_side
+    scale = max_side / max(image.shape[:2]) if max_side else 1
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb)
+    if not locations:
+        return None, "No face detected in the photo."
+    if len(locations) > 1 and reject_multiple:
+        return None, f"{len(locations)} faces detected in the photo; expected one."
+    # (top, right, bottom, left): the largest face is the person being enrolled
+    location = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    encodings = face_recognition.face_encodings(rgb, [location])
+    if not encodings:
+        return None, "Could not compute a face encoding."
+    return encodings[0], None
+
+
+def enqueue_enrolment(conn, criminal_id, photo_path):
+    """
+    Queues an enrolment job. Runs in the caller's transaction (the caller commits), so a new
+    criminal and its job appear together.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        criminal_id (int): The criminal the photo belongs to.
+        photo_path (str): Stored photo path (relative to static/).
+    Returns:
+        int: The job ID.
+    """
+    cursor = conn.execute("INSERT INTO enrolment_jobs (criminal_id, photo_path, status) VALUES (?, ?, ?)",
+                          (criminal_id, photo_path, JOB_QUEUED))
+    return cursor.lastrowid
+
+
+def get_enrolment_status(conn, criminal_id):
+    """
+    Returns:
+        dict: The criminal's status and its latest job (None if it never had one), or None if the
+            criminal does not exist.
+    """
+    row = conn.execute("SELECT status FROM criminals WHERE id = ?", (criminal_id,)).fetchone()
+    if row is None:
+        return None
+    job = conn.execute(LATEST_ENROLMENT_JOB, (criminal_id,)).fetchone()
+    keys = ("id", "status", "error", "attempts", "created_at", "updated_at")
+    return {"criminal_id": criminal_id, "status": row[0],
+            "job": dict(zip(keys, tuple(job))) if job is not None else None}
+
+
+def get_job_counts(conn):
+    """Number of jobs in each state, e.g. {'queued': 3, 'running': 1, 'done': 120}."""
+    return {status: count for status, count in
+            conn.execute("SELECT status, COUNT(*) FROM enrolment_jobs GROUP BY status")}
+
+
+def claim_job(conn):
+    """
+    Takes the oldest queued job and marks it running. Safe with several workers: the select and
+    update run under one write lock (BEGIN IMMEDIATE), so each job is claimed exactly once.
+    Returns:
+        EnrolmentJob: The claimed job, or None if the queue is empty.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(NEXT_ENROLMENT_JOB, (JOB_QUEUED,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE enrolment_jobs SET status = ?, attempts = attempts + 1, "
+                         "updated_at = CURRENT_TIMESTAMP WHERE id = ?", (JOB_RUNNING, row[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return EnrolmentJob(row[0], row[1], row[2], row[3] + 1) if row is not None else None
+
+
+def _finish_job(conn, job, status, error=None):
+    conn.execute("UPDATE enrolment_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (status, error, job.id))
+
+
+def _superseded(conn, job):
+    """True if a newer photo for the same criminal is queued, being encoded or already applied."""
+    return conn.execute("SELECT 1 FROM enrolment_jobs WHERE criminal_id = ? AND id > ? AND status IN (?, ?, ?)",
+                        (job.criminal_id, job.id, JOB_QUEUED, JOB_RUNNING, JOB_DONE)).fetchone() is not None
+
+
+def apply_result(conn, job, encoding, error):
+    """
+    Stores a job's outcome in one transaction: the encoding (criminal becomes active, which bumps the
+    gallery version) or the failure. Photos that end up unused are deleted afterwards.
+    Returns:
+        str: The job's final status.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT photo_path, status FROM criminals WHERE id = ?", (job.criminal_id,)).fetchone()
+        current_photo = row[0] if row is not None else None
+        if row is None:
+            status, error = JOB_FAILED, "The criminal was deleted."
+        elif _superseded(conn, job):
+            status = JOB_SUPERSEDED
+        elif encoding is None:
+            status = JOB_FAILED
+            if row[1] != STATUS_ACTIVE: # A replaced photo that failed leaves an active criminal as it was
+                conn.execute("UPDATE criminals SET status = ? WHERE id = ?", (STATUS_FAILED, job.criminal_id))
+        else:
+            status = JOB_DONE
+            conn.execute("UPDATE criminals SET face_encoding = ?, photo_path = ?, status = ? WHERE id = ?",
+                         (encode_encoding(encoding), job.photo_path, STATUS_ACTIVE, job.criminal_id))
+        _finish_job(conn, job, status, error)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if status == JOB_DONE:
+        if current_photo and current_photo != job.photo_path:
+            remove_photo(current_photo) # The photo this one replaced
+        write_thumbnails(photo_file(job.photo_path))
+    elif job.photo_path != current_photo:
+        remove_photo(job.photo_path) # Never became the criminal's photo
+    return status
+
+
+def requeue_stale_jobs(conn, timeout=None, max_attempts=None):
+    """
+    Recovers jobs left 'running' by a worker that died: requeued, or failed after too many attempts.
+    Returns:
+        int: Number of jobs recovered.
+    """
+    timeout = config.ENROLMENT_JOB_TIMEOUT if timeout is None else timeout
+    max_attempts = config.ENROLMENT_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    with conn:
+        stale = conn.execute("SELECT id, criminal_id, photo_path, attempts FROM enrolment_jobs "
+                             "WHERE status = ? AND updated_at < datetime('now', ?)",
+                             (JOB_RUNNING, f"-{int(timeout)} seconds")).fetchall()
+        for job in map(EnrolmentJob._make, stale):
+            if job.attempts < max_attempts:
+                conn.execute("UPDATE enrolment_jobs SET status = ?, updated_at = CURRENT_TIMESTAMP "
+                             "WHERE id = ? AND status = ?", (JOB_QUEUED, job.id, JOB_RUNNING))
+    for job in map(EnrolmentJob._make, stale):
+        if job.attempts >= max_attempts:
+            apply_result(conn, job, None, f"Gave up after {job.attempts} attempts.")
+    if stale:
+        print(f"ENROLMENT: Recovered {len(stale)} stalled job(s).")
+    return len(stale)
+
+
+def process_job(conn, job):
+    """Encodes one claimed job's photo and stores the result. Returns the job's final status."""
+    start = time.perf_counter()
+    try:
+        encoding, error = encode_photo(photo_file(job.photo_path))
+    except Exception as e:
+        if job.attempts < config.ENROLMENT_MAX_ATTEMPTS:
+            print(f"ENROLMENT: Job {job.id} failed (attempt {job.attempts}), will retry: {e}")
+            with conn:
+                conn.execute("UPDATE enrolment_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP "
+                             "WHERE id = ?", (JOB_QUEUED, str(e), job.id))
+            return JOB_QUEUED
+        encoding, error = None, f"Error encoding the photo: {e}"
+    status = apply_result(conn, job, encoding, error)
+    print(f"ENROLMENT: Job {job.id} (criminal ID {job.criminal_id}) {status} in "
+          f"{time.perf_counter() - start:.1f}s{': ' + error if error else ''}")
+    return status
+
+
+def run_worker(poll_interval=None, stop_event=None):
+    """
+    Worker loop: claims and processes jobs until stop_event is set (forever if None).
+    Recompiles the gallery snapshot in the background after criminals become active.
+    """
+    poll_interval = config.ENROLMENT_POLL_INTERVAL if poll_interval is None else poll_interval
+    stop_event = stop_event or threading.Event()
+    conn = connect_db()
+    if conn is None:
+        return
+    compiler = SnapshotCompiler()
+    last_recovery = 0.0
+    print(f"ENROLMENT: Worker {os.getpid()} started.")
+    try:
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() - last_recovery > config.ENROLMENT_JOB_TIMEOUT / 4:
+                    requeue_stale_jobs(conn)
+                    last_recovery = time.monotonic()
+                job = claim_job(conn)
+                if job is None:
+                    stop_event.wait(poll_interval)
+                    continue
+                if process_job(conn, job) == JOB_DONE:
+                    compiler.request()
+            except Exception as e: # e.g. the database is locked for longer than the busy timeout
+                print(f"ENROLMENT: Worker error: {e}")
+                stop_event.wait(poll_interval)
+    except KeyboardInterrupt:
+        pass # Ctrl+C reaches every process in the group; the parent stops the workers
+    finally:
+        conn.close()
+
+
+class EnrolmentWorkers:
+    """Runs enrolment workers in separate processes (encoding is CPU-bound; threads would share one core)."""
+
+    def __init__(self, count=None):
+        self.count = config.ENROLMENT_WORKERS if count is None else count
+        self._stop_event = multiprocessing.Event()
+        self._processes = []
+
+    def start(self):
+        for i in range(self.count):
+            process = multiprocessing.Process(target=run_worker, kwargs={"stop_event": self._stop_event},
+                                              name=f"EnrolmentWorker-{i}", daemon=True)
+            process.start()
+            self._processes.append(process)
+        if self.count:
+            print(f"ENROLMENT: Started {self.count} enrolment worker process(es).")
+
+    def stop(self, timeout=10):
+        """Lets each worker finish its current job, then stops it."""
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background enrolment workers (face encoding of uploaded photos).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: config.ENROLMENT_WORKERS, at least 1).")
+    args = parser.parse_args()
+    workers = EnrolmentWorkers(max(1, args.workers if args.workers is not None else config.ENROLMENT_WORKERS))
+    workers.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("ENROLMENT: Stopping workers...")
+    finally:
+        workers.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# detection/face_detectors.py
+
+# Pluggable face detector backends. All take an RGB uint8 image and return
+# (top, right, bottom, left) boxes, the format face_recognition uses, so any backend's boxes can
+# be passed straight to face_recognition.face_encodings.
+#   hog  - dlib HOG via face_recognition (the original detector; good accuracy, slowest on a Pi)
+#   haar - OpenCV Haar cascade bundled with cv2 (fast, more false positives, frontal faces only)
+#   dnn  - OpenCV DNN ResNet-10 SSD (accurate and handles angles; needs the model files in models/)
+# Pick one per terminal with FACE_DETECTOR_BACKEND; compare them with `python -m detection.bench_detectors`.
+
+import os
+
+import cv2
+import face_recognition
+
+import config # Import the new config file
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _project_path(path):
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+class FaceDetector:
+    """Interface for detector backends."""
+
+    name = None
+
+    def detect(self, rgb_image):
+        """Returns a list of (top, right, bottom, left) face boxes in rgb_image coordinates."""
+        raise NotImplementedError
+
+
+class HogDetector(FaceDetector):
+    """dlib HOG + linear SVM (face_recognition's "hog" model)."""
+
+    name = "hog"
+
+    def __init__(self, upsample=None):
+        self.upsample = config.HOG_UPSAMPLE if upsample is None else upsample
+
+    def detect(self, rgb_image):
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=self.upsample, model="hog")
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade. Uses the frontal-face cascade shipped in cv2.data unless HAAR_CASCADE_PATH is set."""
+
+    name = "haar"
+
+    def __init__(self, cascade_path=None, scale_factor=None, min_neighbors=None, min_size=None):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise ImportError("This OpenCV build has no CascadeClassifier (OpenCV 5 moved it out of the main package).")
+        cascade_path = cascade_path or config.HAAR_CASCADE_PATH
+        if not cascade_path:
+            if not hasattr(cv2, "data"): # Some distro builds of OpenCV do not ship the cascades
+                raise FileNotFoundError("cv2.data is not available; set HAAR_CASCADE_PATH in config.py.")
+            cascade_path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.cascade = cv2.CascadeClassifier(_project_path(cascade_path))
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Could not load Haar cascade from {cascade_path}")
+        self.scale_factor = config.HAAR_SCALE_FACTOR if scale_factor is None else scale_factor
+        self.min_neighbors = config.HAAR_MIN_NEIGHBORS if min_neighbors is None else min_neighbors
+        self.min_size = config.HAAR_MIN_SIZE if min_size is None else min_size
+
+    def detect(self, rgb_image):
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                              minSize=(self.min_size, self.min_size))
+        return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in faces]
+
+
+class DnnDetector(FaceDetector):
+    """
+    OpenCV DNN face detector (ResNet-10 SSD, Caffe). Download deploy.prototxt and
+    res10_300x300_ssd_iter_140000.caffemodel into models/ (paths set in config.py).
+    """
+
+    name = "dnn"
+
+    def __init__(self, model_path=None, config_path=None, confidence=None, input_size=300):
+        model_path = _project_path(model_path or config.DNN_MODEL_PATH)
+        config_path = _project_path(config_path or config.DNN_CONFIG_PATH)
+        for path in (model_path, config_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN face model file not found: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(config_path, model_path)
+        self.confidence = config.DNN_CONFIDENCE if confidence is None else confidence
+        self.input_size = input_size
+
+    def detect(self, rgb_image):
+        h, w = rgb_image.shape[:2]
+        # The model was trained on BGR input with these channel means
+        blob = cv2.dnn.blobFromImage(cv2.resize(rgb_image, (self.input_size, self.input_size)), 1.0,
+                                     (self.input_size, self.input_size), (104.0, 177.0, 123.0), swapRB=True)
+        self.net.setInput(blob)
+        detections = self.net.forward()
+        boxes = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < self.confidence:
+                continue
+            x1, y1, x2, y2 = detections[0, 0, i, 3:7] * (w, h, w, h)
+            left, top = max(0, int(x1)), max(0, int(y1))
+            right, bottom = min(w, int(x2)), min(h, int(y2))
+            if right > left and bottom > top:
+                boxes.append((top, right, bottom, left))
+        return boxes
+
+
+DETECTOR_BACKENDS = {
+    "hog": HogDetector,
+    "haar": HaarDetector,
+    "dnn": DnnDetector,
+}
+
+
+def create_detector(kind=None, fallback=True, **kwargs):
+    """
+    Creates a detector backend ("hog", "haar" or "dnn"); defaults to config.FACE_DETECTOR_BACKEND.
+    If the backend cannot be loaded (e.g. missing model files) and `fallback` is set, falls back to HOG.
+    """
+    kind = config.FACE_DETECTOR_BACKEND if kind is None else kind
+    try:
+        detector_cls = DETECTOR_BACKENDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown face detector backend '{kind}'. Choose from: {', '.join(DETECTOR_BACKENDS)}")
+    try:
+        return detector_cls(**kwargs)
+    except (FileNotFoundError, ImportError, cv2.error) as e:
+        if not fallback or kind == "hog":
+            raise
+        print(f"FACE_DETECTORS: Could not load '{kind}' detector ({e}). Falling back to HOG.")
+        return HogDetector()
@@ -0,0 +1,349 @@
+# detection/face_index.py
+
+# Pluggable nearest-neighbour indexes over face encodings.
+# BruteForceIndex is exact; IVFIndex is an approximate inverted-file index with a k-means
+# coarse quantizer whose recall/latency trade-off is tuned with `nprobe`.
+# Both support incremental add/remove keyed by integer labels (e.g. criminal IDs).
+
+import numpy as np
+
+import config # Import the new config file
+
+
+def _sq_norms(vectors):
+    return np.einsum("ij,ij->i", vectors, vectors)
+
+
+def _pairwise_distances(queries, vectors, vector_sq_norms):
+    """Euclidean distances between every query row and every vector row, shape (M, N)."""
+    sq_dist = _sq_norms(queries)[:, None] + vector_sq_norms[None, :] - 2.0 * (queries @ vectors.T)
+    np.maximum(sq_dist, 0.0, out=sq_dist)
+    return np.sqrt(sq_dist, out=sq_dist)
+
+
+def _top_k(dist, labels, k):
+    """
+    Picks the k smallest distances of each row.
+    Returns (labels, distances) of shape (M, k), padded with -1 / inf if a row has fewer than k candidates.
+    """
+    m, n = dist.shape
+    out_labels = np.full((m, k), -1, dtype=np.int64)
+    out_dist = np.full((m, k), np.inf, dtype=np.float32)
+    if n == 0:
+        return out_labels, out_dist
+    kk = min(k, n)
+    rows = np.arange(m)[:, None]
+    part = np.argpartition(dist, kk - 1, axis=1)[:, :kk] if kk < n else np.tile(np.arange(n), (m, 1))
+    part_dist = dist[rows, part]
+    order = np.argsort(part_dist, axis=1)
+    best = part[rows, order]
+    out_labels[:, :kk] = labels[best]
+    out_dist[:, :kk] = dist[rows, best]
+    return out_labels, out_dist
+
+
+class _VectorStore:
+    """
+    Growable contiguous float32 matrix with precomputed squared norms and O(1) removal
+    (the removed row is overwritten by the last row).
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.count = 0
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int64)
+        self._row_of = {}
+
+    @property
+    def vectors(self):
+        return self._vectors[:self.count]
+
+    @property
+    def sq_norms(self):
+        return self._sq_norms[:self.count]
+
+    @property
+    def labels(self):
+        return self._labels[:self.count]
+
+    def _reserve(self, needed):
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        for attr in ("_vectors", "_sq_norms", "_labels"):
+            old = getattr(self, attr)
+            grown = np.empty((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.count] = old[:self.count]
+            setattr(self, attr, grown)
+
+    def add(self, labels, vectors):
+        n = len(labels)
+        self._reserve(self.count + n)
+        start = self.count
+        self._vectors[start:start + n] = vectors
+        self._sq_norms[start:start + n] = _sq_norms(vectors)
+        self._labels[start:start + n] = labels
+        for offset, label in enumerate(labels):
+            self._row_of[int(label)] = start + offset
+        self.count += n
+
+    def remove(self, label):
+        row = self._row_of.pop(int(label), None)
+        if row is None:
+            return False
+        last = self.count - 1
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._labels[row] = self._labels[last]
+            self._row_of[int(self._labels[row])] = row
+        self.count = last
+        return True
+
+    def __contains__(self, label):
+        return int(label) in self._row_of
+
+
+class FaceIndex:
+    """Interface shared by all index implementations."""
+
+    def __init__(self, dim=None):
+        self.dim = config.FACE_ENCODING_DIM if dim is None else dim
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, label):
+        raise NotImplementedError
+
+    def add(self, labels, vectors):
+        """
+        Adds vectors under the given integer labels. Existing labels are replaced.
+        Args:
+            labels (sequence of int): One label per vector.
+            vectors (array-like): Shape (N, dim).
+        """
+        raise NotImplementedError
+
+    def remove(self, labels):
+        """
+        Removes the given labels; unknown labels are ignored.
+        Returns:
+            int: Number of entries removed.
+        """
+        raise NotImplementedError
+
+    def export(self):
+        """
+        Returns every entry, e.g. to publish the gallery to other processes.
+        Returns:
+            tuple: (labels int64 array (N,), vectors float32 array (N, dim)), both copies.
+        """
+        raise NotImplementedError
+
+    def search(self, queries, k=1):
+        """
+        Finds the k nearest entries for every query.
+        Args:
+            queries (array-like): Shape (M, dim).
+            k (int): Neighbours per query.
+        Returns:
+            tuple: (labels int64 array (M, k), distances float32 array (M, k)), padded with -1 / inf.
+        """
+        raise NotImplementedError
+
+    def _prepare(self, labels, vectors):
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(labels) != len(vectors):
+            raise ValueError(f"Got {len(labels)} labels for {len(vectors)} vectors.")
+        return labels, vectors
+
+
+class BruteForceIndex(FaceIndex):
+    """Exact linear scan: one matrix product against the whole gallery."""
+
+    def __init__(self, dim=None):
+        super().__init__(dim)
+        self._store = _VectorStore(self.dim)
+
+    def __len__(self):
+        return self._store.count
+
+    def __contains__(self, label):
+        return label in self._store
+
+    def add(self, labels, vectors):
+        labels, vectors = self._prepare(labels, vectors)
+        self.remove(labels)
+        self._store.add(labels, vectors)
+
+    def remove(self, labels):
+        return sum(self._store.remove(label) for label in np.asarray(labels).reshape(-1))
+
+    def export(self):
+        return self._store.labels.copy(), self._store.vectors.copy()
+
+    def search(self, queries, k=1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        dist = _pairwise_distances(queries, self._store.vectors, self._store.sq_norms)
+        return _top_k(dist, self._store.labels, k)
+
+
+class IVFIndex(FaceIndex):
+    """
+    Inverted-file index. Vectors are bucketed by their nearest k-means centroid; a query
+    only scans the `nprobe` buckets whose centroids are closest to it.
+    Higher nprobe means better recall and higher latency; nprobe == nlist is an exact search.
+    The quantizer is trained on the first `train_size` vectors added (or explicitly via train()).
+    Until then the index falls back to a brute-force scan of its pending vectors.
+    """
+
+    def __init__(self, dim=None, nlist=None, nprobe=None, train_size=None, kmeans_iters=10, seed=0):
+        super().__init__(dim)
+        self.nlist = config.IVF_NLIST if nlist is None else nlist
+        self.nprobe = config.IVF_NPROBE if nprobe is None else nprobe
+        self.train_size = max(self.nlist, config.IVF_TRAIN_SIZE if train_size is None else train_size)
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.centroids = None
+        self._centroid_sq_norms = None
+        self._lists = []
+        self._list_of = {}
+        self._pending = _VectorStore(self.dim) # Holds vectors until the quantizer is trained
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def __len__(self):
+        return len(self._list_of) + self._pending.count
+
+    def __contains__(self, label):
+        return int(label) in self._list_of or label in self._pending
+
+    def train(self, vectors):
+        """Fits the coarse quantizer with mini k-means (Lloyd iterations on a sample)."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) < self.nlist:
+            raise ValueError(f"Need at least nlist={self.nlist} vectors to train, got {len(vectors)}.")
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > self.train_size:
+            sample = vectors[rng.choice(len(vectors), self.train_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = self._nearest(sample, centroids, _sq_norms(centroids))
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=self.nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Re-seed empty clusters from random sample points
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        self.centroids = centroids
+        self._centroid_sq_norms = _sq_norms(centroids)
+        self._lists = [_VectorStore(self.dim) for _ in range(self.nlist)]
+        self._list_of = {}
+
+        # Move anything that was waiting for training into the inverted lists
+        pending = self._pending
+        self._pending = _VectorStore(self.dim)
+        if pending.count:
+            self._add_trained(pending.labels.copy(), pending.vectors.copy())
+
+    @staticmethod
+    def _nearest(vectors, centroids, centroid_sq_norms):
+        # Chunked so that the (N, nlist) distance matrix stays small for large N
+        out = np.empty(len(vectors), dtype=np.int64)
+        chunk = 65536
+        for start in range(0, len(vectors), chunk):
+            block = vectors[start:start + chunk]
+            scores = centroid_sq_norms[None, :] - 2.0 * (block @ centroids.T)
+            out[start:start + chunk] = np.argmin(scores, axis=1)
+        return out
+
+    def _add_trained(self, labels, vectors):
+        assign = self._nearest(vectors, self.centroids, self._centroid_sq_norms)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.flatnonzero(np.diff(assign[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group) == 0:
+                continue
+            list_no = int(assign[group[0]])
+            self._lists[list_no].add(labels[group], vectors[group])
+            for label in labels[group]:
+                self._list_of[int(label)] = list_no
+
+    def add(self, labels, vectors):
+        labels, vectors = self._prepare(labels, vectors)
+        self.remove(labels)
+        if self.is_trained:
+            self._add_trained(labels, vectors)
+            return
+        self._pending.add(labels, vectors)
+        if self._pending.count >= self.train_size:
+            self.train(self._pending.vectors)
+
+    def remove(self, labels):
+        removed = 0
+        for label in np.asarray(labels).reshape(-1):
+            list_no = self._list_of.pop(int(label), None)
+            if list_no is not None:
+                removed += self._lists[list_no].remove(label)
+            else:
+                removed += self._pending.remove(label)
+        return removed
+
+    def export(self):
+        stores = [self._pending] + [store for store in self._lists if store.count]
+        return (np.concatenate([s.labels for s in stores]),
+                np.concatenate([s.vectors for s in stores]).reshape(-1, self.dim))
+
+    def search(self, queries, k=1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self.is_trained:
+            dist = _pairwise_distances(queries, self._pending.vectors, self._pending.sq_norms)
+            return _top_k(dist, self._pending.labels, k)
+
+        out_labels = np.full((len(queries), k), -1, dtype=np.int64)
+        out_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        nprobe = min(self.nprobe, self.nlist)
+        coarse = self._centroid_sq_norms[None, :] - 2.0 * (queries @ self.centroids.T)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe] if nprobe < self.nlist \
+            else np.tile(np.arange(self.nlist), (len(queries), 1))
+
+        for qi, query in enumerate(queries):
+            stores = [self._lists[int(p)] for p in probes[qi] if self._lists[int(p)].count]
+            if not stores:
+                continue
+            vectors = np.concatenate([s.vectors for s in stores]) if len(stores) > 1 else stores[0].vectors
+            sq_norms = np.concatenate([s.sq_norms for s in stores]) if len(stores) > 1 else stores[0].sq_norms
+            labels = np.concatenate([s.labels for s in stores]) if len(stores) > 1 else stores[0].labels
+            dist = _pairwise_distances(query[None, :], vectors, sq_norms)
+            out_labels[qi], out_dist[qi] = (a[0] for a in _top_k(dist, labels, k))
+        return out_labels, out_dist
+
+
+INDEX_TYPES = {
+    "brute": BruteForceIndex,
+    "ivf": IVFIndex,
+}
+
+
+def create_index(kind=None, **kwargs):
+    """
+    Creates an empty index of the given kind ("brute" or "ivf"); defaults to config.GALLERY_INDEX_TYPE.
+    Extra keyword arguments are passed to the index constructor (e.g. nlist/nprobe for "ivf").
+    """
+    kind = config.GALLERY_INDEX_TYPE if kind is None else kind
+    try:
+        index_cls = INDEX_TYPES[kind]
+    except KeyError:
+        raise ValueError(f"Unknown gallery index type '{kind}'. Choose from: {', '.join(INDEX_TYPES)}")
+    return index_cls(**kwargs)
@@ -0,0 +1,232 @@
+# detection/gallery_snapshot.py
+
+# Compiled gallery snapshot: the whole gallery in one file, laid out like a gallery_store data
+# segment (header, float32 matrix with squared norms, sorted criminal IDs, name offset table and
+# names, plus the IVF quantizer when GALLERY_INDEX_TYPE is "ivf"). The detector memory-maps it at
+# startup and searches it in place, so startup time no longer grows with the criminals table.
+# The dashboard recompiles it whenever criminals change; the file is written under a temporary
+# name and renamed over the old one, so readers only ever see a complete snapshot. A snapshot is
+# never replaced by one for an older gallery version (e.g. a slow background compile finishing
+# after a newer one): the version check and the rename run under an exclusive lock on
+# "<snapshot>.lock" where fcntl is available.
+#
+# Usage (from the project root):
+#   python -m detection.gallery_snapshot            # compile from the database now
+#   python -m detection.gallery_snapshot --open     # time opening the current snapshot
+
+import argparse
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # Windows: the version check still runs, just not under a lock
+    fcntl = None
+
+import config # Import the new config file
+from .db_utils import PARENT_DIR, connect_db, get_gallery, get_gallery_version, prune_gallery_changes
+from .face_index import IVFIndex
+from .gallery_store import GalleryImage, GallerySegment
+
+
+def snapshot_path(path=None):
+    """Absolute snapshot path (config.GALLERY_SNAPSHOT_PATH by default), or None if snapshots are disabled."""
+    path = config.GALLERY_SNAPSHOT_PATH if path is None else path
+    if path is None:
+        return None
+    return path if os.path.isabs(path) else os.path.join(PARENT_DIR, path)
+
+
+def open_snapshot(path=None):
+    """
+    Memory-maps a snapshot read-only. Nothing is read until it is searched.
+    Returns:
+        GallerySegment: Views over the file, or None if there is no readable snapshot.
+    """
+    path = snapshot_path(path)
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        return GallerySegment(np.memmap(path, dtype=np.uint8, mode="r"), os.path.basename(path))
+    except (ValueError, OSError) as e:
+        print(f"GALLERY_SNAPSHOT: Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+@contextlib.contextmanager
+def _snapshot_lock(path):
+    """Serialises the version check and rename of concurrent writers (threads or processes)."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _snapshot_version(path):
+    """Gallery version of the snapshot at `path`, or None if there is none (or it has no version)."""
+    current = open_snapshot(path)
+    return None if current is None else current.version
+
+
+def write_snapshot(labels, vectors, names, version, path=None, centroids=None, force=False):
+    """
+    Writes a snapshot atomically: temporary file, fsync, then rename over the old snapshot.
+    Args:
+        labels (array-like): Criminal IDs.
+        vectors (array-like): Encodings, shape (N, dim), in the same order as labels.
+        names (mapping): Label -> criminal name.
+        version (int): Gallery version the rows correspond to.
+        path (str, optional): Defaults to config.GALLERY_SNAPSHOT_PATH.
+        centroids (array-like, optional): IVF quantizer to store with the snapshot.
+        force (bool): Replace the snapshot even if it is for the same or a newer gallery version.
+    Returns:
+        int: Size of the snapshot in bytes, or None if a snapshot for the same or a newer version
+            was already in place (nothing written).
+    """
+    path = snapshot_path(path)
+    image = GalleryImage(labels, vectors, names, centroids)
+    tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    try:
+        out = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=(image.size,))
+        image.write_to(out, version)
+        out.flush()
+        del out
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        with _snapshot_lock(path):
+            current_version = _snapshot_version(path)
+            if not force and version is not None and current_version is not None and current_version >= version:
+                return None
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return image.size
+
+
+def _quantizer(encodings, path):
+    """IVF centroids to store, reusing the current snapshot's if they fit; None unless GALLERY_INDEX_TYPE is "ivf"."""
+    if config.GALLERY_INDEX_TYPE != "ivf" or len(encodings) < config.IVF_NLIST:
+        return None
+    current = open_snapshot(path)
+    if current is not None and current.nlist == config.IVF_NLIST and current.dim == encodings.shape[1]:
+        return current.centroids.copy() # Retraining on every edit would reshuffle the lists for little gain
+    index = IVFIndex(encodings.shape[1])
+    index.train(encodings)
+    return index.centroids
+
+
+def compile_snapshot(conn=None, path=None, force=False):
+    """
+    Exports the current gallery from the database to the snapshot file.
+    Args:
+        conn (sqlite3.Connection, optional): Connection to read from; one is opened if omitted.
+        path (str, optional): Defaults to config.GALLERY_SNAPSHOT_PATH.
+        force (bool): Rewrite even if the snapshot is already for the current gallery version.
+    Returns:
+        int: The gallery version of the snapshot now in place, or None if nothing could be written.
+    """
+    path = snapshot_path(path)
+    if path is None:
+        return None
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_db()
+        if conn is None:
+            return None
+    try:
+        start = time.perf_counter()
+        # Version and rows are read in one transaction so that they match
+        conn.execute("BEGIN")
+        try:
+            version = get_gallery_version(conn)
+            if version is None:
+                print("GALLERY_SNAPSHOT: Database has no gallery version tracking; run database_setup.py. "
+                      "Snapshot not written.")
+                return None
+            current_version = _snapshot_version(path)
+            if not force and current_version is not None and current_version >= version:
+                return current_version # Already compiled at this version (e.g. by an earlier edit in a burst) or newer
+            gallery = get_gallery(conn)
+        finally:
+            conn.rollback()
+        names = dict(zip(gallery.ids.tolist(), gallery.names))
+        size = write_snapshot(gallery.ids, gallery.encodings, names, version, path,
+                              _quantizer(gallery.encodings, path), force)
+        if size is None:
+            print(f"GALLERY_SNAPSHOT: Not writing gallery version {version}; a newer snapshot is already in place.")
+            return _snapshot_version(path)
+        print(f"GALLERY_SNAPSHOT: Wrote {len(gallery.ids)} encodings (gallery version {version}, "
+              f"{size / 2**20:.1f} MiB) in {time.perf_counter() - start:.2f}s.")
+        # Detectors further behind than the kept log map this snapshot or reload in full
+        try:
+            prune_gallery_changes(conn, version)
+        except sqlite3.Error as e:
+            print(f"GALLERY_SNAPSHOT: Could not trim the gallery change log: {e}")
+        return version
+    finally:
+        if own_conn:
+            conn.close()
+
+
+class SnapshotCompiler:
+    """
+    Recompiles the snapshot on a background thread, e.g. after the dashboard changes criminals.
+    request() returns at once; requests that arrive while a compile is running are coalesced
+    into one more compile, so a burst of edits costs at most two.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._requested = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def request(self):
+        if snapshot_path(self.path) is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="SnapshotCompiler", daemon=True)
+                self._thread.start()
+        self._requested.set()
+
+    def _run(self):
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            try:
+                compile_snapshot(path=self.path)
+            except Exception as e:
+                print(f"GALLERY_SNAPSHOT: Error compiling gallery snapshot: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the gallery snapshot the detector memory-maps at startup.")
+    parser.add_argument("--path", default=None, help="Snapshot file (default: config.GALLERY_SNAPSHOT_PATH).")
+    parser.add_argument("--open", action="store_true", help="Only time opening the existing snapshot.")
+    args = parser.parse_args()
+    if not args.open:
+        compile_snapshot(path=args.path, force=True)
+    start = time.perf_counter()
+    segment = open_snapshot(args.path)
+    if segment is None:
+        print("GALLERY_SNAPSHOT: No snapshot to open.")
+        return
+    print(f"GALLERY_SNAPSHOT: Opened {segment.count} encodings (gallery version {segment.version}, "
+          f"{'IVF nlist=' + str(segment.nlist) if segment.nlist else 'brute force'}) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+
+if __name__ == '__main__':
+    main()
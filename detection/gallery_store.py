@@ -0,0 +1,441 @@
+# detection/gallery_store.py
+
+# Gallery shared between detector processes on one box. One process (the one running the
+# GalleryWatcher) publishes every gallery snapshot into a multiprocessing.shared_memory segment;
+# other processes attach to it and search the float32 matrix in place, so memory use stays flat
+# however many detector processes run.
+#
+# Segments are immutable. Each publish writes a new data segment "<name>_<publisher id>_<generation>"
+# and then bumps the generation in a small control segment "<name>"; readers poll the control
+# segment and re-attach when the (publisher id, generation) pair changes. The control segment is a
+# seqlock: its sequence (2 * generation) is odd while the publisher rewrites the segment name, and
+# readers retry until they see the same even sequence before and after reading the name.
+# The previous data segment is kept until the next publish so readers that are switching over can
+# still attach to it.
+# A publisher clears the control magic before unlinking the control segment (on close, or when it
+# replaces one left behind by a crashed publisher), which tells readers to re-attach it by name.
+#
+# Data segment layout (little-endian; arrays 8-byte aligned):
+#   header      64 bytes: magic, gallery version, generation, count, dim, names size, nlist
+#   vectors     float32 (count, dim)   face encodings, rows sorted by label
+#   sq_norms    float32 (count,)       precomputed squared norms of the rows
+#   labels      int64   (count,)       criminal IDs, ascending
+#   name_ends   int64   (count,)       end offset of each row's name in the names blob
+#   names       UTF-8 bytes, concatenated
+#
+# With nlist > 0 the image also carries an IVF quantizer. Rows are then grouped by inverted list
+# (so labels are no longer sorted), and these sections come between name_ends and names:
+#   sorted_labels  int64   (count,)        labels, ascending
+#   label_rows     int64   (count,)        row of each sorted label
+#   centroids      float32 (nlist, dim)    coarse quantizer
+#   list_ends      int64   (nlist,)        end row of each inverted list
+#
+# The same layout is used for the gallery snapshot file (see gallery_snapshot.py).
+
+import secrets
+import struct
+import threading
+import time
+
+import numpy as np
+
+import config # Import the new config file
+from .face_index import FaceIndex, IVFIndex, _pairwise_distances, _sq_norms, _top_k
+from .matcher import GalleryMatcher
+from .worker_pool import _attach_shared_memory
+
+MAGIC = b"BBGALRY1"
+CONTROL_MAGIC = b"BBGALCTL"
+HEADER = struct.Struct("<8sqQQQQQ")  # magic, gallery version (-1 = unknown), generation, count, dim, names size, nlist
+HEADER_SIZE = 64
+CONTROL = struct.Struct("<8sQQ64s")  # magic, sequence (2 * generation, odd while writing), publisher id, data segment name
+CONTROL_READ_ATTEMPTS = 10 # Reads of a control segment that is mid-write before giving up until the next poll
+NO_VERSION = -1
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(count, dim, names_size, nlist=0):
+    """Byte offsets of each section and the total size of a data segment."""
+    offsets = {"vectors": HEADER_SIZE}
+    offsets["sq_norms"] = _align(offsets["vectors"] + 4 * count * dim)
+    offsets["labels"] = _align(offsets["sq_norms"] + 4 * count)
+    offsets["name_ends"] = offsets["labels"] + 8 * count
+    end = offsets["name_ends"] + 8 * count
+    if nlist:
+        offsets["sorted_labels"] = end
+        offsets["label_rows"] = offsets["sorted_labels"] + 8 * count
+        offsets["centroids"] = offsets["label_rows"] + 8 * count
+        offsets["list_ends"] = _align(offsets["centroids"] + 4 * nlist * dim)
+        end = offsets["list_ends"] + 8 * nlist
+    offsets["names"] = end
+    return offsets, max(1, offsets["names"] + names_size)
+
+
+class GalleryImage:
+    """
+    A gallery laid out for a data segment or snapshot file, ready to be written with write_to().
+    Args:
+        labels (array-like): Criminal IDs.
+        vectors (array-like): Encodings, shape (N, dim), in the same order as labels.
+        names (mapping): Label -> criminal name.
+        centroids (array-like, optional): IVF centroids (nlist, dim); rows are grouped by list.
+    """
+
+    def __init__(self, labels, vectors, names, centroids=None):
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(labels), -1) if len(labels) else \
+            np.empty((0, config.FACE_ENCODING_DIM), dtype=np.float32)
+        self.centroids = None
+        self.list_ends = None
+        if centroids is not None and len(labels):
+            self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+            assign = IVFIndex._nearest(vectors, self.centroids, _sq_norms(self.centroids))
+            order = np.lexsort((labels, assign))
+            self.list_ends = np.cumsum(np.bincount(assign, minlength=len(self.centroids)), dtype=np.int64)
+        else:
+            order = np.argsort(labels, kind="stable")
+        self.labels = labels[order]
+        self.vectors = vectors[order]
+        self.count, self.dim = self.vectors.shape
+        self.nlist = 0 if self.centroids is None else len(self.centroids)
+        encoded_names = [names[int(label)].encode("utf-8") for label in self.labels]
+        self.names_blob = b"".join(encoded_names)
+        self.name_ends = np.cumsum([len(n) for n in encoded_names], dtype=np.int64)
+        self.offsets, self.size = _layout(self.count, self.dim, len(self.names_blob), self.nlist)
+
+    def write_to(self, buf, version=None, generation=0):
+        """Writes the image into a writable buffer of at least self.size bytes."""
+        count, dim, offsets = self.count, self.dim, self.offsets
+        np.ndarray((count, dim), dtype=np.float32, buffer=buf, offset=offsets["vectors"])[...] = self.vectors
+        np.ndarray((count,), dtype=np.float32, buffer=buf, offset=offsets["sq_norms"])[...] = _sq_norms(self.vectors)
+        np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["labels"])[...] = self.labels
+        np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["name_ends"])[...] = self.name_ends
+        if self.nlist:
+            label_rows = np.argsort(self.labels, kind="stable")
+            np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["sorted_labels"])[...] = \
+                self.labels[label_rows]
+            np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["label_rows"])[...] = label_rows
+            np.ndarray((self.nlist, dim), dtype=np.float32, buffer=buf, offset=offsets["centroids"])[...] = \
+                self.centroids
+            np.ndarray((self.nlist,), dtype=np.int64, buffer=buf, offset=offsets["list_ends"])[...] = self.list_ends
+        buf = memoryview(buf).cast("B")
+        buf[offsets["names"]:offsets["names"] + len(self.names_blob)] = self.names_blob
+        HEADER.pack_into(buf, 0, MAGIC, NO_VERSION if version is None else version, generation,
+                         count, dim, len(self.names_blob), self.nlist)
+
+
+class GallerySegment:
+    """
+    Read-only NumPy views over one gallery image (no copies).
+    Args:
+        buf (buffer): The image, e.g. a SharedMemory's buf or a read-only np.memmap of a snapshot file.
+        source (str): Segment or file name, for messages.
+        release (callable, optional): Called once the views are gone, e.g. SharedMemory.close.
+    """
+
+    def __init__(self, buf, source, release=None):
+        self.source = source
+        self._buf = buf
+        self._release = release
+        magic, version, generation, count, dim, names_size, nlist = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{source} is not a gallery image.")
+        self.version = None if version == NO_VERSION else version
+        self.generation = generation
+        self.count = count
+        self.dim = dim
+        self.nlist = nlist
+        offsets, size = _layout(count, dim, names_size, nlist)
+        if len(buf) < size:
+            raise ValueError(f"{source} is truncated ({len(buf)} of {size} bytes).")
+        self.vectors = np.ndarray((count, dim), dtype=np.float32, buffer=buf, offset=offsets["vectors"])
+        self.sq_norms = np.ndarray((count,), dtype=np.float32, buffer=buf, offset=offsets["sq_norms"])
+        self.labels = np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["labels"])
+        self.name_ends = np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["name_ends"])
+        self.sorted_labels = self.label_rows = self.centroids = self.list_ends = None
+        self.centroid_sq_norms = None
+        if nlist:
+            self.sorted_labels = np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["sorted_labels"])
+            self.label_rows = np.ndarray((count,), dtype=np.int64, buffer=buf, offset=offsets["label_rows"])
+            self.centroids = np.ndarray((nlist, dim), dtype=np.float32, buffer=buf, offset=offsets["centroids"])
+            self.list_ends = np.ndarray((nlist,), dtype=np.int64, buffer=buf, offset=offsets["list_ends"])
+            self.centroid_sq_norms = _sq_norms(self.centroids)
+        self._names_offset = offsets["names"]
+        for array in self._views():
+            array.flags.writeable = False
+
+    def _views(self):
+        return [a for a in (self.vectors, self.sq_norms, self.labels, self.name_ends, self.sorted_labels,
+                            self.label_rows, self.centroids, self.list_ends) if a is not None]
+
+    def row_of(self, label):
+        """Row of a label, or None if it is not in the image."""
+        sorted_labels = self.labels if self.sorted_labels is None else self.sorted_labels
+        i = int(np.searchsorted(sorted_labels, label))
+        if i < self.count and sorted_labels[i] == label:
+            return i if self.label_rows is None else int(self.label_rows[i])
+        return None
+
+    def name(self, row):
+        start = int(self.name_ends[row - 1]) if row else 0
+        end = int(self.name_ends[row])
+        return bytes(self._buf[self._names_offset + start:self._names_offset + end]).decode("utf-8")
+
+    def __del__(self):
+        # Views must go before the mapping can be closed; the index and name map only reference
+        # the segment itself, so nothing else holds them once the segment is released.
+        self.vectors = self.sq_norms = self.labels = self.name_ends = None
+        self.sorted_labels = self.label_rows = self.centroids = self.list_ends = None
+        self._buf = None
+        if self._release is not None:
+            try:
+                self._release()
+            except (BufferError, OSError):
+                pass
+
+
+class SharedGalleryIndex(FaceIndex):
+    """
+    Search directly over a published segment or snapshot file. Read-only.
+    Exact brute force, unless the image carries an IVF quantizer: then only the `nprobe` closest
+    inverted lists (contiguous row ranges) are scanned, as in IVFIndex.
+    """
+
+    def __init__(self, segment, nprobe=None):
+        super().__init__(segment.dim)
+        self.segment = segment
+        self.nprobe = config.IVF_NPROBE if nprobe is None else nprobe
+
+    def __len__(self):
+        return self.segment.count
+
+    def __contains__(self, label):
+        return self.segment.row_of(label) is not None
+
+    def add(self, labels, vectors):
+        raise NotImplementedError("The shared gallery is read-only; changes are made by the publishing process.")
+
+    def remove(self, labels):
+        raise NotImplementedError("The shared gallery is read-only; changes are made by the publishing process.")
+
+    def export(self):
+        return self.segment.labels.copy(), self.segment.vectors.copy()
+
+    def search(self, queries, k=1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        segment = self.segment
+        if not segment.nlist or self.nprobe >= segment.nlist:
+            dist = _pairwise_distances(queries, segment.vectors, segment.sq_norms)
+            return _top_k(dist, segment.labels, k)
+
+        out_labels = np.full((len(queries), k), -1, dtype=np.int64)
+        out_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        coarse = segment.centroid_sq_norms[None, :] - 2.0 * (queries @ segment.centroids.T)
+        probes = np.argpartition(coarse, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        list_ends = segment.list_ends
+        for qi, query in enumerate(queries):
+            rows = [slice(int(list_ends[p - 1]) if p else 0, int(list_ends[p])) for p in probes[qi]]
+            rows = [r for r in rows if r.stop > r.start]
+            if not rows:
+                continue
+            dist = np.concatenate([_pairwise_distances(query[None, :], segment.vectors[r], segment.sq_norms[r])
+                                   for r in rows], axis=1)
+            labels = np.concatenate([segment.labels[r] for r in rows])
+            out_labels[qi], out_dist[qi] = (a[0] for a in _top_k(dist, labels, k))
+        return out_labels, out_dist
+
+
+class SharedGalleryNames:
+    """Label -> name lookups decoded from the segment on demand (only matched labels are ever decoded)."""
+
+    def __init__(self, segment):
+        self.segment = segment
+
+    def __len__(self):
+        return self.segment.count
+
+    def __contains__(self, label):
+        return self.segment.row_of(label) is not None
+
+    def __getitem__(self, label):
+        row = self.segment.row_of(label)
+        if row is None:
+            raise KeyError(label)
+        return self.segment.name(row)
+
+
+class GalleryPublisher:
+    """Publishes gallery snapshots to shared memory for SharedGalleryReader processes."""
+
+    def __init__(self, name=None):
+        self.name = config.GALLERY_SHM_NAME if name is None else name
+        self.generation = 0
+        self.publisher_id = secrets.randbits(32) # Tells readers a restarted publisher apart (generations restart at 1)
+        self._control = None
+        self._segments = [] # Published data segments still alive, oldest first
+
+    def publish(self, labels, vectors, names, version=None):
+        """
+        Writes a new snapshot and points the control segment at it.
+        Args:
+            labels (array-like): Criminal IDs.
+            vectors (array-like): Encodings, shape (N, dim), in the same order as labels.
+            names (mapping): Label -> criminal name.
+            version (int, optional): Gallery version the snapshot corresponds to.
+        """
+        from multiprocessing import shared_memory
+        image = GalleryImage(labels, vectors, names)
+        self.generation += 1
+        shm = shared_memory.SharedMemory(name=f"{self.name}_{self.publisher_id:08x}_{self.generation}",
+                                         create=True, size=image.size)
+        image.write_to(shm.buf, version, self.generation)
+
+        self._set_current(shm.name)
+        self._segments.append(shm)
+        while len(self._segments) > 2: # Keep the previous snapshot for readers that are switching over
+            old = self._segments.pop(0)
+            old.close()
+            old.unlink()
+        print(f"GALLERY_STORE: Published {image.count} encodings to shared memory "
+              f"(generation {self.generation}, {image.size / 1024:.0f} KiB).")
+
+    def _set_current(self, segment_name):
+        from multiprocessing import shared_memory
+        if self._control is None:
+            try:
+                self._control = shared_memory.SharedMemory(name=self.name, create=True, size=CONTROL.size)
+            except FileExistsError:
+                # Left behind by a publisher that did not shut down cleanly
+                stale = _attach_shared_memory(self.name)
+                _retire_control(stale)
+                self._control = shared_memory.SharedMemory(name=self.name, create=True, size=CONTROL.size)
+        # Odd sequence while the name and publisher ID change, even again once they are complete
+        _store_sequence(self._control.buf, 2 * self.generation - 1)
+        struct.pack_into("<8s", self._control.buf, 0, CONTROL_MAGIC)
+        struct.pack_into("<Q64s", self._control.buf, 16, self.publisher_id, segment_name.encode("ascii"))
+        _store_sequence(self._control.buf, 2 * self.generation)
+
+    def close(self):
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        if self._control is not None:
+            _retire_control(self._control)
+        self._segments = []
+        self._control = None
+
+
+def _load_sequence(buf):
+    """Reads the control sequence with one aligned 8-byte load (struct's "<Q" goes byte by byte, so it can tear)."""
+    return buf[8:16].cast("Q")[0]
+
+
+def _store_sequence(buf, sequence):
+    """Writes the control sequence with one aligned 8-byte store."""
+    buf[8:16].cast("Q")[0] = sequence
+
+
+def _retire_control(shm):
+    """Clears a control segment's magic (so attached readers re-attach by name), then unlinks it."""
+    struct.pack_into("<8s", shm.buf, 0, bytes(8))
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass # Already replaced by a newer publisher
+
+
+class SharedGalleryReader:
+    """
+    Serves a GalleryMatcher backed by the segment a GalleryPublisher in another process maintains.
+    Same interface as GalleryWatcher (load/start/stop and a `matcher` attribute swapped on change).
+    """
+
+    def __init__(self, poll_interval=None, name=None):
+        self.poll_interval = config.GALLERY_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.name = config.GALLERY_SHM_NAME if name is None else name
+        self.matcher = GalleryMatcher([], [])
+        self.generation = None
+        self.publisher_id = None
+        self.version = None
+        self._control = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Attaches to the current snapshot. Returns the number of gallery entries (0 if nothing is published yet)."""
+        try:
+            self.poll()
+        except Exception as e:
+            print(f"GALLERY_STORE: Could not attach to shared gallery '{self.name}': {e}")
+        return len(self.matcher)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="SharedGalleryReader", daemon=True)
+        self._thread.start()
+        print(f"GALLERY_STORE: Checking shared gallery '{self.name}' for new snapshots every {self.poll_interval}s.")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"GALLERY_STORE: Error while checking the shared gallery: {e}")
+
+    def _read_control(self):
+        """
+        Returns (publisher id, generation, data segment name), or Nones if nothing is published
+        (or the publisher is still writing it; the next poll tries again).
+        """
+        for _ in range(2):
+            if self._control is None:
+                self._control = _attach_shared_memory(self.name)
+            for _ in range(CONTROL_READ_ATTEMPTS):
+                sequence = _load_sequence(self._control.buf)
+                magic, _, publisher_id, raw_name = CONTROL.unpack_from(self._control.buf, 0)
+                if magic != CONTROL_MAGIC:
+                    break
+                if sequence % 2 == 0 and _load_sequence(self._control.buf) == sequence:
+                    return publisher_id, sequence // 2, raw_name.rstrip(b"\0").decode("ascii")
+                time.sleep(0.001) # Publisher is mid-write
+            else:
+                return None, None, None
+            # Nothing published yet, or retired by a publisher that shut down: re-attach by name
+            self._control.close()
+            self._control = None
+        return None, None, None
+
+    def poll(self):
+        """Swaps in the newest published snapshot if the publisher or generation changed. Returns True if it did."""
+        try:
+            publisher_id, generation, segment_name = self._read_control()
+        except FileNotFoundError:
+            return False # Publisher not running (yet)
+        if generation is None or (publisher_id, generation) == (self.publisher_id, self.generation):
+            return False
+        try:
+            shm = _attach_shared_memory(segment_name)
+            segment = GallerySegment(shm.buf, shm.name, shm.close)
+        except FileNotFoundError:
+            return False # Superseded while we were switching; the next poll picks up the newer one
+        self.matcher = GalleryMatcher.from_index(SharedGalleryIndex(segment), SharedGalleryNames(segment))
+        self.generation = segment.generation
+        self.publisher_id = publisher_id
+        self.version = segment.version
+        print(f"GALLERY_STORE: Attached to shared gallery generation {segment.generation} "
+              f"(gallery version {segment.version}, {segment.count} encodings).")
+        return True
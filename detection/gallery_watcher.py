@@ -0,0 +1,183 @@
+# detection/gallery_watcher.py
+
+import threading
+import time
+
+import config # Import the new config file
+from .db_utils import connect_db, get_gallery, get_gallery_version, get_gallery_changes
+from .gallery_snapshot import open_snapshot, snapshot_path, write_snapshot
+from .gallery_store import SharedGalleryIndex, SharedGalleryNames
+from .matcher import GalleryMatcher
+
+
+class GalleryWatcher:
+    """
+    Keeps a GalleryMatcher in sync with the criminals table while the detector runs.
+
+    A background thread polls `PRAGMA data_version` on its own long-lived connection, which only
+    changes when another connection (e.g. the dashboard) commits. When it does, the gallery version
+    row is checked and only the criminals logged in gallery_changes since the last load are fetched
+    (everything is reloaded if that part of the log has since been trimmed).
+    The delta is applied to a copy of the current matcher, which is then swapped in with a single
+    reference assignment, so the frame loop never waits on a reload: it just reads `watcher.matcher`
+    once per frame.
+    With a GalleryPublisher, every new snapshot is also published to shared memory for other
+    detector processes (see gallery_store.py).
+    If the compiled snapshot file (see gallery_snapshot.py) matches the database's gallery version,
+    it is memory-mapped instead of loading every row, both at startup and after changes.
+    """
+
+    def __init__(self, poll_interval=None, publisher=None):
+        self.poll_interval = config.GALLERY_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.publisher = publisher
+        self.matcher = GalleryMatcher([], [])
+        self.version = None
+        self._conn = None
+        self._data_version = None
+        self._stale_snapshot_since = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Performs the initial full load synchronously. Returns the number of gallery entries."""
+        self._conn = connect_db()
+        if self._conn is None:
+            return 0
+        self._data_version = self._read_data_version()
+        self.version = get_gallery_version(self._conn)
+        if not self._load_snapshot(self.version):
+            self._full_reload()
+            self._write_snapshot()
+        return len(self.matcher)
+
+    def start(self):
+        """Starts the background polling thread."""
+        if self._conn is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="GalleryWatcher", daemon=True)
+        self._thread.start()
+        print(f"GALLERY_WATCHER: Polling for gallery changes every {self.poll_interval}s.")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self.publisher is not None:
+            self.publisher.close()
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _full_reload(self):
+        gallery = get_gallery(self._conn)
+        self.matcher = GalleryMatcher(gallery.encodings, gallery.names, labels=gallery.ids)
+        print(f"GALLERY_WATCHER: Loaded {len(gallery.ids)} known face encodings.")
+        self._publish()
+
+    def _load_snapshot(self, version):
+        """Maps the compiled snapshot if it is for `version`. Returns True if it was loaded."""
+        if version is None:
+            return False
+        start = time.perf_counter()
+        segment = open_snapshot()
+        if segment is None or segment.version != version:
+            return False
+        self.matcher = GalleryMatcher.from_index(SharedGalleryIndex(segment), SharedGalleryNames(segment))
+        self._stale_snapshot_since = None
+        print(f"GALLERY_WATCHER: Mapped gallery snapshot (version {version}, {segment.count} encodings) "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        self._publish()
+        return True
+
+    def _write_snapshot(self):
+        # After a full load from the database (no usable snapshot), so that the next startup is fast
+        if self.version is None or snapshot_path() is None:
+            return
+        try:
+            labels, vectors = self.matcher.index.export()
+            if write_snapshot(labels, vectors, self.matcher.names, self.version) is not None:
+                print(f"GALLERY_WATCHER: Wrote gallery snapshot for version {self.version}.")
+        except Exception as e:
+            print(f"GALLERY_WATCHER: Could not write gallery snapshot: {e}")
+
+    def _waiting_for_snapshot(self):
+        """
+        A snapshot-backed matcher is read-only, so applying a delta means rebuilding it in memory.
+        The dashboard recompiles the snapshot right after each change, so give it a moment first.
+        """
+        if not isinstance(self.matcher.index, SharedGalleryIndex):
+            return False
+        now = time.monotonic()
+        if self._stale_snapshot_since is None:
+            self._stale_snapshot_since = now
+        return now - self._stale_snapshot_since < config.GALLERY_SNAPSHOT_WAIT
+
+    def _mutable_copy(self):
+        if isinstance(self.matcher.index, SharedGalleryIndex):
+            labels, vectors = self.matcher.index.export()
+            names = [self.matcher.names[int(label)] for label in labels]
+            return GalleryMatcher(vectors, names, tolerance=self.matcher.tolerance, labels=labels)
+        return self.matcher.copy()
+
+    def _publish(self):
+        if self.publisher is None:
+            return
+        try:
+            labels, vectors = self.matcher.index.export()
+            self.publisher.publish(labels, vectors, self.matcher.names, self.version)
+        except Exception as e:
+            print(f"GALLERY_WATCHER: Error publishing gallery to shared memory: {e}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"GALLERY_WATCHER: Error while checking for gallery changes: {e}")
+
+    def poll(self):
+        """Checks for changes once and swaps in an updated matcher if needed. Returns True if reloaded."""
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+
+        version = get_gallery_version(self._conn)
+        if version is None:
+            # Database without version tracking: any commit (including our own alerts) forces a full reload
+            self._full_reload()
+            return True
+        if version == self.version:
+            return False # Some other table changed (e.g. alerts)
+
+        if self._load_snapshot(version):
+            self.version = version
+            return True
+        if self._waiting_for_snapshot():
+            self._data_version = None # Check again on the next poll
+            return False
+        self._stale_snapshot_since = None
+
+        if self.version is None:
+            changed_ids = None
+        else:
+            changed_ids = get_gallery_changes(self._conn, self.version)
+        self.version = version
+
+        if changed_ids is None:
+            self._full_reload()
+            return True
+
+        gallery = get_gallery(self._conn, changed_ids)
+        snapshot = self._mutable_copy()
+        snapshot.remove(changed_ids) # Deleted rows stay removed, updated rows are re-added below
+        snapshot.add(gallery.ids, gallery.encodings, gallery.names)
+        self.matcher = snapshot
+        print(f"GALLERY_WATCHER: Gallery version {version}: {len(changed_ids)} criminals changed, "
+              f"{len(snapshot)} in gallery.")
+        self._publish()
+        return True
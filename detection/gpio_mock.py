@@ -2,16 +2,30 @@
 
 # This script provides a mock for RPi.GPIO for development on non-Raspberry Pi systems (e.g., Windows)
 
+import sys
+import time
+
 BCM = "BCM_MODE"
 OUT = "OUTPUT_MODE"
+IN = "INPUT_MODE"
 HIGH = 1
 LOW = 0
 PUD_UP = "PULL_UP_MODE" # Placeholder, not used in current buzzer logic but good to have
 PUD_DOWN = "PULL_DOWN_MODE" # Placeholder
+RISING = "RISING_EDGE"
+FALLING = "FALLING_EDGE"
+BOTH = "BOTH_EDGES"
 
 # GPIO pin for the buzzer (example, can be configured)
 BUZZER_PIN = 18 # Example GPIO pin
 
+# Last level written to / injected on each pin, so tests can inspect outputs and drive inputs
+pin_states = {}
+# (channel, state) for every output() call, in order
+output_log = []
+# Edge detection registered with add_event_detect: channel -> {"edge", "callbacks", "bouncetime", "last_edge", "detected"}
+_event_detects = {}
+
 def setmode(mode):
     print(f"[GPIO_MOCK] Set GPIO mode to {mode}")
 
@@ -30,8 +44,62 @@ def setup(channel, mode, initial=LOW, pull_up_down=None):
 def output(channel, state):
     pin_name = "BUZZER" if channel == BUZZER_PIN else f"PIN_{channel}"
     status = "ON" if state == HIGH else "OFF"
+    pin_states[channel] = state
+    output_log.append((channel, state))
     print(f"[GPIO_MOCK] Set {pin_name} (GPIO {channel}) to {status} ({state})")
 
+def input(channel):
+    return pin_states.get(channel, LOW)
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    _event_detects[channel] = {"edge": edge, "callbacks": [callback] if callback else [],
+                               "bouncetime": bouncetime, "last_edge": None, "detected": False}
+    print(f"[GPIO_MOCK] Edge detection {edge} on GPIO pin {channel} (bouncetime {bouncetime} ms)")
+
+def add_event_callback(channel, callback):
+    if channel not in _event_detects:
+        raise RuntimeError(f"Add event detection using add_event_detect first before adding a callback (pin {channel})")
+    _event_detects[channel]["callbacks"].append(callback)
+
+def remove_event_detect(channel):
+    _event_detects.pop(channel, None)
+    print(f"[GPIO_MOCK] Edge detection removed from GPIO pin {channel}")
+
+def event_detected(channel):
+    detect = _event_detects.get(channel)
+    if not detect or not detect["detected"]:
+        return False
+    detect["detected"] = False
+    return True
+
+def inject_edge(channel, state, timestamp=None):
+    """
+    Test helper: drives an input pin to `state` and, like RPi.GPIO, runs the registered
+    callbacks if the resulting edge matches add_event_detect (edges inside bouncetime are ignored).
+    Callbacks run synchronously on the caller's thread.
+    Returns:
+        bool: True if callbacks were fired.
+    """
+    previous = pin_states.get(channel, LOW)
+    pin_states[channel] = state
+    if previous == state:
+        return False
+    detect = _event_detects.get(channel)
+    if detect is None:
+        return False
+    edge = RISING if state == HIGH else FALLING
+    if detect["edge"] not in (edge, BOTH):
+        return False
+    now = time.monotonic() if timestamp is None else timestamp
+    if detect["bouncetime"] and detect["last_edge"] is not None and \
+       (now - detect["last_edge"]) * 1000 < detect["bouncetime"]:
+        return False
+    detect["last_edge"] = now
+    detect["detected"] = True
+    for callback in detect["callbacks"]:
+        callback(channel)
+    return True
+
 def cleanup(channel=None):
     if channel:
         if isinstance(channel, list):
@@ -74,6 +142,9 @@ def setwarnings(flag):
 # However, for simple use cases, direct function imports are fine.
 # We will conditionally import this or the real RPi.GPIO in the main detection script.
 
+# detector.py does `from .gpio_mock import GPIO`, mirroring `import RPi.GPIO as GPIO`
+GPIO = sys.modules[__name__]
+
 if __name__ == '__main__':
     # Example usage of the mock
     setwarnings(False)
@@ -81,7 +152,7 @@ if __name__ == '__main__':
     setup(BUZZER_PIN, OUT)
     print(f"Simulating turning buzzer ON (GPIO {BUZZER_PIN})")
     output(BUZZER_PIN, HIGH)
-    # time.sleep(1) # Requires import time
+    # time.sleep(1)
     print(f"Simulating turning buzzer OFF (GPIO {BUZZER_PIN})")
     output(BUZZER_PIN, LOW)
     cleanup()
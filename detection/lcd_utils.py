@@ -1,4 +1,7 @@
+import heapq
+import itertools
 import socket
+import threading
 import time
 
 import config # Import the new config file
@@ -21,6 +24,14 @@ else:
 # Global LCD instance
 lcd = None
 
+# Global render thread (see start_renderer); None means display_message writes directly
+renderer = None
+
+# Message priorities for show_message: higher pre-empts lower until it expires
+PRIORITY_IDLE = 0
+PRIORITY_STATUS = 1
+PRIORITY_ALERT = 2
+
 # --- LCD Initialization ---
 def init_lcd():
     global lcd
@@ -59,7 +70,13 @@ def display_message(line1: str, line2: str = "", duration: float = 0):
     Displays up to two lines of text on the LCD.
     Clears previous content.
     If duration > 0, message is displayed for that time, then LCD is cleared.
+    If the render thread is running, the message is queued as a status message with
+    `duration` as its time-to-live instead, and this returns immediately.
     """
+    if renderer is not None:
+        renderer.show(line1, line2, priority=PRIORITY_STATUS, ttl=duration or None)
+        return
+
     if lcd is None:
         print(f"LCD_UTILS_DISABLED: Display Message: L1: '{line1}', L2: '{line2}'")
         return
@@ -79,6 +96,162 @@ def display_message(line1: str, line2: str = "", duration: float = 0):
         print(f"LCD_UTILS: Error displaying message: {e}")
 
 
+class LcdRenderer:
+    """
+    Background thread that owns the LCD while the detector runs.
+
+    Messages carry a priority and an optional time-to-live. The highest-priority unexpired
+    message is shown (the newest one wins within a priority); when it expires the next one
+    takes over, down to the idle screen. Instead of lcd.clear() and a full rewrite, only the
+    characters that differ from what is already on the display are written, unless that would
+    take more I2C writes than the repaint (e.g. a long line replaced by a short one, where the
+    padding has to be blanked out). The number of writes saved is counted.
+    """
+
+    def __init__(self, lcd_device, cols=None, rows=None, idle_lines=("Status: Idle", "Monitoring...")):
+        self.lcd = lcd_device
+        self.cols = config.LCD_COLS if cols is None else cols
+        self.rows = config.LCD_ROWS if rows is None else rows
+        self.idle_lines = self._fit(idle_lines)
+        self._messages = []               # Heap of (-priority, -sequence, expires_at, lines)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self._screen = None               # Shadow copy of what is currently on the display
+        # I2C write accounting: one write per character or cursor move, one per clear
+        self.writes = 0
+        self.full_repaint_writes = 0
+        self.renders = 0
+
+    def _fit(self, lines):
+        lines = list(lines)[:self.rows] + [""] * max(0, self.rows - len(lines))
+        return tuple(line[:self.cols].ljust(self.cols) for line in lines)
+
+    @property
+    def writes_saved(self):
+        return self.full_repaint_writes - self.writes
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="LcdRenderer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def show(self, line1, line2="", priority=PRIORITY_STATUS, ttl=None):
+        """Queues a message. ttl=None keeps it until a message of the same or higher priority replaces it."""
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._cond:
+            # A new message replaces any older one of the same priority
+            self._messages = [m for m in self._messages if -m[0] != priority]
+            heapq.heapify(self._messages)
+            heapq.heappush(self._messages, (-priority, -next(self._sequence), expires_at, self._fit((line1, line2))))
+            self._cond.notify()
+
+    def _current_locked(self, now):
+        while self._messages:
+            _, _, expires_at, lines = self._messages[0]
+            if expires_at is not None and expires_at <= now:
+                heapq.heappop(self._messages)
+                continue
+            return lines, expires_at
+        return self.idle_lines, None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+                lines, expires_at = self._current_locked(time.monotonic())
+            if lines != self._screen:
+                self._render(lines)
+            with self._cond:
+                if self._stop:
+                    return
+                timeout = None if expires_at is None else max(0.0, expires_at - time.monotonic())
+                self._cond.wait(timeout)
+
+    def _changed_runs(self, lines):
+        """(row, col, text) for each run of characters that differs from the shadow screen."""
+        runs = []
+        for row, (old, new) in enumerate(zip(self._screen, lines)):
+            col = 0
+            while col < self.cols:
+                if old[col] == new[col]:
+                    col += 1
+                    continue
+                start = col
+                while col < self.cols and old[col] != new[col]:
+                    col += 1
+                runs.append((row, start, new[start:col]))
+        return runs
+
+    def _render(self, lines):
+        # What display_message would have cost: clear + cursor move and text per non-empty line
+        repaint_writes = 1 + sum(1 + len(line.rstrip()) for line in lines if line.strip())
+        self.full_repaint_writes += repaint_writes
+        self.renders += 1
+        if self.lcd is None:
+            print(f"LCD_UTILS_DISABLED: Display Message: L1: '{lines[0].rstrip()}', L2: '{lines[1].rstrip() if len(lines) > 1 else ''}'")
+            self._screen = lines
+            return
+        try:
+            # Unknown contents, or a diff dearer than clearing (one write per cursor move and character)
+            runs = None if self._screen is None else self._changed_runs(lines)
+            if runs is None or sum(1 + len(text) for _, _, text in runs) > repaint_writes:
+                self.lcd.clear()
+                runs = [(row, 0, line.rstrip()) for row, line in enumerate(lines) if line.strip()]
+                self.writes += 1
+            for row, col, text in runs:
+                self.lcd.cursor_pos = (row, col)
+                self.lcd.write_string(text)
+                self.writes += 1 + len(text)
+            self._screen = lines
+        except Exception as e:
+            print(f"LCD_UTILS: Error rendering message: {e}")
+            self._screen = None # Force a clean repaint next time
+
+    def stats(self):
+        return (f"{self.renders} renders, {self.writes} I2C writes, "
+                f"{self.writes_saved} saved vs. clear-and-rewrite")
+
+
+def start_renderer():
+    """Starts the LCD render thread; from now on LCD output goes through show_message/display_message."""
+    global renderer
+    if renderer is None:
+        renderer = LcdRenderer(lcd)
+        renderer.start()
+        print("LCD_UTILS: Render thread started.")
+    return renderer
+
+
+def stop_renderer():
+    """Stops the render thread (if running) and reports how many I2C writes diffing saved."""
+    global renderer
+    if renderer is not None:
+        renderer.stop()
+        print(f"LCD_UTILS: Render thread stopped. {renderer.stats()}")
+        renderer = None
+
+
+def show_message(line1: str, line2: str = "", priority: int = PRIORITY_STATUS, ttl: float = None):
+    """
+    Queues a prioritized message with an optional time-to-live on the render thread.
+    Falls back to a direct display_message if the render thread is not running.
+    """
+    if renderer is None:
+        display_message(line1, line2)
+        return
+    renderer.show(line1, line2, priority=priority, ttl=ttl)
+
+
 def display_ip_address(clear_after_delay: float = 10.0):
     """
     Fetches and displays the device's IP address on the LCD.
@@ -141,6 +314,7 @@ def clear_lcd():
 
 def close_lcd():
     """Closes the LCD connection and clears the screen."""
+    stop_renderer()
     if lcd is None:
         # print("LCD_UTILS_DISABLED: Close LCD requested.")
         return
@@ -0,0 +1,90 @@
+# detection/matcher.py
+
+import copy
+from collections import namedtuple
+
+import numpy as np
+
+import config # Import the new config file
+from .face_index import create_index
+
+# Result of matching one probe face against the gallery.
+# index:    label of the best gallery entry (-1 if the gallery is empty)
+# name:     name of the best gallery entry, or "Unknown" if it is not within tolerance
+# distance: Euclidean distance to the best gallery entry
+# margin:   distance gap between the best and second-best entries (inf if there is no second entry)
+# is_match: True if distance <= tolerance
+# criminal_id: label of the matched entry (the criminal ID for database galleries), None if not a match
+MatchResult = namedtuple("MatchResult", ["index", "name", "distance", "margin", "is_match", "criminal_id"])
+
+UNKNOWN_NAME = "Unknown"
+
+
+class GalleryMatcher:
+    """
+    Matches all faces of a frame against the gallery in one batched call.
+    The encodings live in a face index (see face_index.py): the default brute-force index keeps
+    them as one contiguous float32 matrix with precomputed squared norms, while the IVF index
+    trades a little recall for much lower latency on very large watchlists.
+    Entries are keyed by integer labels; by default these are the row positions of the input lists,
+    the gallery watchers use criminal IDs.
+    """
+
+    def __init__(self, known_face_encodings, known_criminal_names, tolerance=None, labels=None, index=None):
+        self.tolerance = config.MATCH_TOLERANCE if tolerance is None else tolerance
+        self.index = create_index() if index is None else index
+        self.names = {}
+        if labels is None:
+            labels = range(len(known_criminal_names))
+        self.add(labels, known_face_encodings, known_criminal_names)
+
+    @classmethod
+    def from_index(cls, index, names, tolerance=None):
+        """Wraps an already populated index; `names` maps label -> name (any mapping)."""
+        matcher = cls([], [], tolerance=tolerance, index=index)
+        matcher.names = names
+        return matcher
+
+    def __len__(self):
+        return len(self.index)
+
+    def copy(self):
+        """Returns an independent copy that can be modified while this one keeps serving matches."""
+        return copy.deepcopy(self)
+
+    def add(self, labels, face_encodings, names):
+        """Adds (or replaces) gallery entries."""
+        labels = list(labels)
+        if not labels:
+            return
+        self.index.add(labels, np.vstack(face_encodings))
+        for label, name in zip(labels, names):
+            self.names[int(label)] = name
+
+    def remove(self, labels):
+        """Removes gallery entries by label."""
+        self.index.remove(list(labels))
+        for label in labels:
+            self.names.pop(int(label), None)
+
+    def match(self, face_encodings):
+        """
+        Matches every face of a frame against the gallery in one batched call.
+        Args:
+            face_encodings (list): Encodings returned by face_recognition.face_encodings for one frame.
+        Returns:
+            list: One MatchResult per input encoding, in the same order.
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [MatchResult(-1, UNKNOWN_NAME, float("inf"), float("inf"), False, None) for _ in face_encodings]
+
+        labels, dist = self.index.search(np.asarray(face_encodings, dtype=np.float32), k=2)
+        results = []
+        for (best, _), (d, second_d) in zip(labels, dist):
+            is_match = bool(best >= 0 and d <= self.tolerance)
+            name = self.names[int(best)] if is_match else UNKNOWN_NAME
+            margin = float(second_d - d) if np.isfinite(d) else float("inf")
+            results.append(MatchResult(int(best), name, float(d), margin, is_match, int(best) if is_match else None))
+        return results
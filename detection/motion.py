@@ -0,0 +1,97 @@
+# detection/motion.py
+
+import threading
+import time
+
+import config # Import the new config file
+
+
+class MotionMonitor:
+    """
+    Edge-triggered PIR motion sensing.
+
+    Registers GPIO.add_event_detect on both edges (debounced with `bouncetime`), so the detector
+    is woken by the sensor instead of polling it with sleeps. The detection window runs until
+    FACE_DETECTION_DURATION after motion was last seen, so it keeps extending while motion continues.
+    Works with RPi.GPIO and detection/gpio_mock.py (use gpio_mock.inject_edge in tests).
+    """
+
+    def __init__(self, gpio, pin, debounce_ms=None, window=None):
+        self.gpio = gpio
+        self.pin = pin
+        self.debounce_ms = config.MOTION_DEBOUNCE_MS if debounce_ms is None else debounce_ms
+        self.window = config.FACE_DETECTION_DURATION if window is None else window
+        self._lock = threading.Lock()
+        self._motion_event = threading.Event()
+        self._listeners = []
+        self.motion_active = False
+        self.last_rise_time = None   # time.time() of the last rising edge
+        self.last_motion_time = None # time.time() motion was last known to be present
+        self._first_match_pending = False
+
+    def start(self):
+        self.gpio.add_event_detect(self.pin, self.gpio.BOTH, callback=self._on_edge, bouncetime=self.debounce_ms)
+        # A sensor that is already high at startup never produces a rising edge
+        if self.gpio.input(self.pin) == self.gpio.HIGH:
+            self._on_edge(self.pin)
+        print(f"MOTION: Edge detection enabled on GPIO pin {self.pin} (debounce {self.debounce_ms} ms).")
+
+    def stop(self):
+        try:
+            self.gpio.remove_event_detect(self.pin)
+        except Exception as e:
+            print(f"MOTION: Error removing edge detection: {e}")
+
+    def add_listener(self, callback):
+        """Registers callback(timestamp) to run (on the GPIO callback thread) when motion starts."""
+        self._listeners.append(callback)
+
+    def _on_edge(self, channel):
+        now = time.time()
+        # Read the level instead of trusting the edge type: debouncing may swallow one edge of a pair
+        level_high = self.gpio.input(self.pin) == self.gpio.HIGH
+        with self._lock:
+            started = level_high and not self.motion_active
+            if level_high or self.motion_active:
+                self.last_motion_time = now # Covers the falling edge: motion was present until now
+            self.motion_active = level_high
+            if started:
+                self.last_rise_time = now
+                self._first_match_pending = True
+        if started:
+            self._motion_event.set()
+            for callback in self._listeners:
+                try:
+                    callback(now)
+                except Exception as e:
+                    print(f"MOTION: Error in motion listener: {e}")
+
+    def wait_for_motion(self, timeout=None):
+        """Blocks until motion starts (or `timeout` seconds pass). Returns True if motion started."""
+        started = self._motion_event.wait(timeout)
+        self._motion_event.clear()
+        if not started and (self.gpio.input(self.pin) == self.gpio.HIGH) != self.motion_active:
+            # An edge was swallowed by debouncing: resynchronise with the actual pin level
+            self._on_edge(self.pin)
+            started = self._motion_event.is_set()
+            self._motion_event.clear()
+        return started
+
+    def window_end(self, now=None):
+        """End of the current detection window, or 0 if there has been no motion yet."""
+        with self._lock:
+            if self.last_motion_time is None:
+                return 0
+            last_seen = (time.time() if now is None else now) if self.motion_active else self.last_motion_time
+            return last_seen + self.window
+
+    def record_match(self, timestamp):
+        """
+        Call for each confirmed match. Returns the motion-to-first-match latency in seconds for the
+        first match after a rising edge, otherwise None.
+        """
+        with self._lock:
+            if not self._first_match_pending or self.last_rise_time is None:
+                return None
+            self._first_match_pending = False
+            return timestamp - self.last_rise_time
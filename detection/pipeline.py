@@ -0,0 +1,418 @@
+# detection/pipeline.py
+
+# Staged detection pipeline:
+#   frame grabber -> capture thread -> [frames] -\
+#   (one grabber, capture thread and frames queue per camera) -> detection thread -> [encode] -> encoding workers -> [alerts] -> alert sink thread
+#                                                                       \______________________________________\-> [display] -> main thread (imshow)
+# Stages are connected by bounded queues, each with its own drop policy, so a slow stage
+# (e.g. a 5 s buzzer or an SD-card commit) can no longer freeze the camera.
+# With a FaceWorkerPool, HOG detection of several frames runs in parallel worker processes;
+# results are collected in submission order so the tracker still sees frames in order.
+# With MOTION_ROI_ENABLED, HOG only scans the moving regions of each frame (detection/roi.py).
+# Several cameras share the detection stage, the worker pool and the gallery. The detection stage
+# takes frames from the cameras' queues round-robin, so a busy camera cannot starve a quiet one.
+
+import threading
+import time
+from collections import deque, namedtuple
+
+import config # Import the new config file
+from .worker_pool import DETECT
+from .roi import MotionRoiFinder
+from .tracker import FaceTracker
+from .recognition import prepare_frame, locate_faces, encode_faces, scale_box, crop_face, annotate_frame
+
+# Queue drop policies
+DROP_OLDEST = "drop_oldest" # Discard the oldest queued item to make room (live video frames)
+DROP_NEWEST = "drop_newest" # Discard the item being put
+BLOCK = "block"             # Wait for room; never drops (alerts)
+QUEUE_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+# A confirmed match that passed the per-track cooldown and must be acted on
+Alert = namedtuple("Alert", ["name", "criminal_id", "track_id", "face_image", "timestamp", "match", "camera"])
+
+
+class BoundedQueue:
+    """Thread-safe bounded FIFO with a drop policy and depth/drop counters."""
+
+    def __init__(self, name, maxsize, policy):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}' for queue '{name}'. Choose from: {', '.join(QUEUE_POLICIES)}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item, stop_event=None):
+        """
+        Adds an item according to the queue's policy.
+        With BLOCK, waits for room (until stop_event is set, if given).
+        Returns:
+            The item that was dropped to honour the policy (the new item for DROP_NEWEST), or None.
+        """
+        with self._cond:
+            dropped = None
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    dropped = self._items.popleft()
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return item
+                else:
+                    while len(self._items) >= self.maxsize:
+                        if stop_event is not None and stop_event.is_set():
+                            self.dropped += 1
+                            return item
+                        self._cond.wait(0.2)
+            if dropped is not None:
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return dropped
+
+    def get(self, timeout=None):
+        """Removes and returns the oldest item, or None if nothing arrived within `timeout` seconds."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+                if not self._items:
+                    return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def stats(self):
+        with self._cond:
+            return {"depth": len(self._items), "max_depth": self.max_depth,
+                    "put": self.put_count, "dropped": self.dropped}
+
+
+class FrameJob:
+    """A captured frame travelling through the pipeline."""
+
+    __slots__ = ("camera", "seq", "captured_at", "frame", "rgb_small_frame", "face_locations", "tracks", "to_recognize")
+
+    def __init__(self, camera, seq, captured_at, frame):
+        self.camera = camera
+        self.seq = seq
+        self.captured_at = captured_at
+        self.frame = frame
+        self.rgb_small_frame = None
+        self.face_locations = []
+        self.tracks = []
+        self.to_recognize = []
+
+
+class CameraStream:
+    """
+    Per-camera state: frame source, frames queue, tracker (and with it the per-track cooldowns),
+    motion ROI model and frame-rate counters.
+    Args:
+        name (str): Camera name used in window titles, thread names and stats.
+        terminal_id (str): Terminal ID recorded with this camera's alerts.
+        frame_source (LatestFrameGrabber): Started grabber handing out the newest camera frame.
+        tracker (FaceTracker, optional): Face tracker for this camera; a new one by default.
+    """
+
+    def __init__(self, name, terminal_id, frame_source, tracker=None):
+        self.name = name
+        self.terminal_id = terminal_id
+        self.frame_source = frame_source
+        self.tracker = tracker or FaceTracker()
+        self.frames = BoundedQueue(f"frames[{name}]", config.FRAME_QUEUE_SIZE, config.FRAME_QUEUE_POLICY)
+        self.roi_finder = MotionRoiFinder() if config.MOTION_ROI_ENABLED else None
+        self.roi_reset = False # Set when capture resumes; the background model is stale
+        self.seq = 0
+        self.last_displayed_seq = 0
+        self.processed = 0     # Frames that made it through detection
+        self._fps_frames = 0
+        self._fps_since = time.time()
+
+    def fps(self, now=None):
+        """Frames processed per second since the previous call."""
+        now = time.time() if now is None else now
+        processed = self.processed
+        elapsed = now - self._fps_since
+        rate = (processed - self._fps_frames) / elapsed if elapsed > 0 else 0.0
+        self._fps_frames, self._fps_since = processed, now
+        return rate
+
+    def format_stats(self):
+        parts = [f"{self.fps():.1f} fps", f"tracking: {self.tracker.stats()}", f"capture: {self.frame_source.stats()}"]
+        if self.roi_finder is not None:
+            parts.append(f"motion ROIs: {self.roi_finder.stats()}")
+        return f"[{self.name} / {self.terminal_id}] " + ", ".join(parts)
+
+
+class DetectionPipeline:
+    """
+    Runs capture (one thread per camera), detection, encoding and alert handling on their own threads.
+    Args:
+        cameras (list): CameraStream per camera. All share the detection stage, worker pool and gallery.
+        matcher_provider (callable): Returns the current GalleryMatcher (read once per encoded frame).
+        alert_handler (callable): Called with each Alert on the alert sink thread.
+        num_encoders (int): Number of encoding worker threads.
+        worker_pool (FaceWorkerPool, optional): Started pool to run detection/encoding in worker processes.
+    """
+
+    def __init__(self, cameras, matcher_provider, alert_handler, num_encoders=None, worker_pool=None):
+        self.cameras = list(cameras)
+        self.matcher_provider = matcher_provider
+        self.alert_handler = alert_handler
+        self.num_encoders = config.ENCODING_THREADS if num_encoders is None else num_encoders
+        self.worker_pool = worker_pool
+
+        self.encode = BoundedQueue("encode", config.ENCODE_QUEUE_SIZE, config.ENCODE_QUEUE_POLICY)
+        self.display = BoundedQueue("display", config.DISPLAY_QUEUE_SIZE * len(self.cameras), config.DISPLAY_QUEUE_POLICY)
+        self.alerts = BoundedQueue("alerts", config.ALERT_QUEUE_SIZE, config.ALERT_QUEUE_POLICY)
+        self.queues = tuple(camera.frames for camera in self.cameras) + (self.encode, self.display, self.alerts)
+        if worker_pool is not None:
+            # Frames whose detection is running in a worker, in submission order
+            self.in_flight = BoundedQueue("in_flight", worker_pool.num_slots, BLOCK)
+            self.queues += (self.in_flight,)
+
+        self._active = threading.Event()
+        self._stop_event = threading.Event()
+        self._match_lock = threading.Lock() # Guards track match state and per-track cooldowns
+        self._frames_ready = threading.Condition() # Notified whenever any camera queues a frame
+        self._next_camera = 0                      # Round-robin position of the detection scheduler
+        self._threads = []
+
+    # --- Control ---
+    def start(self):
+        workers = [(f"capture-{camera.name}", lambda camera=camera: self._capture_loop(camera))
+                   for camera in self.cameras]
+        workers += [("detect", self._detect_loop), ("alerts", self._alert_loop)]
+        if self.worker_pool is not None:
+            workers.append(("detect-submit", self._detect_submit_loop))
+        workers += [(f"encode-{i}", self._encode_loop) for i in range(self.num_encoders)]
+        for name, target in workers:
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"PIPELINE: Started with {len(self.cameras)} camera(s) and {self.num_encoders} encoding worker(s).")
+
+    def set_active(self, active):
+        """Capture only runs while a detection window is active."""
+        for camera in self.cameras:
+            camera.frame_source.set_active(active) # Activating flushes the stale driver buffer
+        if active:
+            if not self._active.is_set():
+                for camera in self.cameras:
+                    camera.roi_reset = True
+            self._active.set()
+        else:
+            self._active.clear()
+
+    def stop(self):
+        """Stops all stages. Alerts already queued are still handled before the sink exits."""
+        self.set_active(False)
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=config.PIPELINE_STOP_TIMEOUT)
+        self._threads = []
+        print(f"PIPELINE: Stopped. {self.format_stats()}")
+
+    def get_display_frame(self, timeout=None):
+        """Returns the next annotated frame for display, skipping any older than one already shown for its camera."""
+        job = self.display.get(timeout)
+        while job is not None and job.seq <= job.camera.last_displayed_seq:
+            job = self.display.get(0)
+        if job is not None:
+            job.camera.last_displayed_seq = job.seq
+        return job
+
+    def stats(self):
+        """Queue-depth counters per queue: depth, max_depth, put, dropped."""
+        return {q.name: q.stats() for q in self.queues}
+
+    def format_stats(self):
+        return " | ".join(f"{name}: {s['depth']}/{q.maxsize} (max {s['max_depth']}, put {s['put']}, dropped {s['dropped']})"
+                          for q, (name, s) in zip(self.queues, self.stats().items()))
+
+    def format_camera_stats(self):
+        """One line per camera: frame rate since the last report, tracking, capture and ROI counters."""
+        return "\n".join(camera.format_stats() for camera in self.cameras)
+
+    # --- Stages ---
+    def _capture_loop(self, camera):
+        while not self._stop_event.is_set():
+            if not self._active.wait(0.2):
+                continue
+            item = camera.frame_source.read_latest(timeout=0.2)
+            if item is None:
+                continue
+            _, captured_at, frame = item
+            camera.seq += 1
+            camera.frames.put(FrameJob(camera, camera.seq, captured_at, frame), self._stop_event)
+            with self._frames_ready:
+                self._frames_ready.notify()
+
+    def _next_frame(self, timeout):
+        """
+        Takes the next frame to detect on, visiting the cameras round-robin so each camera with a
+        frame waiting gets one frame per round. Returns None if no camera had a frame within `timeout`.
+        """
+        with self._frames_ready:
+            for attempt in range(2):
+                for _ in range(len(self.cameras)):
+                    camera = self.cameras[self._next_camera]
+                    self._next_camera = (self._next_camera + 1) % len(self.cameras)
+                    job = camera.frames.get(timeout=0)
+                    if job is not None:
+                        return job
+                if attempt == 0:
+                    self._frames_ready.wait(timeout)
+        return None
+
+    def _prepare_job(self, job):
+        """Downscales the frame and picks the regions to scan. Returns the ROIs (None = whole frame)."""
+        job.camera.frame_source.mark_processed(job.captured_at)
+        job.rgb_small_frame = prepare_frame(job.frame)
+        return self._find_rois(job.camera, job.rgb_small_frame)
+
+    def _detect_submit_loop(self):
+        # Only used with a worker pool: hands frames to the workers without waiting for results
+        while not self._stop_event.is_set():
+            job = self._next_frame(timeout=0.2)
+            if job is None:
+                continue
+            try:
+                rois = self._prepare_job(job)
+                ticket = None
+                if rois != []: # Nothing moving and nothing tracked: no detection needed
+                    # Bounded wait: if the workers stall, drop this frame and check for stop again
+                    ticket = self.worker_pool.submit(DETECT, job.rgb_small_frame, rois,
+                                                     timeout=config.FACE_WORKER_TIMEOUT)
+                    if ticket is None:
+                        print("PIPELINE: No face worker slot became free in time; dropping frame.")
+                        continue
+            except Exception as e:
+                print(f"PIPELINE: Error submitting frame to worker pool: {e}")
+                continue
+            self.in_flight.put((job, ticket), self._stop_event)
+
+    def _next_detected_job(self):
+        """Returns the next frame with face_locations filled in (in submission order), or None."""
+        if self.worker_pool is None:
+            job = self._next_frame(timeout=0.2)
+            if job is not None:
+                rois = self._prepare_job(job)
+                job.face_locations = locate_faces(job.rgb_small_frame, rois)
+            return job
+        item = self.in_flight.get(timeout=0.2)
+        if item is None:
+            return None
+        job, ticket = item
+        if ticket is not None:
+            job.face_locations = self.worker_pool.result(ticket, timeout=config.FACE_WORKER_TIMEOUT)
+        return job
+
+    def _detect_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                job = self._next_detected_job()
+                if job is None:
+                    continue
+                now = time.time()
+                tracker = job.camera.tracker
+                with self._match_lock:
+                    job.tracks = tracker.update(job.face_locations, now)
+                    job.to_recognize = [i for i, track in enumerate(job.tracks)
+                                        if tracker.needs_recognition(track, now)]
+                    for i in job.to_recognize:
+                        job.tracks[i].pending = True
+                job.camera.processed += 1
+            except Exception as e:
+                print(f"PIPELINE: Error in detection stage: {e}")
+                continue
+
+            if job.to_recognize:
+                dropped = self.encode.put(job, self._stop_event)
+                if dropped is not None:
+                    self._release_pending(dropped)
+            else:
+                self._publish(job)
+
+    def _encode_loop(self):
+        while not self._stop_event.is_set():
+            job = self.encode.get(timeout=0.2)
+            if job is None:
+                continue
+            try:
+                locations = [job.face_locations[i] for i in job.to_recognize]
+                if self.worker_pool is not None:
+                    face_encodings = self.worker_pool.encode(job.rgb_small_frame, locations)
+                else:
+                    face_encodings = encode_faces(job.rgb_small_frame, locations)
+                matches = self.matcher_provider().match(face_encodings)
+                now = time.time()
+                alerts = []
+                with self._match_lock:
+                    for i, match in zip(job.to_recognize, matches):
+                        track = job.tracks[i]
+                        track.pending = False
+                        job.camera.tracker.mark_recognized(track, match, now)
+                        if match.is_match and self._cooldown_passed(job.camera, track, match, now):
+                            alerts.append((i, track, match))
+                # Queued outside the lock: a full (blocking) alert queue must not stall detection
+                for i, track, match in alerts:
+                    face_image = crop_face(job.frame, scale_box(job.face_locations[i]))
+                    self.alerts.put(Alert(match.name, match.criminal_id, track.id, face_image, now, match, job.camera),
+                                    self._stop_event)
+            except Exception as e:
+                print(f"PIPELINE: Error in encoding stage: {e}")
+                self._release_pending(job)
+            self._publish(job)
+
+    def _alert_loop(self):
+        # Keep draining after stop so that no confirmed alert is lost
+        while not self._stop_event.is_set() or len(self.alerts):
+            alert = self.alerts.get(timeout=0.2)
+            if alert is None:
+                continue
+            try:
+                self.alert_handler(alert)
+            except Exception as e:
+                print(f"PIPELINE: Error handling alert for {alert.name}: {e}")
+
+    # --- Helpers ---
+    def _find_rois(self, camera, rgb_small_frame):
+        """Motion ROIs for a camera's frame (called in capture order), or None to scan the whole frame."""
+        if camera.roi_finder is None:
+            return None
+        if camera.roi_reset:
+            camera.roi_reset = False
+            camera.roi_finder.reset()
+        with self._match_lock:
+            tracked_boxes = [track.box for track in camera.tracker.tracks.values()]
+        return camera.roi_finder.find(rgb_small_frame, tracked_boxes)
+
+    def _cooldown_passed(self, camera, track, match, now):
+        # Keyed by criminal ID: two criminals sharing a name each get their own cooldown
+        last_match_time = track.last_match_time
+        key, name = match.criminal_id, match.name
+        if key not in last_match_time or (now - last_match_time[key]) >= config.COOLDOWN_PERIOD:
+            print(f"MATCH FOUND: {name} (ID {key}) on {camera.name} track {track.id}")
+            last_match_time[key] = now
+            return True
+        print(f"Matched {name} again on {camera.name} track {track.id} within cooldown period. Displaying, but not re-triggering actions.")
+        return False
+
+    def _release_pending(self, job):
+        with self._match_lock:
+            for i in job.to_recognize:
+                job.tracks[i].pending = False
+
+    def _publish(self, job):
+        annotate_frame(job.frame, job.face_locations, job.tracks)
+        self.display.put(job)
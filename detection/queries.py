@@ -0,0 +1,112 @@
+# detection/queries.py
+
+# SQL for the hot queries: the dashboard's alerts log and criminals list, the enrolment queue and
+# criminal lookups by name. The code that runs these statements and `database_setup.py --check-plans`
+# both build them from here, so the plan check always tests the SQL that actually runs.
+# Builders return (sql, params) and never touch a connection.
+
+# --- Alerts log ---
+ALERT_COLUMNS = """a.id, a.timestamp, a.detected_face_photo_path, a.terminal_id, a.criminal_id,
+               c.name as criminal_name, c.photo_path as criminal_photo_path"""
+
+
+ALERTS_FROM = "FROM alerts a JOIN criminals c ON a.criminal_id = c.id"
+
+
+def alert_filter_clauses(filters):
+    """SQL conditions and parameters for the alerts log filters: terminal, criminal, date_from/date_to."""
+    clauses, params = [], []
+    if 'terminal' in filters:
+        clauses.append("a.terminal_id = ?")
+        params.append(filters['terminal'])
+    if 'criminal' in filters:
+        clauses.append("a.criminal_id = ?")
+        params.append(filters['criminal'])
+    if 'date_from' in filters:
+        clauses.append("a.timestamp >= ?")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        clauses.append("a.timestamp < date(?, '+1 day')") # Inclusive end date
+        params.append(filters['date_to'])
+    return clauses, params
+
+
+def alerts_page_query(filters, before=None, after=None, limit=None):
+    """
+    One page of alerts by (timestamp, id): newest first, or oldest first when walking `after` a cursor.
+    Args:
+        filters (dict): Alerts log filters (see alert_filter_clauses).
+        before (tuple, optional): (timestamp, id) cursor; only alerts older than it.
+        after (tuple, optional): (timestamp, id) cursor; only alerts newer than it.
+        limit (int): Rows to return.
+    Returns:
+        tuple: (sql, params)
+    """
+    clauses, params = alert_filter_clauses(filters)
+    order = "DESC"
+    if before:
+        clauses.append("(a.timestamp, a.id) < (?, ?)")
+        params.extend(before)
+    elif after:
+        clauses.append("(a.timestamp, a.id) > (?, ?)")
+        params.extend(after)
+        order = "ASC"
+    sql = f"""
+        SELECT {ALERT_COLUMNS}
+        {alerts_from_where(clauses)}
+        ORDER BY a.timestamp {order}, a.id {order}
+        LIMIT ?
+    """
+    return sql, params + [limit]
+
+
+def alerts_count_query(filters, limit):
+    """
+    Counts alerts matching the filters, stopping after `limit` rows. Uses the same FROM/WHERE as
+    alerts_page_query(), so the total always agrees with the rows the pages show.
+    Returns:
+        tuple: (sql, params)
+    """
+    clauses, params = alert_filter_clauses(filters)
+    return f"SELECT count(*) AS n FROM (SELECT 1 {alerts_from_where(clauses)} LIMIT ?)", params + [limit]
+
+
+def alerts_from_where(clauses):
+    """The FROM/JOIN/WHERE fragment shared by the alerts page and count queries."""
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"{ALERTS_FROM} {where}"
+
+
+# --- Criminals list ---
+CRIMINAL_COLUMNS = "c.id, c.name, c.description, c.photo_path, c.status"
+CRIMINAL_BY_NAME = "SELECT id FROM criminals WHERE name = ?"
+
+
+def criminals_page_query(after=None, before=None, limit=None):
+    """
+    One page of criminals by (name, id): ascending, or descending when walking `before` a cursor.
+    Returns:
+        tuple: (sql, params)
+    """
+    where, params, order = "", [], "ASC"
+    if after:
+        where, params = "WHERE (c.name, c.id) > (?, ?)", list(after)
+    elif before:
+        where, params, order = "WHERE (c.name, c.id) < (?, ?)", list(before), "DESC"
+    sql = f"""
+        SELECT {CRIMINAL_COLUMNS}
+        FROM criminals c
+        {where}
+        ORDER BY c.name {order}, c.id {order}
+        LIMIT ?
+    """
+    return sql, params + [limit]
+
+
+# --- Enrolment queue ---
+NEXT_ENROLMENT_JOB = ("SELECT id, criminal_id, photo_path, attempts FROM enrolment_jobs "
+                      "WHERE status = ? ORDER BY id LIMIT 1")
+LATEST_ENROLMENT_JOB = """
+        SELECT id, status, error, attempts, created_at, updated_at FROM enrolment_jobs
+        WHERE criminal_id = ? ORDER BY id DESC LIMIT 1
+    """
@@ -0,0 +1,70 @@
+# detection/recognition.py
+
+# Per-frame face processing steps shared by the detection pipeline stages.
+
+import cv2
+import face_recognition
+
+import config # Import the new config file
+from .roi import locate_faces_in_rois
+from .face_detectors import create_detector
+
+_detector = None # Created on first use from FACE_DETECTOR_BACKEND
+
+
+def get_detector():
+    global _detector
+    if _detector is None:
+        _detector = create_detector()
+        print(f"RECOGNITION: Using '{_detector.name}' face detector.")
+    return _detector
+
+
+def prepare_frame(frame):
+    """Downscales a BGR frame by DETECTOR_SCALE_FACTOR and converts it to RGB for dlib."""
+    scale_factor = config.DETECTOR_SCALE_FACTOR
+    small_frame = cv2.resize(frame, (0, 0), fx=scale_factor, fy=scale_factor)
+    return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+
+def locate_faces(rgb_small_frame, rois=None):
+    """
+    Runs the configured face detector on a prepared frame, or only inside `rois` (see detection/roi.py).
+    Returns small-frame (top, right, bottom, left) boxes.
+    """
+    detector = get_detector()
+    if rois is None:
+        return detector.detect(rgb_small_frame)
+    return locate_faces_in_rois(rgb_small_frame, rois, detector.detect)
+
+
+def encode_faces(rgb_small_frame, face_locations):
+    """Computes 128-d encodings for the given small-frame face locations."""
+    if not face_locations:
+        return []
+    return face_recognition.face_encodings(rgb_small_frame, face_locations)
+
+
+def scale_box(box):
+    """Maps a (top, right, bottom, left) small-frame box back to full-frame coordinates."""
+    scale_factor = config.DETECTOR_SCALE_FACTOR
+    return tuple(int(v / scale_factor) for v in box)
+
+
+def crop_face(frame, box):
+    """Crops a full-frame (top, right, bottom, left) box out of the frame (copy, may be empty)."""
+    top, right, bottom, left = box
+    h, w = frame.shape[:2]
+    return frame[max(0, top):min(h, bottom), max(0, left):min(w, right)].copy()
+
+
+def annotate_frame(frame, face_locations, tracks):
+    """Draws a labelled box for every tracked face. Returns the frame (modified in place)."""
+    for box_s, track in zip(face_locations, tracks):
+        top, right, bottom, left = scale_box(box_s)
+        name = track.match.name if track.match else "Unknown"
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
+        cv2.rectangle(frame, (left, bottom - 25), (right, bottom), (0, 0, 255), cv2.FILLED)
+        font = cv2.FONT_HERSHEY_DUPLEX
+        cv2.putText(frame, name, (left + 6, bottom - 6), font, 0.8, (255, 255, 255), 1)
+    return frame
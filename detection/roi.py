@@ -0,0 +1,152 @@
+# detection/roi.py
+
+# Motion regions of interest for face detection. At a bodaboda stage the rider usually fills a
+# small moving part of the picture, and dlib's HOG detector costs roughly in proportion to the
+# pixels it scans. MotionRoiFinder finds the moving regions (MOG2 background subtraction or plain
+# frame differencing), merges them into padded boxes, and the detector only scans those crops.
+# Faces tracked in the previous frame are always included, so a rider who stops moving is not lost,
+# and the whole frame is still scanned every MOTION_ROI_FULL_SCAN_INTERVAL frames.
+
+import cv2
+import numpy as np
+
+import config # Import the new config file
+
+MOG2 = "mog2"
+FRAME_DIFF = "diff"
+ROI_METHODS = (MOG2, FRAME_DIFF)
+
+
+def pad_box(box, padding, width, height, min_size=0):
+    """Grows a (top, right, bottom, left) box by `padding` pixels (and up to `min_size` per side), clipped to the frame."""
+    top, right, bottom, left = box
+    grow_y = max(padding, (min_size - (bottom - top)) // 2)
+    grow_x = max(padding, (min_size - (right - left)) // 2)
+    return (max(0, top - grow_y), min(width, right + grow_x), min(height, bottom + grow_y), max(0, left - grow_x))
+
+
+def merge_boxes(boxes):
+    """Merges overlapping or touching (top, right, bottom, left) boxes until none overlap."""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            for i, other in enumerate(result):
+                if box[0] <= other[2] and other[0] <= box[2] and box[3] <= other[1] and other[3] <= box[1]:
+                    result[i] = (min(box[0], other[0]), max(box[1], other[1]), max(box[2], other[2]), min(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return boxes
+
+
+def locate_faces_in_rois(rgb_frame, rois, locate):
+    """
+    Runs a face detector on each ROI crop and maps the boxes back to frame coordinates.
+    Args:
+        rgb_frame (numpy.ndarray): Frame the ROIs refer to.
+        rois (list): (top, right, bottom, left) regions (non-overlapping, see merge_boxes).
+        locate (callable): Detector taking an RGB image and returning (top, right, bottom, left) boxes.
+    Returns:
+        list: Face boxes in rgb_frame coordinates.
+    """
+    face_locations = []
+    for top, right, bottom, left in rois:
+        crop = np.ascontiguousarray(rgb_frame[top:bottom, left:right]) # dlib needs contiguous memory
+        for f_top, f_right, f_bottom, f_left in locate(crop):
+            face_locations.append((f_top + top, f_right + left, f_bottom + top, f_left + left))
+    return face_locations
+
+
+class MotionRoiFinder:
+    """
+    Finds padded motion ROIs in consecutive prepared (downscaled RGB) frames.
+    Frames must be fed in capture order; find() returns None when the whole frame should be scanned.
+    """
+
+    def __init__(self, method=None, min_area=None, padding=None, min_size=None, max_coverage=None,
+                 full_scan_interval=None):
+        self.method = config.MOTION_ROI_METHOD if method is None else method
+        if self.method not in ROI_METHODS:
+            raise ValueError(f"Unknown motion ROI method '{self.method}'. Choose from: {', '.join(ROI_METHODS)}")
+        self.min_area = config.MOTION_ROI_MIN_AREA if min_area is None else min_area
+        self.padding = config.MOTION_ROI_PADDING if padding is None else padding
+        self.min_size = config.MOTION_ROI_MIN_SIZE if min_size is None else min_size
+        self.max_coverage = config.MOTION_ROI_MAX_COVERAGE if max_coverage is None else max_coverage
+        self.full_scan_interval = config.MOTION_ROI_FULL_SCAN_INTERVAL if full_scan_interval is None else full_scan_interval
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        self.reset()
+        # Counters
+        self.frames = 0
+        self.full_scans = 0
+        self.scanned_fraction_total = 0.0
+
+    def reset(self):
+        """Forgets the background (call when capture resumes after an idle period)."""
+        self._subtractor = None
+        self._previous_gray = None
+        self._frames_since_full_scan = 0
+
+    def _motion_mask(self, rgb_frame):
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        if self.method == MOG2:
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                    history=config.MOTION_ROI_HISTORY, varThreshold=config.MOTION_ROI_THRESHOLD, detectShadows=False)
+                self._subtractor.apply(gray)
+                return None
+            mask = self._subtractor.apply(gray)
+        else:
+            gray = cv2.GaussianBlur(gray, (5, 5), 0)
+            previous, self._previous_gray = self._previous_gray, gray
+            if previous is None:
+                return None
+            _, mask = cv2.threshold(cv2.absdiff(previous, gray), config.MOTION_ROI_THRESHOLD, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel) # Drop sensor noise
+        return cv2.dilate(mask, self._kernel, iterations=2)         # Join the pieces of one moving body
+
+    def find(self, rgb_frame, tracked_boxes=()):
+        """
+        Args:
+            rgb_frame (numpy.ndarray): Prepared frame (same size every call).
+            tracked_boxes (iterable): Face boxes tracked in the previous frame, always included.
+        Returns:
+            list or None: Merged (top, right, bottom, left) ROIs, or None to scan the whole frame.
+        """
+        height, width = rgb_frame.shape[:2]
+        self.frames += 1
+        mask = self._motion_mask(rgb_frame)
+        self._frames_since_full_scan += 1
+        if mask is None or self._frames_since_full_scan >= self.full_scan_interval:
+            return self._full_scan()
+
+        boxes = []
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            if cv2.contourArea(contour) < self.min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append(pad_box((y, x + w, y + h, x), self.padding, width, height, self.min_size))
+        for box in tracked_boxes:
+            boxes.append(pad_box(box, self.padding, width, height, self.min_size))
+        rois = merge_boxes(boxes)
+
+        scanned = sum((bottom - top) * (right - left) for top, right, bottom, left in rois) / float(width * height)
+        if scanned > self.max_coverage:
+            return self._full_scan() # Cropping no longer pays off
+        self.scanned_fraction_total += scanned
+        return rois
+
+    def _full_scan(self):
+        self._frames_since_full_scan = 0
+        self.full_scans += 1
+        self.scanned_fraction_total += 1.0
+        return None
+
+    def stats(self):
+        avg = self.scanned_fraction_total / self.frames if self.frames else 0.0
+        return f"{self.frames} frames, {self.full_scans} full scans, avg {avg:.0%} of frame scanned"
@@ -0,0 +1,173 @@
+# detection/thumbnails.py
+
+# Small JPEG thumbnails of criminal photos and detected-face crops, so list pages (alerts log,
+# criminals list) send a few KiB per image instead of the full-size original.
+# Thumbnails live next to their originals: <image dir>/thumbs/<size>/<image name>.jpg. They are
+# written when a criminal is enrolled or an alert is saved; any missing or outdated thumbnail
+# (e.g. for images from before this existed) is generated on first request by get_thumbnail().
+#
+# Usage (from the project root):
+#   python -m detection.thumbnails      # generate missing thumbnails for all existing images
+
+import argparse
+import os
+import time
+
+import cv2
+
+import config # Import the new config file
+from .db_utils import PARENT_DIR
+
+THUMBNAILS_DIRNAME = "thumbs"
+JPEG_EXTENSIONS = (".jpg", ".jpeg")
+
+
+def thumbnail_path(image_path, size):
+    """Where the `size` px thumbnail of `image_path` is stored."""
+    directory, name = os.path.split(image_path)
+    if not name.lower().endswith(JPEG_EXTENSIONS):
+        name += ".jpg" # Keeps the original extension so photo.png and photo.jpg don't collide
+    return os.path.join(directory, THUMBNAILS_DIRNAME, str(size), name)
+
+
+def render_thumbnail(image, size):
+    """
+    Shrinks an image to fit in a size x size box (keeping its aspect ratio; never enlarged).
+    Args:
+        image (numpy.ndarray): BGR image as read by cv2.
+        size (int): Longest side of the thumbnail in pixels.
+    Returns:
+        bytes: JPEG data, or None if encoding failed.
+    """
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, config.THUMBNAIL_JPEG_QUALITY])
+    return data.tobytes() if ok else None
+
+
+def _write_atomic(path, data):
+    # The dashboard may generate the same thumbnail from two requests at once; readers must never see half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}.{time.monotonic_ns()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_thumbnails(image_path, image=None, sizes=None):
+    """
+    Writes thumbnails of an image at every configured size.
+    Args:
+        image_path (str): The original image file.
+        image (numpy.ndarray, optional): The image already in memory (BGR), to avoid reading it back.
+        sizes (iterable of int, optional): Defaults to config.THUMBNAIL_SIZES.
+    Returns:
+        list: Paths of the thumbnails written (empty if the image could not be read).
+    """
+    if image is None:
+        image = cv2.imread(image_path) # Applies EXIF orientation, so phone photos come out upright
+    if image is None or image.size == 0:
+        print(f"THUMBNAILS: Could not read {image_path}")
+        return []
+    written = []
+    for size in config.THUMBNAIL_SIZES if sizes is None else sizes:
+        data = render_thumbnail(image, size)
+        if data is None:
+            print(f"THUMBNAILS: Could not encode {size}px thumbnail of {image_path}")
+            continue
+        path = thumbnail_path(image_path, size)
+        _write_atomic(path, data)
+        written.append(path)
+    return written
+
+
+def get_thumbnail(image_path, size):
+    """
+    Returns an up-to-date thumbnail, generating it first if it is missing or older than the original.
+    Args:
+        image_path (str): The original image file.
+        size (int): One of config.THUMBNAIL_SIZES.
+    Returns:
+        str: Path of the thumbnail, or None if the original is missing or unreadable.
+    Raises:
+        ValueError: If `size` is not a configured thumbnail size.
+    """
+    if size not in config.THUMBNAIL_SIZES:
+        raise ValueError(f"{size} is not a configured thumbnail size {tuple(config.THUMBNAIL_SIZES)}")
+    try:
+        image_mtime = os.stat(image_path).st_mtime
+    except OSError:
+        return None
+    path = thumbnail_path(image_path, size)
+    try:
+        if os.stat(path).st_mtime >= image_mtime:
+            return path
+    except OSError:
+        pass
+    # Generate every size at once: a page that needs one size usually needs the others soon
+    written = write_thumbnails(image_path)
+    return path if path in written else None
+
+
+def remove_thumbnails(image_path):
+    """Deletes every thumbnail of an image (call when the original is deleted or replaced)."""
+    thumbs_dir = os.path.join(os.path.dirname(image_path), THUMBNAILS_DIRNAME)
+    if not os.path.isdir(thumbs_dir):
+        return
+    for size_dir in os.listdir(thumbs_dir):
+        path = thumbnail_path(image_path, size_dir)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def image_dirs():
+    """The directories whose images get thumbnails: criminal photos and detected faces."""
+    return [os.path.join(PARENT_DIR, "static", config.UPLOAD_FOLDER_NAME),
+            os.path.join(PARENT_DIR, "data", config.DETECTED_FACES_SUBDIR)]
+
+
+def backfill(directories=None, force=False):
+    """
+    Generates thumbnails for existing images that don't have up-to-date ones yet.
+    Returns:
+        tuple: (images processed, images skipped because they were already done or unreadable).
+    """
+    done = skipped = 0
+    extensions = tuple(f".{ext}" for ext in config.ALLOWED_IMAGE_EXTENSIONS)
+    for directory in image_dirs() if directories is None else directories:
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            image_path = os.path.join(directory, name)
+            if not name.lower().endswith(extensions) or not os.path.isfile(image_path):
+                continue
+            image_mtime = os.stat(image_path).st_mtime
+            current = all(os.path.exists(thumbnail_path(image_path, size))
+                          and os.stat(thumbnail_path(image_path, size)).st_mtime >= image_mtime
+                          for size in config.THUMBNAIL_SIZES)
+            if (current and not force) or not write_thumbnails(image_path):
+                skipped += 1
+            else:
+                done += 1
+    return done, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate thumbnails for existing criminal photos and detected faces.")
+    parser.add_argument("--force", action="store_true", help="Regenerate thumbnails that are already up to date.")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    done, skipped = backfill(force=args.force)
+    print(f"THUMBNAILS: Generated thumbnails for {done} image(s), skipped {skipped}, "
+          f"in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
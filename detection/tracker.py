@@ -0,0 +1,129 @@
+# detection/tracker.py
+
+import itertools
+
+import config # Import the new config file
+
+
+def box_iou(a, b):
+    """Intersection-over-union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def box_centroid(box):
+    return ((box[3] + box[1]) / 2.0, (box[0] + box[2]) / 2.0)
+
+
+class Track:
+    """A face followed across frames."""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.last_recognized = None # Time of the last encoding + match for this track
+        self.match = None           # Latest MatchResult for this track
+        self.pending = False        # True while an encoding for this track is queued or running
+        self.last_match_time = {}   # Criminal ID -> time of the last alert raised from this track
+
+    def needs_recognition(self, now, refresh_interval):
+        if self.pending:
+            return False
+        return self.last_recognized is None or (now - self.last_recognized) >= refresh_interval
+
+
+class FaceTracker:
+    """
+    Lightweight multi-object tracker for the boxes returned by face_recognition.face_locations.
+    Detections are associated with existing tracks greedily by IoU; detections left over are then
+    associated by centroid distance (for fast movers whose boxes no longer overlap). Unmatched
+    detections start new tracks and tracks not seen for `timeout` seconds are dropped.
+    """
+
+    def __init__(self, iou_threshold=None, max_centroid_shift=None, timeout=None, refresh_interval=None):
+        self.iou_threshold = config.TRACK_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.max_centroid_shift = config.TRACK_MAX_CENTROID_SHIFT if max_centroid_shift is None else max_centroid_shift
+        self.timeout = config.TRACK_TIMEOUT if timeout is None else timeout
+        self.refresh_interval = config.TRACK_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        # Counters to show how much encoding work tracking saves
+        self.faces_seen = 0
+        self.faces_encoded = 0
+
+    def update(self, face_locations, now):
+        """
+        Associates this frame's face boxes with tracks.
+        Args:
+            face_locations (list): (top, right, bottom, left) boxes for one frame.
+            now (float): Frame timestamp.
+        Returns:
+            list: One Track per box, in the same order as face_locations.
+        """
+        for track_id in [tid for tid, t in self.tracks.items() if now - t.last_seen > self.timeout]:
+            del self.tracks[track_id]
+
+        assigned = [None] * len(face_locations)
+        free_tracks = set(self.tracks)
+
+        pairs = []
+        for det_idx, box in enumerate(face_locations):
+            for track_id in free_tracks:
+                iou = box_iou(box, self.tracks[track_id].box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, det_idx, track_id))
+        for _, det_idx, track_id in sorted(pairs, reverse=True):
+            if assigned[det_idx] is None and track_id in free_tracks:
+                assigned[det_idx] = track_id
+                free_tracks.discard(track_id)
+
+        pairs = []
+        for det_idx, box in enumerate(face_locations):
+            if assigned[det_idx] is not None:
+                continue
+            cx, cy = box_centroid(box)
+            max_shift = self.max_centroid_shift * (box[1] - box[3])
+            for track_id in free_tracks:
+                tx, ty = box_centroid(self.tracks[track_id].box)
+                shift = ((cx - tx) ** 2 + (cy - ty) ** 2) ** 0.5
+                if shift <= max_shift:
+                    pairs.append((shift, det_idx, track_id))
+        for _, det_idx, track_id in sorted(pairs):
+            if assigned[det_idx] is None and track_id in free_tracks:
+                assigned[det_idx] = track_id
+                free_tracks.discard(track_id)
+
+        frame_tracks = []
+        for det_idx, box in enumerate(face_locations):
+            track_id = assigned[det_idx]
+            if track_id is None:
+                track = Track(next(self._ids), box, now)
+                self.tracks[track.id] = track
+            else:
+                track = self.tracks[track_id]
+                track.box = box
+                track.last_seen = now
+            frame_tracks.append(track)
+        self.faces_seen += len(frame_tracks)
+        return frame_tracks
+
+    def needs_recognition(self, track, now):
+        """True if the track is new or its last recognition is older than the refresh interval."""
+        return track.needs_recognition(now, self.refresh_interval)
+
+    def mark_recognized(self, track, match, now):
+        track.match = match
+        track.last_recognized = now
+        self.faces_encoded += 1
+
+    def stats(self):
+        saved = self.faces_seen - self.faces_encoded
+        return f"{self.faces_seen} faces seen, {self.faces_encoded} encoded, {saved} encodings skipped by tracking"
@@ -0,0 +1,325 @@
+# detection/worker_pool.py
+
+# Multiprocess face detection/encoding. dlib's HOG detector and encoder are CPU bound and hold the
+# GIL, so threads alone leave the other Pi cores idle. Frames are handed to the worker processes
+# through a ring of multiprocessing.shared_memory slots (one memcpy, no pickling of pixel data);
+# only the job header and the small results (boxes, 128-d encodings) go through pipes.
+# Each worker has its own task and result pipe, so a worker that dies (OOM kill, dlib abort) can't
+# leave a shared queue lock held; the pool notices through the process sentinel, fails the jobs
+# that worker held, frees their slots and starts a replacement.
+
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+import config # Import the new config file
+
+DETECT = "detect"
+ENCODE = "encode"
+
+
+def _attach_shared_memory(name):
+    """Attaches to an existing block without letting this process's resource tracker unlink it at exit."""
+    from multiprocessing import shared_memory
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+def _worker_main(task_conn, result_conn):
+    """Worker process loop: reads a frame from shared memory and runs detection or encoding on it."""
+    import face_recognition # Imported here so the parent can start workers before loading dlib itself
+    from .roi import locate_faces_in_rois
+    from .face_detectors import create_detector
+
+    detect = create_detector().detect # Each process loads its own detector (FACE_DETECTOR_BACKEND)
+
+    attached = {} # slot index -> attached block (replaced when the pool regrows its slots)
+    try:
+        while True:
+            try:
+                task = task_conn.recv()
+            except EOFError:
+                break # Pool went away
+            if task is None:
+                break
+            job_id, kind, slot_index, slot_name, shape, locations = task
+            try:
+                shm = attached.get(slot_index)
+                if shm is None or shm.name != slot_name:
+                    if shm is not None:
+                        shm.close()
+                    shm = attached[slot_index] = _attach_shared_memory(slot_name)
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                if kind == DETECT:
+                    # For DETECT, `locations` optionally holds motion ROIs to scan instead of the whole frame
+                    payload = detect(frame) if locations is None else locate_faces_in_rois(frame, locations, detect)
+                else:
+                    payload = face_recognition.face_encodings(frame, locations) if locations else []
+                result = (job_id, payload, None)
+            except Exception as e:
+                result = (job_id, None, f"{type(e).__name__}: {e}")
+            result_conn.send(result)
+    finally:
+        for shm in attached.values():
+            shm.close()
+
+
+class _Worker:
+    """One worker process, the parent's ends of its pipes and the IDs of the jobs sent to it."""
+
+    def __init__(self, process, task_conn, result_conn):
+        self.process = process
+        self.task_conn = task_conn
+        self.result_conn = result_conn
+        self.jobs = set()
+
+
+class FaceWorkerPool:
+    """
+    Pool of worker processes running face_locations / face_encodings on shared-memory frames.
+
+    submit() copies a frame into a free slot and returns a job ID immediately; result() waits for
+    that job. Callers that submit frames in order and collect results in the same order get them
+    back in frame order regardless of which worker finished first. Each job goes to the worker
+    with the fewest jobs outstanding.
+    Slots are sized from the first frame submitted and regrown (once every in-flight job has
+    handed its slot back) when a larger frame arrives, e.g. from a higher-resolution camera.
+    """
+
+    def __init__(self, num_workers=None, num_slots=None):
+        self.num_workers = config.FACE_WORKER_PROCESSES if num_workers is None else num_workers
+        self.num_slots = num_slots or self.num_workers * 2
+        self._ctx = multiprocessing.get_context()
+        self._workers = []
+        self._dispatch_lock = threading.Lock() # Guards _workers and each worker's task pipe and job set
+        self._slots = []
+        self._slot_bytes = 0
+        self._free_slots = queue.Queue()
+        self._job_ids = itertools.count(1)
+        self._job_slots = {}
+        self._results = {}
+        self._abandoned = set() # Jobs whose result() timed out; their late results are dropped
+        self._results_cond = threading.Condition()
+        self._slot_lock = threading.Lock()
+        self._reader = None
+        self._running = False
+
+    # --- Lifecycle ---
+    def start(self):
+        self._workers = [self._spawn(i) for i in range(self.num_workers)]
+        self._running = True
+        self._reader = threading.Thread(target=self._read_results, name="face-worker-results", daemon=True)
+        self._reader.start()
+        print(f"WORKER_POOL: Started {self.num_workers} face worker process(es).")
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._reader.join(timeout=2) # Notices _running within a second
+        with self._dispatch_lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                worker.task_conn.send(None)
+            except OSError:
+                pass # Already dead
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.task_conn.close()
+            worker.result_conn.close()
+        with self._results_cond:
+            self._results_cond.notify_all()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        self._slots = []
+        print("WORKER_POOL: Stopped.")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Jobs ---
+    def submit(self, kind, rgb_frame, locations=None, timeout=None):
+        """
+        Queues a DETECT or ENCODE job for an RGB uint8 frame.
+        `locations` are the faces to encode (ENCODE) or the ROIs to scan (DETECT, None = whole frame).
+        Blocks while all shared-memory slots are in use (at most `timeout` seconds).
+        Returns:
+            int: Job ID to pass to result(), or None if no slot became free in time.
+        Raises:
+            RuntimeError: If the pool is not running.
+        """
+        if not self._running:
+            raise RuntimeError("Face worker pool is not running.")
+        rgb_frame = np.ascontiguousarray(rgb_frame, dtype=np.uint8)
+        # Slots are taken under the lock so a regrow waiting for them isn't starved by other submitters
+        with self._slot_lock:
+            if not self._ensure_slots(rgb_frame.nbytes, timeout):
+                return None
+            try:
+                slot_index = self._free_slots.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            shm = self._slots[slot_index]
+        np.ndarray(rgb_frame.shape, dtype=np.uint8, buffer=shm.buf)[...] = rgb_frame
+        job_id = next(self._job_ids)
+        self._job_slots[job_id] = slot_index
+        with self._dispatch_lock:
+            worker = min(self._workers, key=lambda w: len(w.jobs))
+            worker.jobs.add(job_id)
+            try:
+                worker.task_conn.send((job_id, kind, slot_index, shm.name, rgb_frame.shape, locations))
+            except OSError:
+                pass # Worker just died; the reader fails this job along with its others
+        return job_id
+
+    def result(self, job_id, timeout=None):
+        """
+        Waits for a job's result: a list of face locations for DETECT, a list of encodings for ENCODE.
+        Raises:
+            RuntimeError: If the worker failed or the pool was stopped.
+            TimeoutError: If the result did not arrive within `timeout` seconds.
+        """
+        with self._results_cond:
+            if not self._results_cond.wait_for(lambda: job_id in self._results or not self._running, timeout):
+                self._abandoned.add(job_id) # Nobody will collect it now: drop it when it arrives
+                raise TimeoutError(f"Face worker job {job_id} timed out.")
+            if job_id not in self._results:
+                raise RuntimeError("Face worker pool stopped.")
+            payload, error = self._results.pop(job_id)
+        if error:
+            raise RuntimeError(f"Face worker job {job_id} failed: {error}")
+        return payload
+
+    def detect(self, rgb_frame, rois=None):
+        """Synchronous face_locations on a worker (optionally only inside `rois`)."""
+        if rois is not None and not rois:
+            return []
+        return self._run_job(DETECT, rgb_frame, rois)
+
+    def encode(self, rgb_frame, locations):
+        """Synchronous face_encodings on a worker."""
+        if not locations:
+            return []
+        return self._run_job(ENCODE, rgb_frame, list(locations))
+
+    def _run_job(self, kind, rgb_frame, locations):
+        job_id = self.submit(kind, rgb_frame, locations, timeout=config.FACE_WORKER_TIMEOUT)
+        if job_id is None:
+            raise TimeoutError("No face worker slot became free in time.")
+        return self.result(job_id, timeout=config.FACE_WORKER_TIMEOUT)
+
+    # --- Internals ---
+    def _ensure_slots(self, nbytes, timeout=None):
+        """
+        Makes sure every slot can hold `nbytes` (called with _slot_lock held). Creates the slots on
+        first use; for a larger frame, waits until all slots are free and replaces them with bigger ones.
+        Returns:
+            bool: False if the in-flight jobs did not hand their slots back within `timeout` seconds.
+        """
+        from multiprocessing import shared_memory
+        if nbytes <= self._slot_bytes:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        drained = []
+        while len(drained) < len(self._slots):
+            try:
+                drained.append(self._free_slots.get(timeout=None if deadline is None else max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                for slot_index in drained:
+                    self._free_slots.put(slot_index)
+                return False
+        old_slots = self._slots
+        self._slots = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(self.num_slots)]
+        self._slot_bytes = nbytes
+        for shm in old_slots:
+            shm.close()
+            shm.unlink() # Workers re-attach by name on their next job for that slot
+        for slot_index in range(self.num_slots):
+            self._free_slots.put(slot_index)
+        if old_slots:
+            print(f"WORKER_POOL: Regrew {self.num_slots} frame slot(s) to {nbytes} bytes.")
+        return True
+
+    def _spawn(self, index):
+        task_recv, task_send = self._ctx.Pipe(duplex=False)
+        result_recv, result_send = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(target=_worker_main, args=(task_recv, result_send),
+                                    name=f"face-worker-{index}", daemon=True)
+        process.start()
+        task_recv.close() # The child holds its own copies
+        result_send.close()
+        return _Worker(process, task_send, result_recv)
+
+    def _read_results(self):
+        # Waits on every worker's result pipe and process sentinel, so a dead worker is noticed at once
+        while self._running:
+            with self._dispatch_lock:
+                workers = list(self._workers)
+            handles = {}
+            for worker in workers:
+                handles[worker.result_conn] = worker
+                handles[worker.process.sentinel] = worker
+            for ready in multiprocessing.connection.wait(list(handles), timeout=1):
+                worker = handles[ready]
+                if ready is worker.result_conn:
+                    try:
+                        self._deliver(worker, *worker.result_conn.recv())
+                    except (EOFError, OSError):
+                        pass # Died; handled through its sentinel
+                elif self._running:
+                    self._replace_dead_worker(worker)
+
+    def _deliver(self, worker, job_id, payload, error):
+        with self._dispatch_lock:
+            worker.jobs.discard(job_id)
+        slot_index = self._job_slots.pop(job_id, None)
+        if slot_index is not None:
+            self._free_slots.put(slot_index) # Worker is done reading the frame
+        with self._results_cond:
+            if job_id in self._abandoned:
+                self._abandoned.discard(job_id) # Its caller timed out; only the slot needed freeing
+                return
+            self._results[job_id] = (payload, error)
+            self._results_cond.notify_all()
+
+    def _replace_dead_worker(self, worker):
+        # Results it sent before dying still count
+        try:
+            while worker.result_conn.poll():
+                self._deliver(worker, *worker.result_conn.recv())
+        except (EOFError, OSError):
+            pass
+        worker.process.join(timeout=1) # Reap it so its exit code is known
+        with self._dispatch_lock:
+            index = self._workers.index(worker)
+        print(f"WORKER_POOL: Face worker {worker.process.name} died (exit code {worker.process.exitcode}) "
+              f"holding {len(worker.jobs)} job(s); starting a replacement.")
+        replacement = self._spawn(index)
+        with self._dispatch_lock:
+            self._workers[index] = replacement
+            lost_jobs = list(worker.jobs)
+        worker.task_conn.close()
+        worker.result_conn.close()
+        for job_id in lost_jobs:
+            self._deliver(worker, job_id, None, f"face worker {worker.process.name} died")